@@ -30,6 +30,10 @@ class Settings(BaseSettings):
     table_retrieval_size: int = Field(default=10)
     table_column_retrieval_size: int = Field(default=100)
     enable_column_pruning: bool = Field(default=False)
+    enable_incremental_indexing: bool = Field(default=False)
+    small_schema_token_threshold: int = Field(default=0)
+    streaming_indexing_concurrency: int = Field(default=0)
+    streaming_indexing_batch_size: int = Field(default=32)
     historical_question_retrieval_similarity_threshold: float = Field(default=0.9)
     sql_pairs_similarity_threshold: float = Field(default=0.7)
     sql_pairs_retrieval_max_size: int = Field(default=10)
@@ -40,8 +44,12 @@ class Settings(BaseSettings):
     allow_intent_classification: bool = Field(default=True)
     allow_sql_generation_reasoning: bool = Field(default=True)
     allow_sql_functions_retrieval: bool = Field(default=True)
+    enable_speculative_retrieval: bool = Field(default=False)
     max_histories: int = Field(default=5)
     max_sql_correction_retries: int = Field(default=3)
+    sql_generation_candidates: int = Field(default=1)
+    sql_generation_candidates_temperature: float = Field(default=0.7)
+    ask_deadline: float = Field(default=0)  # unit: seconds, 0 for no deadline
 
     # engine config
     engine_timeout: float = Field(default=30.0)
@@ -0,0 +1,92 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_context(timeout: Optional[float]):
+    """
+    Set the deadline of the current request to `timeout` seconds from now, or keep the current
+    one if it comes first. A missing or non-positive timeout leaves the deadline unchanged.
+
+    The deadline is stored in a ContextVar, so it's seen by the pipelines run for the request
+    and the tasks they spawn, down to the calls of the providers.
+    """
+    if not timeout or timeout <= 0:
+        yield _deadline.get()
+        return
+
+    deadline = asyncio.get_running_loop().time() + timeout
+    if (current := _deadline.get()) is not None:
+        deadline = min(deadline, current)
+
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def deadline_exceeded() -> bool:
+    if (deadline := _deadline.get()) is None:
+        return False
+
+    return asyncio.get_running_loop().time() >= deadline
+
+
+def remaining_time(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    The timeout of a call made for the current request: the time left before its deadline,
+    capped by `timeout`, or `timeout` itself if the request has no deadline.
+
+    Raises DeadlineExceeded once the deadline has passed, so no call is made without any budget.
+    """
+    if (deadline := _deadline.get()) is None:
+        return timeout
+
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise DeadlineExceeded("the deadline of the request has been exceeded")
+
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@asynccontextmanager
+async def within_deadline():
+    """
+    Bound the awaits of the block by the deadline of the current request, for the calls that
+    don't take a timeout of their own.
+    """
+    try:
+        async with asyncio.timeout_at(_deadline.get()):
+            yield
+    except TimeoutError as e:
+        if deadline_exceeded():
+            raise DeadlineExceeded(
+                "the deadline of the request has been exceeded"
+            ) from e
+        raise
+
+
+def with_deadline(func):
+    """
+    This decorator runs the decorated service method within the deadline of its request,
+    `request.deadline` seconds, falling back to the `_deadline` of the service.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(self, request, *args, **kwargs):
+        timeout = getattr(request, "deadline", None) or getattr(self, "_deadline", None)
+        with deadline_context(timeout):
+            return await func(self, request, *args, **kwargs)
+
+    return wrapper
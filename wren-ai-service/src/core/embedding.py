@@ -0,0 +1,114 @@
+import asyncio
+import functools
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("wren-ai-service")
+
+
+def normalize_text(text: str) -> str:
+    # keep in sync with AsyncTextEmbedder, newlines are replaced before embedding
+    return text.replace("\n", " ").strip()
+
+
+class EmbeddingContext:
+    """
+    A request-scoped store of query embeddings keyed by (embedding model, normalized text).
+
+    Several retrieval pipelines embed the same user question during a single ask.
+    Pipelines call `embed_query` instead of the embedder directly, so each distinct
+    text is sent to the embedding provider only once per request. Concurrent callers
+    asking for the same key share the same in-flight request.
+    """
+
+    def __init__(self):
+        self._embeddings: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hit": 0, "miss": 0}
+        )
+
+    def _evict_on_failure(self, key: Tuple[str, str], future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self._embeddings.pop(key, None)
+
+    async def embed(self, embedder: Any, text: str, stage: str) -> dict:
+        key = (getattr(embedder, "_model", ""), normalize_text(text))
+
+        if (future := self._embeddings.get(key)) is None:
+            self._stats[stage]["miss"] += 1
+            future = asyncio.ensure_future(embedder.run(key[1]))
+            future.add_done_callback(lambda future: self._evict_on_failure(key, future))
+            self._embeddings[key] = future
+        else:
+            self._stats[stage]["hit"] += 1
+
+        # shield the shared future so cancelling one caller doesn't fail the others
+        return await asyncio.shield(future)
+
+    def cancel(self) -> None:
+        # the shared requests are shielded from their callers, cancel them along with the request
+        for future in self._embeddings.values():
+            future.cancel()
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {stage: dict(counter) for stage, counter in self._stats.items()}
+
+
+_embedding_context: ContextVar[Optional[EmbeddingContext]] = ContextVar(
+    "embedding_context", default=None
+)
+
+
+@contextmanager
+def embedding_context():
+    """
+    Activate an EmbeddingContext for the current request.
+
+    The context is stored in a ContextVar, so tasks spawned while it is active
+    (e.g. by asyncio.gather or asyncio.create_task) share the same context.
+    """
+    context = EmbeddingContext()
+    token = _embedding_context.set(context)
+    try:
+        yield context
+    except asyncio.CancelledError:
+        context.cancel()
+        raise
+    finally:
+        _embedding_context.reset(token)
+        logger.debug(f"Embedding context stats: {context.stats}")
+
+
+async def embed_query(embedder: Any, text: str, stage: str = "") -> dict:
+    """
+    Embed a query text, reusing the embedding of the active request if there is one.
+    Without an active EmbeddingContext, it falls back to calling the embedder directly.
+    """
+    if (context := _embedding_context.get()) is None:
+        return await embedder.run(normalize_text(text))
+
+    return await context.embed(embedder, text, stage)
+
+
+def with_embedding_context(func):
+    """
+    This decorator runs the decorated service method inside a fresh EmbeddingContext
+    and adds the per-stage hit/miss counters to the returned metadata,
+    so they show up in the Langfuse trace when applied below `trace_metadata`.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with embedding_context() as context:
+            results = await func(*args, **kwargs)
+
+        if isinstance(results, dict) and (stats := context.stats):
+            results.setdefault("metadata", {})["embedding_cache"] = stats
+
+        return results
+
+    return wrapper
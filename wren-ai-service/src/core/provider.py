@@ -39,3 +39,7 @@ class DocumentStoreProvider(metaclass=ABCMeta):
     @abstractmethod
     def get_retriever(self, *args, **kwargs):
         ...
+
+    def get_deploy_versions(self):
+        # the active deploy versions of the projects, None unless blue/green indexing is enabled
+        return getattr(self, "_deploy_versions", None)
@@ -7,6 +7,8 @@ from src.config import Settings
 from src.core.pipeline import PipelineComponent
 from src.core.provider import EmbedderProvider, LLMProvider
 from src.pipelines import generation, indexing, retrieval
+from src.pipelines.common import get_token_encoding
+from src.pipelines.ddl_cache import DDLCache
 from src.utils import fetch_wren_ai_docs
 from src.web.v1 import services
 
@@ -43,6 +45,15 @@ def create_service_container(
         "maxsize": settings.query_cache_maxsize,
         "ttl": settings.query_cache_ttl,
     }
+    # shared by the DB schema indexing and retrieval pipelines, indexing invalidates it
+    ddl_cache = DDLCache(**query_cache)
+    # DB schema documents are token-counted at indexing time with the retrieval model encoding
+    retrieval_llm_provider = pipe_components["db_schema_retrieval"].llm_provider
+    token_encoding = (
+        get_token_encoding(retrieval_llm_provider.get_model()).name
+        if retrieval_llm_provider
+        else None
+    )
     wren_ai_docs = fetch_wren_ai_docs(settings.doc_endpoint, settings.is_oss)
     if not wren_ai_docs:
         logger.warning("Failed to fetch Wren AI docs or response was empty.")
@@ -61,6 +72,11 @@ def create_service_container(
                 "db_schema": indexing.DBSchema(
                     **pipe_components["db_schema_indexing"],
                     column_batch_size=settings.column_indexing_batch_size,
+                    ddl_cache=ddl_cache,
+                    token_encoding=token_encoding,
+                    small_schema_token_threshold=settings.small_schema_token_threshold,
+                    streaming_concurrency=settings.streaming_indexing_concurrency,
+                    streaming_batch_size=settings.streaming_indexing_batch_size,
                 ),
                 "historical_question": indexing.HistoricalQuestion(
                     **pipe_components["historical_question_indexing"],
@@ -79,6 +95,13 @@ def create_service_container(
                     **pipe_components["project_meta_indexing"],
                 ),
             },
+            enable_incremental_indexing=settings.enable_incremental_indexing,
+            deploy_versions=pipe_components[
+                "db_schema_indexing"
+            ].document_store_provider.get_deploy_versions(),
+            document_store_provider=pipe_components[
+                "db_schema_indexing"
+            ].document_store_provider,
             **query_cache,
         ),
         ask_service=services.AskService(
@@ -101,6 +124,7 @@ def create_service_container(
                     **pipe_components["db_schema_retrieval"],
                     table_retrieval_size=settings.table_retrieval_size,
                     table_column_retrieval_size=settings.table_column_retrieval_size,
+                    ddl_cache=ddl_cache,
                 ),
                 "historical_question": retrieval.HistoricalQuestionRetrieval(
                     **pipe_components["historical_question_retrieval"],
@@ -119,6 +143,8 @@ def create_service_container(
                 "sql_generation": generation.SQLGeneration(
                     **pipe_components["sql_generation"],
                     engine_timeout=settings.engine_timeout,
+                    candidates=settings.sql_generation_candidates,
+                    candidates_temperature=settings.sql_generation_candidates_temperature,
                 ),
                 "sql_generation_reasoning": generation.SQLGenerationReasoning(
                     **pipe_components["sql_generation_reasoning"],
@@ -133,6 +159,8 @@ def create_service_container(
                 "followup_sql_generation": generation.FollowUpSQLGeneration(
                     **pipe_components["followup_sql_generation"],
                     engine_timeout=settings.engine_timeout,
+                    candidates=settings.sql_generation_candidates,
+                    candidates_temperature=settings.sql_generation_candidates_temperature,
                 ),
                 "sql_regeneration": generation.SQLRegeneration(
                     **pipe_components["sql_regeneration"],
@@ -149,6 +177,8 @@ def create_service_container(
             max_histories=settings.max_histories,
             enable_column_pruning=settings.enable_column_pruning,
             max_sql_correction_retries=settings.max_sql_correction_retries,
+            enable_speculative_retrieval=settings.enable_speculative_retrieval,
+            deadline=settings.ask_deadline,
             **query_cache,
         ),
         chart_service=services.ChartService(
@@ -205,6 +235,7 @@ def create_service_container(
                     **pipe_components["question_recommendation_db_schema_retrieval"],
                     table_retrieval_size=settings.table_retrieval_size,
                     table_column_retrieval_size=settings.table_column_retrieval_size,
+                    ddl_cache=ddl_cache,
                 ),
                 "sql_generation": generation.SQLGeneration(
                     **pipe_components["question_recommendation_sql_generation"],
@@ -262,6 +293,7 @@ def create_service_container(
                     **pipe_components["db_schema_retrieval"],
                     table_retrieval_size=settings.table_retrieval_size,
                     table_column_retrieval_size=settings.table_column_retrieval_size,
+                    ddl_cache=ddl_cache,
                 ),
                 "sql_correction": generation.SQLCorrection(
                     **pipe_components["sql_correction"],
@@ -0,0 +1,98 @@
+# This file migrates the DB schema documents indexed by older versions of the service
+# Their content is stored as a Python dict literal, which needs ast.literal_eval at retrieval time,
+# so this file rewrites the content of those documents as JSON in place
+# The embeddings are kept as they are, so the embedding model is not called during the migration
+
+import argparse
+import ast
+import os
+from pathlib import Path
+from typing import Optional
+
+import orjson
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+
+if Path(".env.dev").exists():
+    load_dotenv(".env.dev", override=True)
+
+
+def _migrate_content(content: str) -> Optional[str]:
+    try:
+        orjson.loads(content)
+        return None
+    except orjson.JSONDecodeError:
+        return orjson.dumps(ast.literal_eval(content)).decode("utf-8")
+
+
+def migrate(
+    client: QdrantClient,
+    collection_name: str = "Document",
+    batch_size: int = 256,
+    dry_run: bool = False,
+) -> dict:
+    scroll_filter = rest.Filter(
+        must=[
+            rest.FieldCondition(key="type", match=rest.MatchValue(value="TABLE_SCHEMA"))
+        ]
+    )
+    stats = {"scanned": 0, "migrated": 0}
+    offset = None
+
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            offset=offset,
+            limit=batch_size,
+            with_payload=["content"],
+            with_vectors=False,
+        )
+
+        operations = [
+            rest.SetPayloadOperation(
+                set_payload=rest.SetPayload(
+                    payload={"content": content}, points=[point.id]
+                )
+            )
+            for point in points
+            if (content := _migrate_content(point.payload["content"])) is not None
+        ]
+
+        stats["scanned"] += len(points)
+        stats["migrated"] += len(operations)
+        if operations and not dry_run:
+            client.batch_update_points(
+                collection_name=collection_name,
+                update_operations=operations,
+                wait=True,
+            )
+
+        if offset is None:
+            break
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", default="Document")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = QdrantClient(
+        location=os.getenv("QDRANT_HOST", "qdrant"),
+        api_key=os.getenv("QDRANT_API_KEY"),
+    )
+    stats = migrate(
+        client,
+        collection_name=args.collection,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
+    print(
+        f"Scanned {stats['scanned']} DB schema documents, "
+        f"{'would migrate' if args.dry_run else 'migrated'} {stats['migrated']}"
+    )
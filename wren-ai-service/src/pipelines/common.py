@@ -1,6 +1,9 @@
+import ast
 import re
 from typing import Any, List, Optional, Tuple
 
+import orjson
+import tiktoken
 from haystack import Document, component
 
 
@@ -27,6 +30,31 @@ def get_engine_supported_data_type(data_type: str) -> str:
             return data_type.upper()
 
 
+def parse_schema_content(content: str) -> dict:
+    """
+    Parse the content of a TABLE_SCHEMA document.
+
+    The content is stored as JSON. Documents indexed by older versions store it as a Python
+    dict literal, which is still parsed until the collection is migrated with
+    `python -m src.migrate_schema_payloads` or the MDL is deployed again.
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return ast.literal_eval(content)
+
+
+def build_column_ddl(column: dict) -> str:
+    column_ddl = f"{column['comment']}{column['name']} {get_engine_supported_data_type(column['data_type'])}"
+    if column.get("is_primary_key"):
+        column_ddl += " PRIMARY KEY"
+    return column_ddl
+
+
+def build_foreign_key_ddl(column: dict) -> str:
+    return f"{column['comment']}{column['constraint']}"
+
+
 def build_table_ddl(
     content: dict, columns: Optional[set[str]] = None, tables: Optional[set[str]] = None
 ) -> Tuple[str, bool, bool]:
@@ -45,13 +73,10 @@ def build_table_ddl(
                     has_calculated_field = True
                 if column["data_type"].lower() == "json":
                     has_json_field = True
-                column_ddl = f"{column['comment']}{column['name']} {get_engine_supported_data_type(column['data_type'])}"
-                if column["is_primary_key"]:
-                    column_ddl += " PRIMARY KEY"
-                columns_ddl.append(column_ddl)
+                columns_ddl.append(build_column_ddl(column))
         elif column["type"] == "FOREIGN_KEY":
             if not tables or (tables and set(column["tables"]).issubset(tables)):
-                columns_ddl.append(f"{column['comment']}{column['constraint']}")
+                columns_ddl.append(build_foreign_key_ddl(column))
 
     return (
         (
@@ -64,6 +89,74 @@ def build_table_ddl(
     )
 
 
+def build_metric_ddl(content: dict) -> str:
+    columns_ddl = [
+        f"{column['comment']}{column['name']} {get_engine_supported_data_type(column['data_type'])}"
+        for column in content["columns"]
+        if column["data_type"].lower()
+        != "unknown"  # quick fix: filtering out UNKNOWN column type
+    ]
+
+    return (
+        f"{content['comment']}CREATE TABLE {content['name']} (\n  "
+        + ",\n  ".join(columns_ddl)
+        + "\n);"
+    )
+
+
+def build_view_ddl(content: dict) -> str:
+    return (
+        f"{content['comment']}CREATE VIEW {content['name']}\nAS {content['statement']}"
+    )
+
+
+def get_token_encoding(model: str) -> tiktoken.Encoding:
+    if "gpt-4o" in model or "gpt-4o-mini" in model:
+        return tiktoken.get_encoding("o200k_base")
+    else:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_ddl_tokens(
+    content: dict, encoding: tiktoken.Encoding
+) -> Tuple[int, List[int]]:
+    """
+    Count the tokens a DB schema document contributes to the rendered DDL.
+
+    Returns the total number of tokens of the document and, for TABLE_COLUMNS documents,
+    the number of tokens of each column (including its separator), aligned with `content["columns"]`.
+    The sum of the counts of all the documents of a table is an estimate of the tokens of its DDL,
+    since tokens at the boundaries of the fragments may be merged when the DDL is tokenized as a whole.
+    """
+
+    def _count(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    match content["type"]:
+        case "TABLE":
+            return _count(
+                f"{content['comment']}CREATE TABLE {content['name']} (\n  \n);"
+            ), []
+        case "TABLE_COLUMNS":
+            column_tokens = []
+            for column in content["columns"]:
+                if column["type"] == "FOREIGN_KEY":
+                    column_tokens.append(
+                        _count(build_foreign_key_ddl(column) + ",\n  ")
+                    )
+                elif column["data_type"].lower() == "unknown":
+                    column_tokens.append(0)
+                else:
+                    column_tokens.append(_count(build_column_ddl(column) + ",\n  "))
+            return sum(column_tokens), column_tokens
+        case "VIEW":
+            return _count(build_view_ddl(content)), []
+        case "METRIC":
+            return _count(build_metric_ddl(content)), []
+        case _:
+            return 0, []
+
+
 async def retrieve_metadata(project_id: str, retriever) -> dict[str, Any]:
     filters = None
     if project_id:
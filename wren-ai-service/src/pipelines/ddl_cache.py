@@ -0,0 +1,211 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+
+import tiktoken
+from cachetools import TTLCache
+
+from src.pipelines.common import build_metric_ddl, build_table_ddl, build_view_ddl
+
+logger = logging.getLogger("wren-ai-service")
+
+
+@dataclass
+class TableDDL:
+    """
+    The rendered DDL of a model, view or metric, along with the flags derived from it.
+    For models, the assembled schema is kept to render column-pruned variants, which are memoized.
+
+    `token_counts` maps a tiktoken encoding name to the number of tokens of the DDL. It is filled
+    from the counts stored at indexing time, or by counting the DDL the first time it's needed.
+    """
+
+    name: str
+    type: Literal["TABLE", "VIEW", "METRIC"]
+    ddl: str
+    has_calculated_field: bool = False
+    has_json_field: bool = False
+    schema: Optional[dict] = None
+    token_counts: Dict[str, int] = field(default_factory=dict)
+    max_pruned_variants: int = 32
+    _pruned: Dict[tuple, Tuple[str, bool, bool]] = field(
+        default_factory=dict, repr=False
+    )
+
+    def prune(self, columns: set[str], tables: set[str]) -> Tuple[str, bool, bool]:
+        if self.schema is None:
+            return self.ddl, self.has_calculated_field, self.has_json_field
+
+        # only the tables referenced by the foreign keys of this table change the DDL
+        referenced_tables = {
+            table
+            for column in self.schema["columns"]
+            if column["type"] == "FOREIGN_KEY"
+            for table in column["tables"]
+        }
+        key = (
+            frozenset(columns),
+            frozenset(tables & referenced_tables),
+            bool(tables),
+        )
+
+        if (pruned := self._pruned.get(key)) is None:
+            pruned = build_table_ddl(self.schema, columns=columns, tables=tables)
+            if len(self._pruned) < self.max_pruned_variants:
+                self._pruned[key] = pruned
+
+        return pruned
+
+    def count_tokens(self, encoding: tiktoken.Encoding) -> int:
+        if (tokens := self.token_counts.get(encoding.name)) is None:
+            tokens = self.token_counts[encoding.name] = len(
+                encoding.encode(self.ddl, disallowed_special=())
+            )
+        return tokens
+
+
+def _stored_token_count(documents: List[dict]) -> Dict[str, int]:
+    # the stored counts are only usable if all the documents were counted with the same encoding
+    encodings = {document.get("token_encoding") for document in documents}
+    if len(encodings) != 1 or None in encodings:
+        return {}
+
+    if any(document.get("tokens") is None for document in documents):
+        return {}
+
+    return {encodings.pop(): sum(document["tokens"] for document in documents)}
+
+
+def build_table_ddls(documents: List[dict]) -> List[TableDDL]:
+    """
+    Build the DDL of every complete model, view and metric from parsed DB schema documents,
+    each one being a dict of the document name and its parsed content, and optionally the
+    token counts stored at indexing time ("tokens" and "token_encoding").
+    Models come first, in the order of their first document.
+    """
+    schemas = {}
+    table_documents = {}
+    others = []
+    for document in documents:
+        name = document["name"]
+        content = document["content"]
+        if content["type"] == "TABLE":
+            schemas.setdefault(name, {}).update(content)
+            table_documents.setdefault(name, []).append(document)
+        elif content["type"] == "TABLE_COLUMNS":
+            schemas.setdefault(name, {}).setdefault("columns", []).extend(
+                content["columns"]
+            )
+            table_documents.setdefault(name, []).append(document)
+        elif content["type"] == "METRIC":
+            others.append(
+                TableDDL(
+                    name=name,
+                    type="METRIC",
+                    ddl=build_metric_ddl(content),
+                    token_counts=_stored_token_count([document]),
+                )
+            )
+        elif content["type"] == "VIEW":
+            others.append(
+                TableDDL(
+                    name=name,
+                    type="VIEW",
+                    ddl=build_view_ddl(content),
+                    token_counts=_stored_token_count([document]),
+                )
+            )
+
+    tables = []
+    for name, schema in schemas.items():
+        # skip incomplete schemas, e.g. the columns of a table without its TABLE document
+        if "type" not in schema or "columns" not in schema:
+            continue
+
+        ddl, has_calculated_field, has_json_field = build_table_ddl(schema)
+        tables.append(
+            TableDDL(
+                name=name,
+                type="TABLE",
+                ddl=ddl,
+                has_calculated_field=has_calculated_field,
+                has_json_field=has_json_field,
+                schema=schema,
+                token_counts=_stored_token_count(table_documents[name]),
+            )
+        )
+
+    return tables + others
+
+
+class DDLCache:
+    """
+    An in-process cache of rendered DDL per project and table name, shared by the DB schema
+    indexing pipeline, which warms and invalidates it, and the DB schema retrieval pipeline.
+
+    Every invalidation bumps the version of the project, so the results of a lookup that started
+    before a reindex finished are never cached.
+
+    The whole schema of the projects small enough to fit the prompt is also kept, for as long as
+    their DDL, so their retrieval can skip the embedder and the document store altogether.
+    """
+
+    def __init__(self, maxsize: int = 1_000_000, ttl: int = 3600):
+        self._projects: Dict[str, Dict[str, TableDDL]] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+        self._schemas: Dict[str, List[TableDDL]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = defaultdict(int)
+
+    def version(self, project_id: Optional[str]) -> int:
+        return self._versions[project_id or ""]
+
+    def get(
+        self, project_id: Optional[str], names: Iterable[str]
+    ) -> Dict[str, TableDDL]:
+        tables = self._projects.get(project_id or "", {})
+        return {name: tables[name] for name in names if name in tables}
+
+    def put(
+        self, project_id: Optional[str], tables: Iterable[TableDDL], version: int
+    ) -> None:
+        project_id = project_id or ""
+        if version != self._versions[project_id]:
+            return
+
+        if (cached := self._projects.get(project_id)) is None:
+            cached = self._projects[project_id] = {}
+        cached.update({table.name: table for table in tables})
+
+    def get_schema(self, project_id: Optional[str]) -> Optional[List[TableDDL]]:
+        return self._schemas.get(project_id or "")
+
+    def put_schema(
+        self, project_id: Optional[str], tables: Iterable[TableDDL], version: int
+    ) -> None:
+        project_id = project_id or ""
+        if version != self._versions[project_id]:
+            return
+
+        tables = list(tables)
+        self._schemas[project_id] = [
+            table for table in tables if table.type == "TABLE"
+        ] + [table for table in tables if table.type != "TABLE"]
+
+    def invalidate(
+        self, project_id: Optional[str], names: Optional[Iterable[str]] = None
+    ) -> int:
+        project_id = project_id or ""
+        self._versions[project_id] += 1
+        # the whole schema is put again by the indexing, once it's done
+        self._schemas.pop(project_id, None)
+
+        if names is None:
+            self._projects.pop(project_id, None)
+        elif (cached := self._projects.get(project_id)) is not None:
+            for name in names:
+                cached.pop(name, None)
+
+        logger.debug(f"Project ID: {project_id}, DDL cache invalidated")
+        return self._versions[project_id]
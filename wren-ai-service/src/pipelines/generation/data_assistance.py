@@ -116,6 +116,11 @@ class DataAssistance(BasicPipeline):
         if chunk.meta.get("finish_reason"):
             asyncio.create_task(self._user_queues[query_id].put("<DONE>"))
 
+    def stop_streaming(self, query_id):
+        # end the stream of the consumer waiting for the chunks of a cancelled query
+        if query_id in self._user_queues:
+            self._user_queues[query_id].put_nowait("<DONE>")
+
     async def get_streaming_results(self, query_id):
         async def _get_streaming_results(query_id):
             return await self._user_queues[query_id].get()
@@ -15,10 +15,12 @@ from src.pipelines.generation.utils.sql import (
     SQL_GENERATION_MODEL_KWARGS,
     SQLGenPostProcessor,
     calculated_field_instructions,
+    check_sql_candidates,
     construct_ask_history_messages,
     construct_instructions,
     json_field_instructions,
     metric_instructions,
+    sql_candidates_generation_kwargs,
     sql_generation_system_prompt,
 )
 from src.pipelines.retrieval.sql_functions import SqlFunction
@@ -119,12 +121,21 @@ def prompt(
 @observe(as_type="generation", capture_input=False)
 @trace_cost
 async def generate_sql_in_followup(
-    prompt: dict, generator: Any, histories: list[AskHistory], generator_name: str
+    prompt: dict,
+    generator: Any,
+    histories: list[AskHistory],
+    generator_name: str,
+    candidates: int = 1,
+    candidates_generation_kwargs: dict | None = None,
 ) -> dict:
     history_messages = construct_ask_history_messages(histories)
-    return await generator(
-        prompt=prompt.get("prompt"), history_messages=history_messages
-    ), generator_name
+    result = await generator(
+        prompt=prompt.get("prompt"),
+        history_messages=history_messages,
+        generation_kwargs=candidates_generation_kwargs,
+    )
+    check_sql_candidates(result.get("replies", []), candidates)
+    return result, generator_name
 
 
 @observe(capture_input=False)
@@ -157,6 +168,8 @@ class FollowUpSQLGeneration(BasicPipeline):
         document_store_provider: DocumentStoreProvider,
         engine: Engine,
         engine_timeout: float = 30.0,
+        candidates: int = 1,
+        candidates_temperature: float = 0.7,
         **kwargs,
     ):
         self._retriever = document_store_provider.get_retriever(
@@ -177,6 +190,11 @@ class FollowUpSQLGeneration(BasicPipeline):
 
         self._configs = {
             "engine_timeout": engine_timeout,
+            "candidates": candidates,
+            "candidates_generation_kwargs": sql_candidates_generation_kwargs(
+                candidates,
+                temperature=candidates_temperature,
+            ),
         }
 
         super().__init__(
@@ -1,4 +1,3 @@
-import ast
 import logging
 import sys
 from typing import Any, Literal, Optional
@@ -11,9 +10,14 @@ from haystack.components.builders.prompt_builder import PromptBuilder
 from langfuse.decorators import observe
 from pydantic import BaseModel
 
+from src.core.embedding import embed_query
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider, LLMProvider
-from src.pipelines.common import build_table_ddl, clean_up_new_lines
+from src.pipelines.common import (
+    build_table_ddl,
+    clean_up_new_lines,
+    parse_schema_content,
+)
 from src.pipelines.generation.utils.sql import construct_instructions
 from src.utils import trace_cost
 from src.web.v1.services import Configuration
@@ -168,9 +172,9 @@ async def embedding(query: str, embedder: Any, histories: list[AskHistory]) -> d
         [history.question for history in histories] if histories else []
     )
 
-    query = "\n".join(previous_query_summaries) + "\n" + query
+    query = "\n".join(previous_query_summaries + [query])
 
-    return await embedder.run(query)
+    return await embed_query(embedder, query, stage="intent_classification")
 
 
 @observe(capture_input=False)
@@ -200,10 +204,7 @@ async def dbschema_retrieval(
     table_retrieval: dict, embedding: dict, project_id: str, dbschema_retriever: Any
 ) -> list[Document]:
     tables = table_retrieval.get("documents", [])
-    table_names = []
-    for table in tables:
-        content = ast.literal_eval(table.content)
-        table_names.append(content["name"])
+    table_names = [table.meta["name"] for table in tables]
 
     logger.info(f"dbschema_retrieval with table_names: {table_names}")
 
@@ -235,7 +236,7 @@ async def dbschema_retrieval(
 def construct_db_schemas(dbschema_retrieval: list[Document]) -> list[str]:
     db_schemas = {}
     for document in dbschema_retrieval:
-        content = ast.literal_eval(document.content)
+        content = parse_schema_content(document.content)
         if content["type"] == "TABLE":
             if document.meta["name"] not in db_schemas:
                 db_schemas[document.meta["name"]] = content
@@ -351,10 +352,12 @@ class IntentClassification(BasicPipeline):
             "table_retriever": document_store_provider.get_retriever(
                 document_store_provider.get_store(dataset_name="table_descriptions"),
                 top_k=table_retrieval_size,
+                payload_fields=["name"],
             ),
             "dbschema_retriever": document_store_provider.get_retriever(
                 document_store_provider.get_store(),
                 top_k=table_column_retrieval_size,
+                payload_fields=["content", "name"],
             ),
             "generator": llm_provider.get_generator(
                 system_prompt=intent_classification_system_prompt,
@@ -15,9 +15,11 @@ from src.pipelines.generation.utils.sql import (
     SQL_GENERATION_MODEL_KWARGS,
     SQLGenPostProcessor,
     calculated_field_instructions,
+    check_sql_candidates,
     construct_instructions,
     json_field_instructions,
     metric_instructions,
+    sql_candidates_generation_kwargs,
     sql_generation_system_prompt,
 )
 from src.pipelines.retrieval.sql_functions import SqlFunction
@@ -118,8 +120,15 @@ async def generate_sql(
     prompt: dict,
     generator: Any,
     generator_name: str,
+    candidates: int = 1,
+    candidates_generation_kwargs: dict | None = None,
 ) -> dict:
-    return await generator(prompt=prompt.get("prompt")), generator_name
+    result = await generator(
+        prompt=prompt.get("prompt"),
+        generation_kwargs=candidates_generation_kwargs,
+    )
+    check_sql_candidates(result.get("replies", []), candidates)
+    return result, generator_name
 
 
 @observe(capture_input=False)
@@ -154,6 +163,8 @@ class SQLGeneration(BasicPipeline):
         document_store_provider: DocumentStoreProvider,
         engine: Engine,
         engine_timeout: float = 30.0,
+        candidates: int = 1,
+        candidates_temperature: float = 0.7,
         **kwargs,
     ):
         self._retriever = document_store_provider.get_retriever(
@@ -174,6 +185,11 @@ class SQLGeneration(BasicPipeline):
 
         self._configs = {
             "engine_timeout": engine_timeout,
+            "candidates": candidates,
+            "candidates_generation_kwargs": sql_candidates_generation_kwargs(
+                candidates,
+                temperature=candidates_temperature,
+            ),
         }
 
         super().__init__(
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import aiohttp
 import orjson
@@ -36,27 +37,28 @@ class SQLGenPostProcessor:
         data_source: str = "",
         allow_data_preview: bool = False,
     ) -> dict:
+        classify_kwargs = {
+            "project_id": project_id,
+            "timeout": timeout,
+            "use_dry_plan": use_dry_plan,
+            "allow_dry_plan_fallback": allow_dry_plan_fallback,
+            "data_source": data_source,
+            "allow_data_preview": allow_data_preview,
+        }
+
         try:
-            cleaned_generation_result = clean_generation_result(replies[0])
-
-            # test if cleaned_generation_result in string format is actually a dictionary with key 'sql'
-            if cleaned_generation_result.startswith("{"):
-                cleaned_generation_result = orjson.loads(cleaned_generation_result)[
-                    "sql"
-                ]
-
-            (
-                valid_generation_result,
-                invalid_generation_result,
-            ) = await self._classify_generation_result(
-                cleaned_generation_result,
-                project_id=project_id,
-                timeout=timeout,
-                use_dry_plan=use_dry_plan,
-                allow_dry_plan_fallback=allow_dry_plan_fallback,
-                data_source=data_source,
-                allow_data_preview=allow_data_preview,
-            )
+            if len(replies) > 1:
+                (
+                    valid_generation_result,
+                    invalid_generation_result,
+                ) = await self._classify_candidates(replies, **classify_kwargs)
+            else:
+                (
+                    valid_generation_result,
+                    invalid_generation_result,
+                ) = await self._classify_generation_result(
+                    self._extract_sql(replies[0]), **classify_kwargs
+                )
 
             return {
                 "valid_generation_result": valid_generation_result,
@@ -70,6 +72,58 @@ class SQLGenPostProcessor:
                 "invalid_generation_result": {},
             }
 
+    def _extract_sql(self, reply: str) -> str:
+        cleaned_generation_result = clean_generation_result(reply)
+
+        # test if cleaned_generation_result in string format is actually a dictionary with key 'sql'
+        if cleaned_generation_result.startswith("{"):
+            cleaned_generation_result = orjson.loads(cleaned_generation_result)["sql"]
+
+        return cleaned_generation_result
+
+    async def _classify_candidates(
+        self, replies: List[str], **kwargs
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Validate the SQL candidates of several replies concurrently and return the first valid
+        one, cancelling the validations still running. If none is valid, the invalid result of
+        the first candidate is returned, to be corrected.
+        """
+        candidates = []
+        for reply in replies:
+            try:
+                candidates.append(self._extract_sql(reply))
+            except Exception as e:
+                logger.warning(f"Skipping an unparsable SQL candidate: {e}")
+        # the candidates sampled from the same prompt are often identical
+        candidates = list(dict.fromkeys(candidates))
+        if not candidates:
+            return {}, {}
+
+        tasks = [
+            asyncio.create_task(self._classify_generation_result(candidate, **kwargs))
+            for candidate in candidates
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    valid_generation_result, _ = await next_done
+                except Exception as e:
+                    logger.warning(f"Failed to validate a SQL candidate: {e}")
+                    continue
+
+                if valid_generation_result:
+                    return valid_generation_result, {}
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task in tasks:
+            if task.exception() is None:
+                return {}, task.result()[1]
+        return {}, {}
+
     async def _classify_generation_result(
         self,
         generation_result: str,
@@ -506,6 +560,32 @@ SQL_GENERATION_MODEL_KWARGS = {
 }
 
 
+def sql_candidates_generation_kwargs(
+    candidates: int, temperature: float | None = None
+) -> Dict[str, Any] | None:
+    """
+    The generation kwargs asking the LLM for `candidates` SQL candidates in a single completion,
+    validated concurrently by SQLGenPostProcessor. They are sampled at `temperature`, overriding
+    the temperature of the model kwargs, usually 0, so the candidates differ from each other.
+    """
+    if candidates <= 1:
+        return None
+
+    generation_kwargs = {"n": candidates}
+    if temperature is not None:
+        generation_kwargs["temperature"] = temperature
+    return generation_kwargs
+
+
+def check_sql_candidates(replies: list[str], candidates: int) -> None:
+    # some providers silently ignore `n` and return a single reply
+    if candidates > 1 and len(replies) < candidates:
+        logger.warning(
+            f"{len(replies)} of {candidates} SQL candidates were generated, "
+            "the LLM provider may not support the n parameter"
+        )
+
+
 def construct_ask_history_messages(
     histories: list[AskHistory] | list[dict],
 ) -> list[ChatMessage]:
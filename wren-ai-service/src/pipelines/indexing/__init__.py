@@ -15,35 +15,56 @@ logger = logging.getLogger("wren-ai-service")
 class DocumentCleaner:
     """
     This component is used to clear all the documents in the specified document store(s).
-
+    If names are given, only the documents of those MDL objects (models, views or metrics) are cleared.
+    If a deploy version is given, only the documents of that version are cleared.
     """
 
     def __init__(self, stores: List[DocumentStore]) -> None:
         self._stores = stores
 
     @component.output_types()
-    async def run(self, project_id: Optional[str] = None) -> None:
+    async def run(
+        self,
+        project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        deploy_version: Optional[str] = None,
+    ) -> None:
         async def _clear_documents(
-            store: DocumentStore, project_id: Optional[str] = None
+            store: DocumentStore,
+            project_id: Optional[str] = None,
+            names: Optional[List[str]] = None,
+            deploy_version: Optional[str] = None,
         ) -> None:
             store_name = (
                 store.to_dict().get("init_parameters", {}).get("index", "unknown")
             )
             logger.info(f"Project ID: {project_id}, Cleaning documents in {store_name}")
+            conditions = []
+            if project_id:
+                conditions.append(
+                    {"field": "project_id", "operator": "==", "value": project_id}
+                )
+            if names is not None:
+                conditions.append({"field": "name", "operator": "in", "value": names})
+            if deploy_version is not None:
+                conditions.append(
+                    {
+                        "field": "deploy_version",
+                        "operator": "==",
+                        "value": deploy_version,
+                    }
+                )
+
             filters = (
-                {
-                    "operator": "AND",
-                    "conditions": [
-                        {"field": "project_id", "operator": "==", "value": project_id},
-                    ],
-                }
-                if project_id
-                else None
+                {"operator": "AND", "conditions": conditions} if conditions else None
             )
             await store.delete_documents(filters)
 
         await asyncio.gather(
-            *[_clear_documents(store, project_id) for store in self._stores]
+            *[
+                _clear_documents(store, project_id, names, deploy_version)
+                for store in self._stores
+            ]
         )
 
 
@@ -76,11 +97,19 @@ class MDLValidator:
 class AsyncDocumentWriter(DocumentWriter):
     @component.output_types(documents_written=int)
     async def run(
-        self, documents: List[Document], policy: Optional[DuplicatePolicy] = None
+        self,
+        documents: List[Document],
+        policy: Optional[DuplicatePolicy] = None,
+        deploy_version: Optional[str] = None,
     ):
         if policy is None:
             policy = self.policy
 
+        if deploy_version is not None:
+            # the documents are only returned by the stores once their version is activated
+            for document in documents:
+                document.meta["deploy_version"] = deploy_version
+
         documents_written = await self.document_store.write_documents(
             documents=documents, policy=policy
         )
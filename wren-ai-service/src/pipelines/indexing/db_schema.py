@@ -2,8 +2,11 @@ import asyncio
 import logging
 import sys
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+import orjson
+import tiktoken
+from cachetools import TTLCache
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
 from hamilton.function_modifiers import extract_fields
@@ -15,42 +18,39 @@ from tqdm import tqdm
 
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
+from src.pipelines.common import count_ddl_tokens
+from src.pipelines.ddl_cache import DDLCache, TableDDL, build_table_ddls
 from src.pipelines.indexing import AsyncDocumentWriter, DocumentCleaner, MDLValidator
 from src.pipelines.indexing.utils import helper
 
 logger = logging.getLogger("wren-ai-service")
 
 
+def _dumps(payload: Dict[str, Any]) -> str:
+    # store the payload as JSON, so it can be parsed cheaply at retrieval time
+    return orjson.dumps(payload).decode("utf-8")
+
+
 @component
 class DDLChunker:
+    def __init__(self, encoding: Optional[tiktoken.Encoding] = None):
+        self._encoding = encoding
+
     @component.output_types(documents=List[Document])
     async def run(
         self,
         mdl: Dict[str, Any],
         column_batch_size: int,
         project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
     ):
-        def _additional_meta() -> Dict[str, Any]:
-            return {"project_id": project_id} if project_id else {}
-
-        chunks = [
-            {
-                "id": str(uuid.uuid4()),
-                "meta": {
-                    "type": "TABLE_SCHEMA",
-                    "name": chunk["name"],
-                    **_additional_meta(),
-                },
-                "content": chunk["payload"],
-            }
-            for chunk in await self._get_ddl_commands(
-                **mdl, column_batch_size=column_batch_size
-            )
-        ]
+        chunks = await self._get_ddl_commands(
+            **mdl, column_batch_size=column_batch_size, names=names
+        )
 
         return {
             "documents": [
-                Document(**chunk)
+                self._document(chunk, project_id)
                 for chunk in tqdm(
                     chunks,
                     desc=f"Project ID: {project_id}, Chunking DDL commands into documents",
@@ -58,6 +58,56 @@ class DDLChunker:
             ]
         }
 
+    async def stream(
+        self,
+        mdl: Dict[str, Any],
+        column_batch_size: int,
+        batch_size: int,
+        project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> AsyncIterator[List[Document]]:
+        """
+        Yield the documents of `run` in lists of at most `batch_size` documents.
+        The models are converted one at a time, so only the current list is kept in memory.
+        """
+        documents = []
+        async for chunk in self._iter_ddl_commands(
+            **mdl, column_batch_size=column_batch_size, names=names
+        ):
+            documents.append(self._document(chunk, project_id))
+            if len(documents) >= batch_size:
+                yield documents
+                documents = []
+
+        if documents:
+            yield documents
+
+    def _document(self, chunk: Dict[str, Any], project_id: Optional[str]) -> Document:
+        def _additional_meta() -> Dict[str, Any]:
+            return {"project_id": project_id} if project_id else {}
+
+        def _token_meta(payload: Dict[str, Any]) -> Dict[str, Any]:
+            # count the tokens once here, so the retrieval only needs to sum them up
+            if self._encoding is None:
+                return {}
+
+            tokens, column_tokens = count_ddl_tokens(payload, self._encoding)
+            meta = {"tokens": tokens, "token_encoding": self._encoding.name}
+            if payload["type"] == "TABLE_COLUMNS":
+                meta["column_tokens"] = column_tokens
+            return meta
+
+        return Document(
+            id=str(uuid.uuid4()),
+            meta={
+                "type": "TABLE_SCHEMA",
+                "name": chunk["name"],
+                **_additional_meta(),
+                **_token_meta(chunk["payload"]),
+            },
+            content=_dumps(chunk["payload"]),
+        )
+
     async def _model_preprocessor(
         self, models: List[Dict[str, Any]], **kwargs
     ) -> List[Dict[str, Any]]:
@@ -106,24 +156,78 @@ class DDLChunker:
         views: List[Dict[str, Any]],
         metrics: List[Dict[str, Any]],
         column_batch_size: int = 50,
+        names: Optional[List[str]] = None,
         **kwargs,
     ) -> List[dict]:
+        # keep the primary keys of all models, the selected models may reference the others
+        primary_keys_map = {
+            model.get("name", ""): model.get("primaryKey", "") for model in models
+        }
+        models, views, metrics = self._select(models, views, metrics, names)
+
         return (
             self._convert_models_and_relationships(
                 await self._model_preprocessor(models, **kwargs),
                 relationships,
                 column_batch_size,
+                primary_keys_map,
             )
             + self._convert_views(views)
             + self._convert_metrics(metrics)
         )
 
+    async def _iter_ddl_commands(
+        self,
+        models: List[Dict[str, Any]],
+        relationships: List[Dict[str, Any]],
+        views: List[Dict[str, Any]],
+        metrics: List[Dict[str, Any]],
+        column_batch_size: int = 50,
+        names: Optional[List[str]] = None,
+        **kwargs,
+    ) -> AsyncIterator[dict]:
+        # the same commands as _get_ddl_commands, in the same order, one model at a time
+        primary_keys_map = {
+            model.get("name", ""): model.get("primaryKey", "") for model in models
+        }
+        models, views, metrics = self._select(models, views, metrics, names)
+
+        for model in models:
+            for command in self._convert_models_and_relationships(
+                await self._model_preprocessor([model], **kwargs),
+                relationships,
+                column_batch_size,
+                primary_keys_map,
+            ):
+                yield command
+
+        for command in self._convert_views(views) + self._convert_metrics(metrics):
+            yield command
+
+    def _select(
+        self,
+        models: List[Dict[str, Any]],
+        views: List[Dict[str, Any]],
+        metrics: List[Dict[str, Any]],
+        names: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        if names is None:
+            return models, views, metrics
+
+        names = set(names)
+        return (
+            [model for model in models if model.get("name") in names],
+            [view for view in views if view.get("name") in names],
+            [metric for metric in metrics if metric.get("name") in names],
+        )
+
     def _convert_models_and_relationships(
         self,
         models: List[Dict[str, Any]],
         relationships: List[Dict[str, Any]],
         column_batch_size: int,
-    ) -> List[str]:
+        primary_keys_map: Optional[Dict[str, str]] = None,
+    ) -> List[dict]:
         def _model_command(model: Dict[str, Any]) -> dict:
             properties = model.get("properties", {})
 
@@ -139,7 +243,7 @@ class DDLChunker:
                 "comment": comment,
                 "name": table_name,
             }
-            return {"name": table_name, "payload": str(payload)}
+            return {"name": table_name, "payload": payload}
 
         def _column_command(column: Dict[str, Any], model: Dict[str, Any]) -> dict:
             if column.get("relationship"):
@@ -208,18 +312,17 @@ class DDLChunker:
             return [
                 {
                     "name": model["name"],
-                    "payload": str(
-                        {
-                            "type": "TABLE_COLUMNS",
-                            "columns": filtered[i : i + column_batch_size],
-                        }
-                    ),
+                    "payload": {
+                        "type": "TABLE_COLUMNS",
+                        "columns": filtered[i : i + column_batch_size],
+                    },
                 }
                 for i in range(0, len(filtered), column_batch_size)
             ]
 
         # A map to store model primary keys for foreign key relationships
-        primary_keys_map = {model["name"]: model["primaryKey"] for model in models}
+        if primary_keys_map is None:
+            primary_keys_map = {model["name"]: model["primaryKey"] for model in models}
 
         return [
             command
@@ -228,7 +331,7 @@ class DDLChunker:
             + [_model_command(model)]
         ]
 
-    def _convert_views(self, views: List[Dict[str, Any]]) -> List[str]:
+    def _convert_views(self, views: List[Dict[str, Any]]) -> List[dict]:
         def _payload(view: Dict[str, Any]) -> dict:
             return {
                 "type": "VIEW",
@@ -239,11 +342,9 @@ class DDLChunker:
                 "statement": view["statement"],
             }
 
-        return [
-            {"name": view["name"], "payload": str(_payload(view))} for view in views
-        ]
+        return [{"name": view["name"], "payload": _payload(view)} for view in views]
 
-    def _convert_metrics(self, metrics: List[Dict[str, Any]]) -> List[str]:
+    def _convert_metrics(self, metrics: List[Dict[str, Any]]) -> List[dict]:
         def _create_column(name: str, data_type: str, comment: str) -> dict:
             return {
                 "type": "COLUMN",
@@ -281,8 +382,7 @@ class DDLChunker:
             }
 
         return [
-            {"name": metric["name"], "payload": str(_payload(metric))}
-            for metric in metrics
+            {"name": metric["name"], "payload": _payload(metric)} for metric in metrics
         ]
 
 
@@ -300,11 +400,13 @@ async def chunk(
     chunker: DDLChunker,
     column_batch_size: int,
     project_id: Optional[str] = None,
+    names: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
     return await chunker.run(
         mdl=mdl,
         column_batch_size=column_batch_size,
         project_id=project_id,
+        names=names,
     )
 
 
@@ -318,14 +420,20 @@ async def clean(
     embedding: Dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    names: Optional[List[str]] = None,
+    deploy_version: Optional[str] = None,
 ) -> Dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    await cleaner.run(project_id=project_id, names=names, deploy_version=deploy_version)
     return embedding
 
 
 @observe(capture_input=False)
-async def write(clean: Dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: Dict[str, Any],
+    writer: DocumentWriter,
+    deploy_version: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], deploy_version=deploy_version)
 
 
 ## End of Pipeline
@@ -337,15 +445,34 @@ class DBSchema(BasicPipeline):
         embedder_provider: EmbedderProvider,
         document_store_provider: DocumentStoreProvider,
         column_batch_size: int = 50,
+        ddl_cache: Optional[DDLCache] = None,
+        token_encoding: Optional[str] = None,
+        small_schema_token_threshold: int = 0,
+        streaming_concurrency: int = 0,
+        streaming_batch_size: int = 32,
         **kwargs,
     ) -> None:
         dbschema_store = document_store_provider.get_store()
+        self._ddl_cache = ddl_cache
+        self._encoding = (
+            tiktoken.get_encoding(token_encoding) if token_encoding else None
+        )
+        self._small_schema_token_threshold = small_schema_token_threshold
+        # with a concurrency above 0, the documents are embedded and written batch by batch,
+        # with at most that many batches in flight, instead of all at once
+        self._streaming_concurrency = streaming_concurrency
+        self._streaming_batch_size = streaming_batch_size
+        # the names reindexed under a deploy version, along with the small schema to cache,
+        # until the version is activated and the DDL cache can be refreshed
+        self._staged: Dict[
+            Tuple[str, str], Tuple[Optional[List[str]], Optional[List[TableDDL]]]
+        ] = TTLCache(maxsize=1_000, ttl=3600)
 
         self._components = {
             "cleaner": DocumentCleaner([dbschema_store]),
             "validator": MDLValidator(),
             "embedder": embedder_provider.get_document_embedder(),
-            "chunker": DDLChunker(),
+            "chunker": DDLChunker(encoding=self._encoding),
             "writer": AsyncDocumentWriter(
                 document_store=dbschema_store,
                 policy=DuplicatePolicy.OVERWRITE,
@@ -363,25 +490,203 @@ class DBSchema(BasicPipeline):
 
     @observe(name="DB Schema Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: str,
+        project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        deploy_version: Optional[str] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, DB Schema Indexing pipeline is running..."
         )
-        return await self._pipe.execute(
-            [self._final],
-            inputs={
-                "mdl_str": mdl_str,
-                "project_id": project_id,
-                **self._components,
+        previous_schema = (
+            self._ddl_cache.get_schema(project_id) if self._ddl_cache else None
+        )
+        version = None
+        try:
+            if self._streaming_concurrency > 0:
+                documents_written, documents = await self._stream(
+                    mdl_str, project_id, names, deploy_version
+                )
+                result = {self._final: {"documents_written": documents_written}}
+            else:
+                result = await self._pipe.execute(
+                    [self._final, "chunk"],
+                    inputs={
+                        "mdl_str": mdl_str,
+                        "project_id": project_id,
+                        "names": names,
+                        "deploy_version": deploy_version,
+                        **self._components,
+                        **self._configs,
+                    },
+                )
+                documents = result["chunk"]["documents"]
+        finally:
+            # invalidate even if the indexing failed, the documents may have been cleaned already,
+            # unless they were written under a deploy version, which isn't seen until it's activated
+            if self._ddl_cache is not None and deploy_version is None:
+                version = self._ddl_cache.invalidate(project_id, names)
+
+        if self._caches_small_schemas and documents is not None:
+            tables = self._small_schema(project_id, documents, previous_schema, names)
+            if deploy_version is not None:
+                self._staged[(project_id or "", deploy_version)] = (names, tables)
+            elif version is not None and tables is not None:
+                self._ddl_cache.put_schema(project_id, tables, version)
+
+        return {self._final: result[self._final]}
+
+    async def _stream(
+        self,
+        mdl_str: str,
+        project_id: Optional[str],
+        names: Optional[List[str]],
+        deploy_version: Optional[str],
+    ) -> Tuple[int, Optional[List[Document]]]:
+        """
+        Chunk, embed and write the documents batch by batch, so the memory used doesn't grow
+        with the size of the MDL. The previous documents are cleaned before the first batch is
+        written, so they are missing until the last one is, unless blue/green indexing is enabled.
+
+        Returns the number of documents written, and the documents without their embeddings if
+        the schema may be small enough to be kept in the DDL cache.
+        """
+        mdl = self._components["validator"].run(mdl=mdl_str)["mdl"]
+        await self._components["cleaner"].run(
+            project_id=project_id, names=names, deploy_version=deploy_version
+        )
+
+        async def _embed_and_write(documents: List[Document]) -> int:
+            result = await self._components["embedder"].run(documents=documents)
+            result = await self._components["writer"].run(
+                documents=result["documents"], deploy_version=deploy_version
+            )
+            return result["documents_written"]
+
+        # the documents are only kept while their tokens may fit the small schema threshold
+        kept = [] if self._caches_small_schemas else None
+        kept_tokens = 0
+        documents_written = 0
+        tasks = set()
+        try:
+            async for documents in self._components["chunker"].stream(
+                mdl=mdl,
+                batch_size=self._streaming_batch_size,
+                project_id=project_id,
+                names=names,
                 **self._configs,
-            },
+            ):
+                if len(tasks) >= self._streaming_concurrency:
+                    done, tasks = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    documents_written += sum(await asyncio.gather(*done))
+                tasks.add(asyncio.create_task(_embed_and_write(documents)))
+
+                if kept is not None:
+                    kept_tokens += sum(
+                        document.meta.get("tokens", 0) for document in documents
+                    )
+                    if kept_tokens > self._small_schema_token_threshold:
+                        kept = None
+                    else:
+                        kept.extend(
+                            Document(content=document.content, meta=document.meta)
+                            for document in documents
+                        )
+
+            documents_written += sum(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        logger.info(
+            f"Project ID: {project_id}, {documents_written} DB schema documents written"
+        )
+        return documents_written, kept
+
+    @property
+    def _caches_small_schemas(self) -> bool:
+        return (
+            self._ddl_cache is not None
+            and self._encoding is not None
+            and self._small_schema_token_threshold > 0
         )
 
+    def _small_schema(
+        self,
+        project_id: Optional[str],
+        documents: List[Document],
+        previous_schema: Optional[List[TableDDL]],
+        names: Optional[List[str]],
+    ) -> Optional[List[TableDDL]]:
+        """
+        The DDL of the whole schema once the documents are indexed, if it's small enough to be
+        kept in the DDL cache.
+        """
+        if names is None:
+            tables = []
+        elif previous_schema is not None:
+            # only the selected names were reindexed, keep the rest of the schema
+            tables = [table for table in previous_schema if table.name not in names]
+        else:
+            # the rest of the schema is unknown, or too large to be kept
+            return None
+
+        tables += build_table_ddls(
+            [
+                {**document.meta, "content": orjson.loads(document.content)}
+                for document in documents
+            ]
+        )
+        tokens = sum(table.count_tokens(self._encoding) for table in tables)
+        if tokens > self._small_schema_token_threshold:
+            logger.info(
+                f"Project ID: {project_id}, DB schema has {tokens} tokens, "
+                "it will be retrieved from the document store"
+            )
+            return None
+
+        return tables
+
+    def activate_ddl_cache(
+        self, project_id: Optional[str], deploy_version: str
+    ) -> None:
+        """
+        Refresh the DDL cache with the documents written under `deploy_version`, once the version
+        is active, so the asks served before don't cache its DDL, and an aborted one is never kept.
+        Without a staged small schema, e.g. an expired one, the whole project is invalidated.
+        """
+        names, tables = self._staged.pop(
+            (project_id or "", deploy_version), (None, None)
+        )
+        if self._ddl_cache is None:
+            return
+
+        version = self._ddl_cache.invalidate(project_id, names)
+        if tables is not None:
+            self._ddl_cache.put_schema(project_id, tables, version)
+
+    def discard_ddl_cache(self, project_id: Optional[str], deploy_version: str) -> None:
+        self._staged.pop((project_id or "", deploy_version), None)
+        self.invalidate_ddl_cache(project_id)
+
+    def invalidate_ddl_cache(self, project_id: Optional[str] = None) -> None:
+        # for the documents written without this pipeline, e.g. from a snapshot
+        if self._ddl_cache is not None:
+            self._ddl_cache.invalidate(project_id)
+
     @observe(name="Clean Documents for DB Schema")
     async def clean(self, project_id: Optional[str] = None) -> None:
-        await clean(
-            embedding={"documents": []},
-            cleaner=self._components["cleaner"],
-            project_id=project_id,
-        )
+        try:
+            await clean(
+                embedding={"documents": []},
+                cleaner=self._components["cleaner"],
+                project_id=project_id,
+            )
+        finally:
+            if self._ddl_cache is not None:
+                self._ddl_cache.invalidate(project_id)
@@ -119,14 +119,19 @@ async def clean(
     embedding: Dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    deploy_version: Optional[str] = None,
 ) -> Dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    await cleaner.run(project_id=project_id, deploy_version=deploy_version)
     return embedding
 
 
 @observe(capture_input=False)
-async def write(clean: Dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: Dict[str, Any],
+    writer: DocumentWriter,
+    deploy_version: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], deploy_version=deploy_version)
 
 
 ## End of Pipeline
@@ -161,7 +166,10 @@ class HistoricalQuestion(BasicPipeline):
 
     @observe(name="Historical Question Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: str,
+        project_id: Optional[str] = None,
+        deploy_version: Optional[str] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, Historical Question Indexing pipeline is running..."
@@ -171,6 +179,7 @@ class HistoricalQuestion(BasicPipeline):
             inputs={
                 "mdl_str": mdl_str,
                 "project_id": project_id,
+                "deploy_version": deploy_version,
                 **self._components,
                 **self._configs,
             },
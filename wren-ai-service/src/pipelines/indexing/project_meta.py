@@ -50,14 +50,19 @@ async def clean(
     chunk: dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    deploy_version: Optional[str] = None,
 ) -> dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    await cleaner.run(project_id=project_id, deploy_version=deploy_version)
     return chunk
 
 
 @observe(capture_input=False)
-async def write(clean: dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: dict[str, Any],
+    writer: DocumentWriter,
+    deploy_version: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], deploy_version=deploy_version)
 
 
 ## End of Pipeline
@@ -87,7 +92,10 @@ class ProjectMeta(BasicPipeline):
 
     @observe(name="Project Meta Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: str,
+        project_id: Optional[str] = None,
+        deploy_version: Optional[str] = None,
     ) -> dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, Project Meta Indexing pipeline is running..."
@@ -97,6 +105,7 @@ class ProjectMeta(BasicPipeline):
             inputs={
                 "mdl_str": mdl_str,
                 "project_id": project_id,
+                "deploy_version": deploy_version,
                 **self._components,
             },
         )
@@ -22,10 +22,18 @@ logger = logging.getLogger("wren-ai-service")
 @component
 class TableDescriptionChunker:
     @component.output_types(documents=List[Document])
-    def run(self, mdl: Dict[str, Any], project_id: Optional[str] = None):
+    def run(
+        self,
+        mdl: Dict[str, Any],
+        project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ):
         def _additional_meta() -> Dict[str, Any]:
             return {"project_id": project_id} if project_id else {}
 
+        if names is not None:
+            names = set(names)
+
         chunks = [
             {
                 "id": str(uuid.uuid4()),
@@ -37,6 +45,7 @@ class TableDescriptionChunker:
                 "content": str(chunk),
             }
             for chunk in self._get_table_descriptions(mdl)
+            if names is None or chunk["name"] in names
         ]
 
         return {
@@ -88,8 +97,9 @@ def chunk(
     mdl: Dict[str, Any],
     chunker: TableDescriptionChunker,
     project_id: Optional[str] = None,
+    names: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
-    return chunker.run(mdl=mdl, project_id=project_id)
+    return chunker.run(mdl=mdl, project_id=project_id, names=names)
 
 
 @observe(capture_input=False, capture_output=False)
@@ -102,14 +112,20 @@ async def clean(
     embedding: Dict[str, Any],
     cleaner: DocumentCleaner,
     project_id: Optional[str] = None,
+    names: Optional[List[str]] = None,
+    deploy_version: Optional[str] = None,
 ) -> Dict[str, Any]:
-    await cleaner.run(project_id=project_id)
+    await cleaner.run(project_id=project_id, names=names, deploy_version=deploy_version)
     return embedding
 
 
 @observe(capture_input=False)
-async def write(clean: Dict[str, Any], writer: DocumentWriter) -> None:
-    return await writer.run(documents=clean["documents"])
+async def write(
+    clean: Dict[str, Any],
+    writer: DocumentWriter,
+    deploy_version: Optional[str] = None,
+) -> None:
+    return await writer.run(documents=clean["documents"], deploy_version=deploy_version)
 
 
 ## End of Pipeline
@@ -145,7 +161,11 @@ class TableDescription(BasicPipeline):
 
     @observe(name="Table Description Indexing")
     async def run(
-        self, mdl_str: str, project_id: Optional[str] = None
+        self,
+        mdl_str: str,
+        project_id: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        deploy_version: Optional[str] = None,
     ) -> Dict[str, Any]:
         logger.info(
             f"Project ID: {project_id}, Table Description Indexing pipeline is running..."
@@ -155,6 +175,8 @@ class TableDescription(BasicPipeline):
             inputs={
                 "mdl_str": mdl_str,
                 "project_id": project_id,
+                "names": names,
+                "deploy_version": deploy_version,
                 **self._components,
                 **self._configs,
             },
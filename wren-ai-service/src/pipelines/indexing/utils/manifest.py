@@ -0,0 +1,114 @@
+import hashlib
+from typing import Any, Dict, List
+
+import orjson
+from pydantic import BaseModel
+
+
+def _content_hash(payload: Any) -> str:
+    return hashlib.sha256(
+        orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+
+
+def _changed(previous: Dict[str, str], current: Dict[str, str]) -> List[str]:
+    # added, modified and deleted names all need their documents to be (re)indexed
+    return sorted(
+        name
+        for name in previous.keys() | current.keys()
+        if previous.get(name) != current.get(name)
+    )
+
+
+class MDLDiff(BaseModel):
+    models: List[str] = []
+    views: List[str] = []
+    metrics: List[str] = []
+    data_source_changed: bool = False
+    boilerplates_changed: bool = False
+
+    @property
+    def names(self) -> List[str]:
+        return self.models + self.views + self.metrics
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.names or self.data_source_changed or self.boilerplates_changed)
+
+
+class MDLManifest(BaseModel):
+    """
+    The content hashes of an indexed MDL, used to reindex only what changed between deployments.
+
+    The hash of a model also covers its relationships and the primary keys of the related models,
+    since both are part of the DDL documents generated for the model.
+    """
+
+    mdl_hash: str
+    models: Dict[str, str] = {}
+    views: Dict[str, str] = {}
+    metrics: Dict[str, str] = {}
+    data_source: str = ""
+    boilerplates: str = ""
+
+    @classmethod
+    def from_mdl(cls, mdl_hash: str, mdl: Dict[str, Any]) -> "MDLManifest":
+        models = mdl.get("models", [])
+        relationships = mdl.get("relationships", [])
+        primary_keys_map = {
+            model.get("name", ""): model.get("primaryKey", "") for model in models
+        }
+
+        def _model_hash(model: Dict[str, Any]) -> str:
+            related = [
+                relationship
+                for relationship in relationships
+                if model.get("name", "") in relationship.get("models", [])
+            ]
+            return _content_hash(
+                {
+                    "model": model,
+                    "relationships": related,
+                    "primary_keys": {
+                        name: primary_keys_map.get(name, "")
+                        for relationship in related
+                        for name in relationship.get("models", [])
+                    },
+                }
+            )
+
+        return cls(
+            mdl_hash=mdl_hash,
+            models={model.get("name", ""): _model_hash(model) for model in models},
+            views={
+                view.get("name", ""): _content_hash(view)
+                for view in mdl.get("views", [])
+            },
+            metrics={
+                metric.get("name", ""): _content_hash(metric)
+                for metric in mdl.get("metrics", [])
+            },
+            data_source=_content_hash(mdl.get("dataSource", "")),
+            boilerplates=_content_hash(
+                sorted(
+                    {
+                        boilerplate.lower()
+                        for model in models
+                        if (
+                            boilerplate := model.get("properties", {}).get(
+                                "boilerplate"
+                            )
+                        )
+                    }
+                )
+            ),
+        )
+
+    def diff(self, other: "MDLManifest") -> MDLDiff:
+        return MDLDiff(
+            models=_changed(self.models, other.models),
+            views=_changed(self.views, other.views),
+            metrics=_changed(self.metrics, other.metrics),
+            data_source_changed=self.data_source != other.data_source,
+            boilerplates_changed=self.boilerplates != other.boilerplates,
+        )
@@ -0,0 +1,186 @@
+import asyncio
+import io
+import logging
+import uuid
+import zipfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+from haystack import Document
+from haystack.document_stores.types import DocumentStore, DuplicatePolicy
+
+from src.providers.document_store.deploy_versions import (
+    DEPLOY_VERSION_FIELD,
+    VERSIONED_INDEXES,
+    DeployVersions,
+)
+
+logger = logging.getLogger("wren-ai-service")
+
+SNAPSHOT_FORMAT = 1
+# all the collections holding the documents of a project
+SNAPSHOT_INDEXES = (
+    "Document",
+    "table_descriptions",
+    "view_questions",
+    "sql_pairs",
+    "instructions",
+    "project_meta",
+)
+# the fields of Document.to_dict that are not kept in the payloads of a snapshot
+_DROPPED_FIELDS = (
+    "id",
+    "embedding",
+    "sparse_embedding",
+    "score",
+    "dataframe",
+    "blob",
+    DEPLOY_VERSION_FIELD,
+)
+
+
+def _project_filters(project_id: str) -> Dict[str, Any]:
+    return {"field": "project_id", "operator": "==", "value": project_id}
+
+
+async def export_snapshot(stores: Dict[str, DocumentStore], project_id: str) -> bytes:
+    """
+    Dump the documents of a project into a zip archive of three files:
+    - manifest.json: the format, the embedding dimension and the number of documents per collection
+    - payloads.jsonl: the collection, the row of the vector, or null, and the payload of each document
+    - vectors.f32: the embeddings as a contiguous little-endian float32 matrix of shape (rows, dim)
+    """
+    results = await asyncio.gather(
+        *[
+            stores[index]._query_by_filters(
+                filters=_project_filters(project_id), return_embedding=True
+            )
+            for index in SNAPSHOT_INDEXES
+        ]
+    )
+
+    lines = []
+    vectors = []
+    counts = {}
+    for index, documents in zip(SNAPSHOT_INDEXES, results):
+        counts[index] = len(documents)
+        for document in documents:
+            payload = {
+                name: value
+                for name, value in document.to_dict(flatten=True).items()
+                if name not in _DROPPED_FIELDS
+            }
+            row = None
+            if document.embedding is not None:
+                row = len(vectors)
+                vectors.append(document.embedding)
+            lines.append(
+                orjson.dumps({"collection": index, "vector": row, "payload": payload})
+            )
+
+    matrix = np.asarray(vectors, dtype="<f4")
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "project_id": project_id,
+        "embedding_dim": matrix.shape[1] if vectors else 0,
+        "collections": counts,
+    }
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("manifest.json", orjson.dumps(manifest))
+        archive.writestr(
+            "payloads.jsonl", b"\n".join(lines), compress_type=zipfile.ZIP_DEFLATED
+        )
+        # the floats barely compress, store them as they are
+        archive.writestr("vectors.f32", matrix.tobytes())
+
+    logger.info(
+        f"Project ID: {project_id}, exported {len(lines)} documents and {len(vectors)} vectors"
+    )
+    return buffer.getvalue()
+
+
+def _read_snapshot(data: bytes, embedding_dim: int) -> Dict[str, List[Dict[str, Any]]]:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            manifest = orjson.loads(archive.read("manifest.json"))
+            payloads = archive.read("payloads.jsonl")
+            vectors = archive.read("vectors.f32")
+    except (zipfile.BadZipFile, KeyError, orjson.JSONDecodeError) as e:
+        raise ValueError(f"Invalid snapshot: {e}")
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    if vectors and manifest["embedding_dim"] != embedding_dim:
+        raise ValueError(
+            f"The snapshot has {manifest['embedding_dim']}-dimensional embeddings, "
+            f"but the document store expects {embedding_dim}"
+        )
+
+    matrix = (
+        np.frombuffer(vectors, dtype="<f4").reshape(-1, embedding_dim)
+        if vectors
+        else np.zeros((0, embedding_dim), dtype="<f4")
+    )
+    records = {index: [] for index in SNAPSHOT_INDEXES}
+    for line in payloads.splitlines():
+        record = orjson.loads(line)
+        if record["collection"] not in records:
+            raise ValueError(f"Unknown collection in snapshot: {record['collection']}")
+        row = record["vector"]
+        records[record["collection"]].append(
+            {
+                **record["payload"],
+                "embedding": matrix[row].tolist() if row is not None else None,
+            }
+        )
+    return records
+
+
+async def import_snapshot(
+    stores: Dict[str, DocumentStore],
+    project_id: str,
+    data: bytes,
+    deploy_versions: Optional[DeployVersions] = None,
+) -> Dict[str, int]:
+    """
+    Replace the documents of a project by the ones of a snapshot, possibly exported from another
+    project, without embedding them again. The documents get new ids, so a project can be copied
+    within the same document store.
+
+    With blue/green indexing, the documents of the versioned collections are written under a new
+    deploy version, activated once all the collections are written.
+    """
+    records = _read_snapshot(data, stores["Document"].embedding_dim)
+    version = await deploy_versions.begin(project_id) if deploy_versions else None
+
+    async def _import(index: str) -> int:
+        store = stores[index]
+        meta = {"project_id": project_id}
+        if version is not None and index in VERSIONED_INDEXES:
+            meta[DEPLOY_VERSION_FIELD] = version
+        else:
+            await store.delete_documents(_project_filters(project_id))
+
+        documents = [
+            Document.from_dict({**record, **meta, "id": str(uuid.uuid4())})
+            for record in records[index]
+        ]
+        if documents:
+            await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+        return len(documents)
+
+    try:
+        counts = await asyncio.gather(*[_import(index) for index in SNAPSHOT_INDEXES])
+    except Exception:
+        if version is not None:
+            deploy_versions.abort(project_id, version)
+        raise
+
+    if version is not None:
+        await deploy_versions.activate(project_id, version)
+
+    logger.info(f"Project ID: {project_id}, imported {sum(counts)} documents")
+    return dict(zip(SNAPSHOT_INDEXES, counts))
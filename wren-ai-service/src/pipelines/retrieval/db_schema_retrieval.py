@@ -1,4 +1,3 @@
-import ast
 import logging
 import sys
 from typing import Any, Optional
@@ -7,18 +6,19 @@ import orjson
 import tiktoken
 from hamilton import base
 from hamilton.async_driver import AsyncDriver
-from haystack import Document
 from haystack.components.builders.prompt_builder import PromptBuilder
 from langfuse.decorators import observe
 from pydantic import BaseModel
 
+from src.core.embedding import embed_query
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider, LLMProvider
 from src.pipelines.common import (
-    build_table_ddl,
     clean_up_new_lines,
-    get_engine_supported_data_type,
+    get_token_encoding,
+    parse_schema_content,
 )
+from src.pipelines.ddl_cache import DDLCache, TableDDL, build_table_ddls
 from src.utils import trace_cost
 from src.web.v1.services.ask import AskHistory
 
@@ -99,47 +99,57 @@ table_columns_selection_user_prompt_template = """
 """
 
 
-def _build_metric_ddl(content: dict) -> str:
-    columns_ddl = [
-        f"{column['comment']}{column['name']} {get_engine_supported_data_type(column['data_type'])}"
-        for column in content["columns"]
-        if column["data_type"].lower()
-        != "unknown"  # quick fix: filtering out UNKNOWN column type
-    ]
-
-    return (
-        f"{content['comment']}CREATE TABLE {content['name']} (\n  "
-        + ",\n  ".join(columns_ddl)
-        + "\n);"
-    )
-
+## Start of Pipeline
+@observe(capture_input=False, capture_output=False)
+def small_schema(
+    project_id: str, tables: list[str], ddl_cache: Optional[DDLCache]
+) -> Optional[list[TableDDL]]:
+    # the whole schema of a small project is kept by the indexing, no need to search it
+    schema = ddl_cache.get_schema(project_id) if ddl_cache else None
+    if schema is None:
+        return None
 
-def _build_view_ddl(content: dict) -> str:
-    return (
-        f"{content['comment']}CREATE VIEW {content['name']}\nAS {content['statement']}"
-    )
+    logger.info(f"Project ID: {project_id}, using the whole DB schema")
+    if tables:
+        tables = set(tables)
+        return [table for table in schema if table.name in tables]
+    return schema
 
 
-## Start of Pipeline
 @observe(capture_input=False, capture_output=False)
-async def embedding(query: str, embedder: Any, histories: list[AskHistory]) -> dict:
+async def embedding(
+    query: str,
+    embedder: Any,
+    histories: list[AskHistory],
+    small_schema: Optional[list[TableDDL]],
+) -> dict:
+    if small_schema is not None:
+        return {}
+
     if query:
         if histories:
             previous_query_summaries = [history.question for history in histories]
         else:
             previous_query_summaries = []
 
-        query = "\n".join(previous_query_summaries) + "\n" + query
+        query = "\n".join(previous_query_summaries + [query])
 
-        return await embedder.run(query)
+        return await embed_query(embedder, query, stage="db_schema_retrieval")
     else:
         return {}
 
 
 @observe(capture_input=False)
 async def table_retrieval(
-    embedding: dict, project_id: str, tables: list[str], table_retriever: Any
+    embedding: dict,
+    project_id: str,
+    tables: list[str],
+    table_retriever: Any,
+    small_schema: Optional[list[TableDDL]],
 ) -> dict:
+    if small_schema is not None:
+        return {}
+
     filters = {
         "operator": "AND",
         "conditions": [
@@ -170,25 +180,29 @@ async def table_retrieval(
 
 @observe(capture_input=False)
 async def dbschema_retrieval(
-    table_retrieval: dict, project_id: str, dbschema_retriever: Any
-) -> list[Document]:
+    table_retrieval: dict,
+    project_id: str,
+    dbschema_retriever: Any,
+    ddl_cache: Optional[DDLCache],
+    small_schema: Optional[list[TableDDL]],
+) -> list[TableDDL]:
+    if small_schema is not None:
+        return small_schema
+
     tables = table_retrieval.get("documents", [])
-    table_names = []
-    for table in tables:
-        content = ast.literal_eval(table.content)
-        table_names.append(content["name"])
-
-    table_name_conditions = [
-        {"field": "name", "operator": "==", "value": table_name}
-        for table_name in table_names
-    ]
+    table_names = list(dict.fromkeys(table.meta["name"] for table in tables))
+    if not table_names:
+        return []
+
+    cached = ddl_cache.get(project_id, table_names) if ddl_cache else {}
+    if missing_names := [name for name in table_names if name not in cached]:
+        version = ddl_cache.version(project_id) if ddl_cache else 0
 
-    if table_name_conditions:
         filters = {
             "operator": "AND",
             "conditions": [
                 {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
-                {"operator": "OR", "conditions": table_name_conditions},
+                {"field": "name", "operator": "in", "value": missing_names},
             ],
         }
 
@@ -197,90 +211,53 @@ async def dbschema_retrieval(
                 {"field": "project_id", "operator": "==", "value": project_id}
             )
 
-        results = await dbschema_retriever.run(query_embedding=[], filters=filters)
-        return results["documents"]
-
-    return []
-
-
-@observe()
-def construct_db_schemas(dbschema_retrieval: list[Document]) -> list[dict]:
-    db_schemas = {}
-    for document in dbschema_retrieval:
-        content = ast.literal_eval(document.content)
-        if content["type"] == "TABLE":
-            if document.meta["name"] not in db_schemas:
-                db_schemas[document.meta["name"]] = content
-            else:
-                db_schemas[document.meta["name"]] = {
-                    **content,
-                    "columns": db_schemas[document.meta["name"]].get("columns", []),
+        results = await dbschema_retriever.fetch_payloads(
+            filters=filters,
+            payload_fields=["name", "content", "tokens", "token_encoding"],
+        )
+        table_ddls = build_table_ddls(
+            [
+                {
+                    **payload,
+                    "content": parse_schema_content(payload["content"]),
                 }
-        elif content["type"] == "TABLE_COLUMNS":
-            if document.meta["name"] not in db_schemas:
-                db_schemas[document.meta["name"]] = {"columns": content["columns"]}
-            else:
-                if "columns" not in db_schemas[document.meta["name"]]:
-                    db_schemas[document.meta["name"]]["columns"] = content["columns"]
-                else:
-                    db_schemas[document.meta["name"]]["columns"] += content["columns"]
+                for payload in results["payloads"]
+            ]
+        )
 
-    # remove incomplete schemas
-    db_schemas = {k: v for k, v in db_schemas.items() if "type" in v and "columns" in v}
+        if ddl_cache:
+            ddl_cache.put(project_id, table_ddls, version)
+        cached = {**cached, **{table_ddl.name: table_ddl for table_ddl in table_ddls}}
 
-    return list(db_schemas.values())
+    # models first, then views and metrics, each in the order of the table retrieval
+    results = [cached[name] for name in table_names if name in cached]
+    return [table for table in results if table.type == "TABLE"] + [
+        table for table in results if table.type != "TABLE"
+    ]
 
 
 @observe(capture_input=False)
 def check_using_db_schemas_without_pruning(
-    construct_db_schemas: list[dict],
-    dbschema_retrieval: list[Document],
+    dbschema_retrieval: list[TableDDL],
     encoding: tiktoken.Encoding,
     enable_column_pruning: bool,
     context_window_size: int,
 ) -> dict:
-    retrieval_results = []
-    has_calculated_field = False
-    has_metric = False
-    has_json_field = False
-
-    for table_schema in construct_db_schemas:
-        if table_schema["type"] == "TABLE":
-            ddl, _has_calculated_field, _has_json_field = build_table_ddl(table_schema)
-            retrieval_results.append(
-                {
-                    "table_name": table_schema["name"],
-                    "table_ddl": ddl,
-                }
-            )
-            if _has_calculated_field:
-                has_calculated_field = True
-            if _has_json_field:
-                has_json_field = True
-
-    for document in dbschema_retrieval:
-        content = ast.literal_eval(document.content)
-
-        if content["type"] == "METRIC":
-            retrieval_results.append(
-                {
-                    "table_name": content["name"],
-                    "table_ddl": _build_metric_ddl(content),
-                }
-            )
-            has_metric = True
-        elif content["type"] == "VIEW":
-            retrieval_results.append(
-                {
-                    "table_name": content["name"],
-                    "table_ddl": _build_view_ddl(content),
-                }
-            )
-
-    table_ddls = [
-        retrieval_result["table_ddl"] for retrieval_result in retrieval_results
+    retrieval_results = [
+        {
+            "table_name": table.name,
+            "table_ddl": table.ddl,
+        }
+        for table in dbschema_retrieval
     ]
-    _token_count = len(encoding.encode(" ".join(table_ddls)))
+    has_calculated_field = any(
+        table.has_calculated_field for table in dbschema_retrieval
+    )
+    has_metric = any(table.type == "METRIC" for table in dbschema_retrieval)
+    has_json_field = any(table.has_json_field for table in dbschema_retrieval)
+
+    # the token counts are stored at indexing time, or counted once per cached table
+    _token_count = sum(table.count_tokens(encoding) for table in dbschema_retrieval)
     if _token_count > context_window_size or enable_column_pruning:
         return {
             "db_schemas": [],
@@ -302,15 +279,14 @@ def check_using_db_schemas_without_pruning(
 @observe(capture_input=False)
 def prompt(
     query: str,
-    construct_db_schemas: list[dict],
+    dbschema_retrieval: list[TableDDL],
     prompt_builder: PromptBuilder,
     check_using_db_schemas_without_pruning: dict,
     histories: list[AskHistory],
 ) -> dict:
     if not check_using_db_schemas_without_pruning["db_schemas"]:
         db_schemas = [
-            build_table_ddl(construct_db_schema)[0]
-            for construct_db_schema in construct_db_schemas
+            table.ddl for table in dbschema_retrieval if table.type == "TABLE"
         ]
 
         previous_query_summaries = (
@@ -342,8 +318,7 @@ async def filter_columns_in_tables(
 def construct_retrieval_results(
     check_using_db_schemas_without_pruning: dict,
     filter_columns_in_tables: dict,
-    construct_db_schemas: list[dict],
-    dbschema_retrieval: list[Document],
+    dbschema_retrieval: list[TableDDL],
 ) -> dict[str, Any]:
     if filter_columns_in_tables:
         columns_and_tables_needed = orjson.loads(
@@ -362,46 +337,30 @@ def construct_retrieval_results(
         has_metric = False
         has_json_field = False
 
-        for table_schema in construct_db_schemas:
-            if table_schema["type"] == "TABLE" and table_schema["name"] in tables:
-                ddl, _has_calculated_field, _has_json_field = build_table_ddl(
-                    table_schema,
-                    columns=set(
-                        columns_and_tables_needed[table_schema["name"]]["columns"]
-                    ),
+        for table in dbschema_retrieval:
+            if table.name not in tables:
+                continue
+
+            if table.type == "TABLE":
+                ddl, _has_calculated_field, _has_json_field = table.prune(
+                    columns=set(columns_and_tables_needed[table.name]["columns"]),
                     tables=tables,
                 )
                 if _has_calculated_field:
                     has_calculated_field = True
                 if _has_json_field:
                     has_json_field = True
-
-                retrieval_results.append(
-                    {
-                        "table_name": table_schema["name"],
-                        "table_ddl": ddl,
-                    }
-                )
-
-        for document in dbschema_retrieval:
-            if document.meta["name"] in columns_and_tables_needed:
-                content = ast.literal_eval(document.content)
-
-                if content["type"] == "METRIC":
-                    retrieval_results.append(
-                        {
-                            "table_name": content["name"],
-                            "table_ddl": _build_metric_ddl(content),
-                        }
-                    )
+            else:
+                ddl = table.ddl
+                if table.type == "METRIC":
                     has_metric = True
-                elif content["type"] == "VIEW":
-                    retrieval_results.append(
-                        {
-                            "table_name": content["name"],
-                            "table_ddl": _build_view_ddl(content),
-                        }
-                    )
+
+            retrieval_results.append(
+                {
+                    "table_name": table.name,
+                    "table_ddl": ddl,
+                }
+            )
 
         return {
             "retrieval_results": retrieval_results,
@@ -457,6 +416,7 @@ class DbSchemaRetrieval(BasicPipeline):
         document_store_provider: DocumentStoreProvider,
         table_retrieval_size: int = 10,
         table_column_retrieval_size: int = 100,
+        ddl_cache: Optional[DDLCache] = None,
         **kwargs,
     ):
         self._components = {
@@ -464,6 +424,7 @@ class DbSchemaRetrieval(BasicPipeline):
             "table_retriever": document_store_provider.get_retriever(
                 document_store_provider.get_store(dataset_name="table_descriptions"),
                 top_k=table_retrieval_size,
+                payload_fields=["name"],
             ),
             "dbschema_retriever": document_store_provider.get_retriever(
                 document_store_provider.get_store(),
@@ -477,17 +438,11 @@ class DbSchemaRetrieval(BasicPipeline):
             "prompt_builder": PromptBuilder(
                 template=table_columns_selection_user_prompt_template
             ),
+            "ddl_cache": ddl_cache,
         }
 
-        # for the first time, we need to load the encodings
-        _model = llm_provider.get_model()
-        if "gpt-4o" in _model or "gpt-4o-mini" in _model:
-            _encoding = tiktoken.get_encoding("o200k_base")
-        else:
-            _encoding = tiktoken.get_encoding("cl100k_base")
-
         self._configs = {
-            "encoding": _encoding,
+            "encoding": get_token_encoding(llm_provider.get_model()),
             "context_window_size": llm_provider.get_context_window_size(),
         }
 
@@ -8,6 +8,7 @@ from haystack import Document, component
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
 from langfuse.decorators import observe
 
+from src.core.embedding import embed_query
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
 from src.pipelines.common import ScoreFilter
@@ -55,20 +56,20 @@ async def count_documents(
 
 
 @observe(capture_input=False, capture_output=False)
-async def embedding(count_documents: int, query: str, embedder: Any) -> dict:
-    if count_documents:
-        return await embedder.run(query)
-
-    return {}
+async def embedding(query: str, embedder: Any) -> dict:
+    # runs along with count_documents, the question is embedded once per ask anyway
+    return await embed_query(embedder, query, stage="historical_question")
 
 
 @observe(capture_input=False)
 async def retrieval(
+    count_documents: int,
     embedding: dict,
     project_id: str,
     view_questions_retriever: Any,
+    historical_question_retrieval_similarity_threshold: float,
 ) -> dict:
-    if embedding:
+    if count_documents and embedding:
         filters = (
             {
                 "operator": "AND",
@@ -83,6 +84,7 @@ async def retrieval(
         view_question_res = await view_questions_retriever.run(
             query_embedding=embedding.get("embedding"),
             filters=filters,
+            score_threshold=historical_question_retrieval_similarity_threshold,
         )
         return dict(documents=view_question_res.get("documents"))
 
@@ -133,6 +135,7 @@ class HistoricalQuestionRetrieval(BasicPipeline):
             "embedder": embedder_provider.get_text_embedder(),
             "view_questions_retriever": document_store_provider.get_retriever(
                 document_store=view_questions_store,
+                payload_fields=["content", "summary", "statement", "sql", "viewId"],
             ),
             "score_filter": ScoreFilter(),
             # TODO: add a llm filter to filter out low scoring document, in case ScoreFilter is not accurate enough
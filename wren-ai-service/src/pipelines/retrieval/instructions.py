@@ -8,6 +8,7 @@ from haystack import Document, component
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
 from langfuse.decorators import observe
 
+from src.core.embedding import embed_query
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
 from src.pipelines.common import ScoreFilter
@@ -54,16 +55,21 @@ async def count_documents(
 
 
 @observe(capture_input=False, capture_output=False)
-async def embedding(count_documents: int, query: str, embedder: Any) -> dict:
-    if count_documents:
-        return await embedder.run(query)
-
-    return {}
+async def embedding(query: str, embedder: Any) -> dict:
+    # embedded along with the count, the embedding of the question is shared by the
+    # retrievals of the same ask, so it's rarely wasted when there are no documents
+    return await embed_query(embedder, query, stage="instructions_retrieval")
 
 
 @observe(capture_input=False)
-async def retrieval(embedding: dict, project_id: str, retriever: Any) -> dict:
-    if not embedding:
+async def retrieval(
+    count_documents: int,
+    embedding: dict,
+    project_id: str,
+    retriever: Any,
+    similarity_threshold: float,
+) -> dict:
+    if not count_documents or not embedding:
         return {}
 
     filters = {
@@ -81,6 +87,7 @@ async def retrieval(embedding: dict, project_id: str, retriever: Any) -> dict:
     res = await retriever.run(
         query_embedding=embedding.get("embedding"),
         filters=filters,
+        score_threshold=similarity_threshold,
     )
     return dict(documents=res.get("documents"))
 
@@ -160,6 +167,7 @@ class Instructions(BasicPipeline):
             "embedder": embedder_provider.get_text_embedder(),
             "retriever": document_store_provider.get_retriever(
                 document_store=store,
+                payload_fields=["content", "instruction", "instruction_id"],
             ),
             "score_filter": ScoreFilter(),
             "output_formatter": OutputFormatter(),
@@ -8,6 +8,7 @@ from haystack import Document, component
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
 from langfuse.decorators import observe
 
+from src.core.embedding import embed_query
 from src.core.pipeline import BasicPipeline
 from src.core.provider import DocumentStoreProvider, EmbedderProvider
 from src.pipelines.common import ScoreFilter
@@ -53,16 +54,20 @@ async def count_documents(
 
 
 @observe(capture_input=False, capture_output=False)
-async def embedding(count_documents: int, query: str, embedder: Any) -> dict:
-    if count_documents:
-        return await embedder.run(query)
-
-    return {}
+async def embedding(query: str, embedder: Any) -> dict:
+    # not waiting for count_documents, both run at once
+    return await embed_query(embedder, query, stage="sql_pairs_retrieval")
 
 
 @observe(capture_input=False)
-async def retrieval(embedding: dict, project_id: str, retriever: Any) -> dict:
-    if embedding:
+async def retrieval(
+    count_documents: int,
+    embedding: dict,
+    project_id: str,
+    retriever: Any,
+    sql_pairs_similarity_threshold: float,
+) -> dict:
+    if count_documents and embedding:
         filters = (
             {
                 "operator": "AND",
@@ -77,6 +82,7 @@ async def retrieval(embedding: dict, project_id: str, retriever: Any) -> dict:
         res = await retriever.run(
             query_embedding=embedding.get("embedding"),
             filters=filters,
+            score_threshold=sql_pairs_similarity_threshold,
         )
         return dict(documents=res.get("documents"))
 
@@ -128,6 +134,7 @@ class SqlPairsRetrieval(BasicPipeline):
             "embedder": embedder_provider.get_text_embedder(),
             "retriever": document_store_provider.get_retriever(
                 document_store=store,
+                payload_fields=["content", "sql"],
             ),
             "score_filter": ScoreFilter(),
             # TODO: add a llm filter to filter out low scoring document, in case ScoreFilter is not accurate enough
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from cachetools import TTLCache
+from haystack import Document
+from haystack.document_stores.types import DocumentStore, DuplicatePolicy
+
+logger = logging.getLogger("wren-ai-service")
+
+# the collections entirely rewritten by prepare_semantics, thus indexed under a deploy version
+# the sql pairs and instructions are also written through their own APIs, so they are not versioned
+VERSIONED_INDEXES = ("Document", "table_descriptions", "view_questions", "project_meta")
+DEPLOY_VERSION_FIELD = "deploy_version"
+# the time a version was begun at, recorded along with it in the deploy_versions collection
+BEGUN_AT_FIELD = "begun_at"
+
+
+def project_filters(project_id: Optional[str]) -> Dict[str, Any]:
+    """
+    The filters of the documents of a project. The documents indexed without a project_id have
+    no project_id field, which both stores match with an `==` condition on None.
+    """
+    return {"field": "project_id", "operator": "==", "value": project_id or None}
+
+
+def _project_meta(project_id: Optional[str]) -> Dict[str, Any]:
+    # like the indexing pipelines, no project_id field is written without a project_id
+    return {"project_id": project_id} if project_id else {}
+
+
+def get_filtered_project_id(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    The project_id the filters are restricted to by an `==` condition, alone or within an AND.
+    """
+    if not filters:
+        return None
+
+    if (
+        filters.get("field") in ("project_id", "meta.project_id")
+        and filters.get("operator") == "=="
+    ):
+        return filters["value"]
+
+    if filters.get("operator") == "AND":
+        for condition in filters.get("conditions", []):
+            if (project_id := get_filtered_project_id(condition)) is not None:
+                return project_id
+
+    return None
+
+
+class DeployVersions:
+    """
+    The active deploy version of each project, for blue/green indexing.
+
+    prepare_semantics writes the documents of the VERSIONED_INDEXES under a new deploy version,
+    and activates it once all the pipelines are done, so the asks never see a partial schema.
+    The stores only return the documents of the active version of a project, or the ones without
+    a version if the project has none yet, which were written before blue/green indexing was
+    enabled. The documents of the versions begun before the active one are removed in the
+    background, `ttl` seconds after the activation, once no process reads them anymore; the ones
+    begun after it may still be written by another process, so they are kept.
+
+    The active versions are kept in their own collection, one document per project, and cached
+    for `ttl` seconds, along with a document per begun version, until it is removed.
+    """
+
+    def __init__(
+        self,
+        store: DocumentStore,
+        maxsize: int = 1_000_000,
+        ttl: int = 10,
+    ):
+        self._store = store
+        self._ttl = ttl
+        self._versions: Dict[str, Optional[str]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._stores: Dict[str, DocumentStore] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def register(self, index: str, store: DocumentStore) -> None:
+        self._stores[index] = store
+
+    async def _query(self, project_id: Optional[str]) -> List[Document]:
+        return await self._store._query_by_filters(filters=project_filters(project_id))
+
+    async def get(self, project_id: Optional[str]) -> Optional[str]:
+        key = project_id or ""
+        if key not in self._versions:
+            active = next(
+                (
+                    document
+                    for document in await self._query(project_id)
+                    if document.id == f"{DEPLOY_VERSION_FIELD}-{key}"
+                ),
+                None,
+            )
+            self._versions[key] = (
+                active.meta.get(DEPLOY_VERSION_FIELD) if active else None
+            )
+        return self._versions[key]
+
+    async def with_active_version(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Restricts the filters to the active version of the project they are restricted to,
+        where a None value stands for the documents without a version.
+        """
+        version = await self.get(get_filtered_project_id(filters))
+        condition = {"field": DEPLOY_VERSION_FIELD, "operator": "==", "value": version}
+        if not filters:
+            return condition
+        return {"operator": "AND", "conditions": [filters, condition]}
+
+    async def begin(self, project_id: Optional[str]) -> str:
+        key = project_id or ""
+        version = uuid.uuid4().hex
+        # recorded before any document is written, so every process knows it's not stale yet
+        await self._store.write_documents(
+            [
+                Document(
+                    id=f"{DEPLOY_VERSION_FIELD}-{key}-{version}",
+                    meta={
+                        **_project_meta(project_id),
+                        DEPLOY_VERSION_FIELD: version,
+                        BEGUN_AT_FIELD: time.time(),
+                    },
+                )
+            ],
+            policy=DuplicatePolicy.OVERWRITE,
+        )
+        return version
+
+    def abort(self, project_id: Optional[str], version: str) -> None:
+        # the documents written so far are removed once a later version is activated
+        logger.info(f"Project ID: {project_id}, deploy version {version} is aborted")
+
+    async def activate(self, project_id: Optional[str], version: str) -> None:
+        key = project_id or ""
+        # a single point is written, so the readers see either the previous version or this one
+        await self._store.write_documents(
+            [
+                Document(
+                    id=f"{DEPLOY_VERSION_FIELD}-{key}",
+                    meta={**_project_meta(project_id), DEPLOY_VERSION_FIELD: version},
+                )
+            ],
+            policy=DuplicatePolicy.OVERWRITE,
+        )
+        self._versions[key] = version
+        logger.info(f"Project ID: {project_id}, deploy version {version} is active")
+
+        task = asyncio.create_task(self._remove_stale_versions_later(project_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def remove(self, project_id: Optional[str]) -> None:
+        await self._store.delete_documents(project_filters(project_id))
+        self._versions.pop(project_id or "", None)
+
+    async def _remove_stale_versions_later(self, project_id: Optional[str]) -> None:
+        # the other processes may read the previous version until their cache expires
+        await asyncio.sleep(self._ttl)
+        try:
+            await self.remove_stale_versions(project_id)
+        except Exception as e:
+            logger.exception(
+                f"Project ID: {project_id}, failed to remove stale deploy versions: {e}"
+            )
+
+    async def remove_stale_versions(self, project_id: Optional[str]) -> None:
+        if (version := await self.get(project_id)) is None:
+            return
+
+        begun = {
+            document.meta[DEPLOY_VERSION_FIELD]: document.meta[BEGUN_AT_FIELD]
+            for document in await self._query(project_id)
+            if BEGUN_AT_FIELD in document.meta
+        }
+        if (active_begun_at := begun.get(version)) is None:
+            # the active version isn't recorded, the others can't be told apart
+            return
+
+        stale = [
+            begun_version
+            for begun_version, begun_at in begun.items()
+            if begun_at < active_begun_at
+        ]
+        # the versions begun after the active one may still be written by another process
+        kept = [
+            begun_version
+            for begun_version, begun_at in begun.items()
+            if begun_at >= active_begun_at
+        ]
+
+        logger.info(f"Project ID: {project_id}, removing stale deploy versions")
+        filters = {
+            "operator": "AND",
+            "conditions": [
+                project_filters(project_id),
+                {"field": DEPLOY_VERSION_FIELD, "operator": "not in", "value": kept},
+            ],
+        }
+        await asyncio.gather(
+            *[store.delete_documents(filters) for store in self._stores.values()]
+        )
+        if stale:
+            await self._store.delete_documents(
+                {
+                    "operator": "AND",
+                    "conditions": [
+                        project_filters(project_id),
+                        {
+                            "field": DEPLOY_VERSION_FIELD,
+                            "operator": "in",
+                            "value": stale,
+                        },
+                    ],
+                }
+            )
@@ -0,0 +1,615 @@
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import orjson
+from haystack import Document, component
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+
+from src.core.provider import DocumentStoreProvider
+from src.providers.document_store.deploy_versions import (
+    VERSIONED_INDEXES,
+    DeployVersions,
+)
+from src.providers.loader import provider
+
+logger = logging.getLogger("wren-ai-service")
+
+# the payload fields used in the filters of the pipelines, which are indexed
+INDEXED_FIELDS = (
+    "project_id",
+    "type",
+    "name",
+    "is_default",
+    "sql_pair_id",
+    "instruction_id",
+    "deploy_version",
+)
+_MIN_CAPACITY = 1024
+
+
+class NumpyDocumentStore:
+    """
+    An in-process document store for a single collection, a drop-in for AsyncQdrantDocumentStore
+    on single-node installs and in tests.
+
+    The L2-normalized embeddings are kept in a float32 matrix, searched by cosine similarity
+    with a single matrix-vector product. The payloads are kept in memory, with an inverted index
+    of the INDEXED_FIELDS to evaluate the filters. Only `==`, `in`, `not in`, `AND` and `OR` are
+    supported.
+
+    With a `path`, the collection lives in `<path>/<index>/` and consists of three files:
+    - vectors.f32: a memory-mapped float32 matrix of shape (capacity, dim)
+    - payloads.jsonl: an append-only log of the written and deleted rows, compacted when it
+      grows past twice the number of documents
+    - meta.json: the dimension and capacity of the collection
+    """
+
+    def __init__(
+        self,
+        index: str = "Document",
+        embedding_dim: int = 768,
+        path: Optional[str] = None,
+        recreate_index: bool = False,
+        deploy_versions: Optional[DeployVersions] = None,
+    ):
+        self.index = index
+        self.deploy_versions = deploy_versions
+        self.embedding_dim = embedding_dim
+        self._dir = (
+            Path(path) / re.sub(r"[^A-Za-z0-9_.-]", "_", index) if path else None
+        )
+
+        self._capacity = 0
+        self._vectors = np.zeros((0, embedding_dim), dtype=np.float32)
+        self._has_vector = np.zeros(0, dtype=bool)
+        self._payloads: Dict[int, Dict[str, Any]] = {}
+        self._rows: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._indexes: Dict[str, Dict[Any, Set[int]]] = {
+            field: {} for field in INDEXED_FIELDS
+        }
+        self._log_lines = 0
+
+        if self._dir is not None:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            if recreate_index:
+                self._remove_files()
+            self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self._dir / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self._dir / "vectors.f32"
+
+    @property
+    def _log_path(self) -> Path:
+        return self._dir / "payloads.jsonl"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": f"{self.__class__.__module__}.{self.__class__.__name__}",
+            "init_parameters": {
+                "index": self.index,
+                "embedding_dim": self.embedding_dim,
+                "path": str(self._dir.parent) if self._dir else None,
+            },
+        }
+
+    def _remove_files(self) -> None:
+        for path in (self._vectors_path, self._log_path, self._meta_path):
+            path.unlink(missing_ok=True)
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+
+        meta = orjson.loads(self._meta_path.read_bytes())
+        if meta["dim"] != self.embedding_dim:
+            raise ValueError(
+                f"Collection '{self.index}' already exists at {self._dir}, "
+                f"but it is configured with a vector size '{meta['dim']}'. "
+                "If you want to use that collection, but with a different "
+                "vector size, please set `recreate_index=True` argument."
+            )
+
+        self._capacity = meta["capacity"]
+        self._open()
+        self._has_vector = np.zeros(self._capacity, dtype=bool)
+
+        with open(self._log_path, "rb") as f:
+            for line in f:
+                record = orjson.loads(line)
+                self._log_lines += 1
+                if "deleted" in record:
+                    for row in record["deleted"]:
+                        self._unset_row(row)
+                else:
+                    # an overwritten document keeps its row
+                    self._unset_row(record["row"])
+                    self._set_row(record["row"], record["payload"], record["vector"])
+
+        used_rows = set(self._payloads)
+        self._free_rows = [
+            row for row in reversed(range(self._capacity)) if row not in used_rows
+        ]
+
+        logger.info(
+            f"Loaded collection '{self.index}' at {self._dir} with {len(self._rows)} documents"
+        )
+
+    def _open(self) -> None:
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r+",
+            shape=(self._capacity, self.embedding_dim),
+        )
+
+    def _grow(self, capacity: int) -> None:
+        previous_capacity, self._capacity = self._capacity, capacity
+        if self._dir is None:
+            vectors = np.zeros((capacity, self.embedding_dim), dtype=np.float32)
+            vectors[:previous_capacity] = self._vectors
+            self._vectors = vectors
+        else:
+            if previous_capacity:
+                self._vectors.flush()
+            self._vectors = None
+            # extending the file fills the new rows with zeros
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(
+                    capacity * self.embedding_dim * np.dtype(np.float32).itemsize
+                )
+            self._open()
+
+        self._has_vector = np.concatenate(
+            [self._has_vector, np.zeros(capacity - previous_capacity, dtype=bool)]
+        )
+        self._free_rows.extend(reversed(range(previous_capacity, capacity)))
+
+    def _allocate_row(self) -> int:
+        if not self._free_rows:
+            self._grow(max(_MIN_CAPACITY, self._capacity * 2))
+        return self._free_rows.pop()
+
+    def _set_row(self, row: int, payload: Dict[str, Any], has_vector: bool) -> None:
+        self._payloads[row] = payload
+        self._rows[payload["id"]] = row
+        self._has_vector[row] = has_vector
+        for field, index in self._indexes.items():
+            if field in payload:
+                try:
+                    index.setdefault(payload[field], set()).add(row)
+                except TypeError:
+                    # unhashable values can't be filtered on
+                    pass
+
+    def _unset_row(self, row: int) -> None:
+        payload = self._payloads.pop(row, None)
+        if payload is None:
+            return
+
+        if self._rows.get(payload["id"]) == row:
+            del self._rows[payload["id"]]
+        self._has_vector[row] = False
+        for field, index in self._indexes.items():
+            if field not in payload:
+                continue
+            try:
+                rows = index.get(payload[field])
+            except TypeError:
+                continue
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del index[payload[field]]
+
+    def _append_log(self, records: List[Dict[str, Any]]) -> None:
+        if self._dir is None or not records:
+            return
+
+        # the vectors are flushed first, so the log never refers to unwritten rows
+        self._vectors.flush()
+        with open(self._log_path, "ab") as f:
+            f.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
+        self._log_lines += len(records)
+
+        if self._log_lines > max(_MIN_CAPACITY, 2 * len(self._payloads)):
+            self._compact_log()
+        self._persist_meta()
+
+    def _compact_log(self) -> None:
+        tmp_path = self._log_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for row, payload in self._payloads.items():
+                f.write(
+                    orjson.dumps(
+                        {
+                            "row": row,
+                            "payload": payload,
+                            "vector": bool(self._has_vector[row]),
+                        }
+                    )
+                    + b"\n"
+                )
+        os.replace(tmp_path, self._log_path)
+        self._log_lines = len(self._payloads)
+
+    def _persist_meta(self) -> None:
+        # write the meta file atomically, so a crash never leaves a half-written file behind
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_bytes(
+            orjson.dumps({"dim": self.embedding_dim, "capacity": self._capacity})
+        )
+        os.replace(tmp_path, self._meta_path)
+
+    def _match(self, filters: Optional[Dict[str, Any]]) -> Optional[Set[int]]:
+        """
+        Evaluate the filters into the matching rows, None meaning all the rows.
+        """
+        if not filters:
+            return None
+
+        if "field" not in filters:
+            operator = filters.get("operator")
+            conditions = [self._match(c) for c in filters.get("conditions", [])]
+            if operator == "AND":
+                conditions = [rows for rows in conditions if rows is not None]
+                if not conditions:
+                    return None
+                return set.intersection(*sorted(conditions, key=len))
+            elif operator == "OR":
+                if any(rows is None for rows in conditions):
+                    return None
+                return set().union(*conditions)
+            raise ValueError(f"Unsupported logical operator: {operator}")
+
+        field = filters["field"].removeprefix("meta.")
+        operator = filters["operator"]
+        if operator == "==":
+            values = [filters["value"]]
+        elif operator in ("in", "not in"):
+            values = filters["value"]
+        else:
+            raise ValueError(f"Unsupported comparison operator: {operator}")
+
+        if field not in self._indexes:
+            rows = {
+                row
+                for row, payload in self._payloads.items()
+                if payload.get(field) in values
+            }
+        else:
+            index = self._indexes[field]
+            rows = set()
+            for value in values:
+                if value is None:
+                    rows |= {
+                        row
+                        for row, payload in self._payloads.items()
+                        if field not in payload
+                    }
+                else:
+                    rows |= index.get(value, set())
+
+        if operator == "not in":
+            # like Qdrant, the rows without the field match the negated condition
+            return set(self._payloads) - rows
+        return rows
+
+    def _documents(
+        self,
+        rows: List[int],
+        scores: Optional[List[float]] = None,
+        return_embedding: bool = False,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Document]:
+        scores = scores if scores is not None else [None] * len(rows)
+        return [
+            Document.from_dict(
+                {
+                    **self._project(self._payloads[row], payload_fields),
+                    "score": score,
+                    "embedding": (
+                        self._vectors[row].tolist()
+                        if return_embedding and self._has_vector[row]
+                        else None
+                    ),
+                }
+            )
+            for row, score in zip(rows, scores)
+        ]
+
+    def _project(
+        self, payload: Dict[str, Any], payload_fields: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        if not payload_fields:
+            return dict(payload)
+        return {field: payload[field] for field in payload_fields if field in payload}
+
+    async def _with_active_version(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        if self.deploy_versions is None:
+            return filters
+        return await self.deploy_versions.with_active_version(filters)
+
+    async def _query_by_embedding(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        scale_score: bool = True,
+        return_embedding: bool = False,
+        score_threshold: Optional[float] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Document]:
+        matched = self._match(await self._with_active_version(filters))
+        if matched is None:
+            rows = np.flatnonzero(self._has_vector)
+        else:
+            rows = np.fromiter(matched, dtype=np.int64, count=len(matched))
+            rows = rows[self._has_vector[rows]]
+        if not len(rows):
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self._vectors[rows] @ query
+
+        if len(rows) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        scores = scores[top].astype(float)
+        if scale_score:
+            scores = (scores + 1) / 2
+        if score_threshold is not None:
+            kept = scores >= score_threshold
+            top, scores = top[kept], scores[kept]
+        return self._documents(
+            rows[top].tolist(),
+            scores.tolist(),
+            return_embedding=return_embedding,
+            payload_fields=["id", *payload_fields] if payload_fields else None,
+        )
+
+    async def _query_by_filters(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+        return_embedding: bool = False,
+    ) -> List[Document]:
+        # like the Qdrant store, all the matching documents are returned
+        matched = self._match(await self._with_active_version(filters))
+        return self._documents(
+            sorted(self._payloads if matched is None else matched),
+            return_embedding=return_embedding,
+            payload_fields=["id", *payload_fields] if payload_fields else None,
+        )
+
+    async def _query_payloads_by_filters(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        matched = self._match(await self._with_active_version(filters))
+        return [
+            self._project(self._payloads[row], payload_fields)
+            for row in sorted(self._payloads if matched is None else matched)
+        ]
+
+    async def count_documents(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        matched = self._match(await self._with_active_version(filters))
+        return len(self._payloads) if matched is None else len(matched)
+
+    async def delete_documents(self, filters: Optional[Dict[str, Any]] = None):
+        matched = self._match(filters)
+        rows = sorted(self._payloads if matched is None else matched)
+        for row in rows:
+            self._unset_row(row)
+        self._free_rows.extend(rows)
+        self._append_log([{"deleted": rows}] if rows else [])
+
+    async def write_documents(
+        self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.FAIL
+    ):
+        for doc in documents:
+            if not isinstance(doc, Document):
+                msg = f"DocumentStore.write_documents() expects a list of Documents but got an element of {type(doc)}."
+                raise ValueError(msg)
+
+        if len(documents) == 0:
+            logger.warning(
+                "Calling NumpyDocumentStore.write_documents() with empty list"
+            )
+            return
+
+        if policy in (DuplicatePolicy.FAIL, DuplicatePolicy.NONE):
+            if duplicates := [doc.id for doc in documents if doc.id in self._rows]:
+                raise DuplicateDocumentError(
+                    f"IDs '{duplicates}' already exist in the document store."
+                )
+        elif policy == DuplicatePolicy.SKIP:
+            documents = [doc for doc in documents if doc.id not in self._rows]
+
+        records = []
+        for document in documents:
+            payload = document.to_dict(flatten=True)
+            embedding = payload.pop("embedding", None)
+            payload.pop("sparse_embedding", None)
+            payload.pop("score", None)
+
+            if (row := self._rows.get(document.id)) is not None:
+                self._unset_row(row)
+            else:
+                row = self._allocate_row()
+
+            if embedding is not None:
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._vectors[row] = vector / (np.linalg.norm(vector) or 1.0)
+            self._set_row(row, payload, embedding is not None)
+            records.append(
+                {"row": row, "payload": payload, "vector": embedding is not None}
+            )
+
+        self._append_log(records)
+        return len(documents)
+
+
+@component
+class NumpyEmbeddingRetriever:
+    def __init__(
+        self,
+        document_store: NumpyDocumentStore,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        scale_score: bool = True,
+        return_embedding: bool = False,
+        score_threshold: Optional[float] = None,
+        payload_fields: Optional[List[str]] = None,
+    ):
+        self._document_store = document_store
+        self._filters = filters
+        self._top_k = top_k
+        self._scale_score = scale_score
+        self._return_embedding = return_embedding
+        self._score_threshold = score_threshold
+        self._payload_fields = payload_fields
+
+    @component.output_types(documents=List[Document])
+    async def run(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        scale_score: Optional[bool] = None,
+        return_embedding: Optional[bool] = None,
+        score_threshold: Optional[float] = None,
+    ):
+        if query_embedding:
+            docs = await self._document_store._query_by_embedding(
+                query_embedding=query_embedding,
+                filters=filters or self._filters,
+                top_k=top_k or self._top_k,
+                scale_score=scale_score or self._scale_score,
+                return_embedding=return_embedding or self._return_embedding,
+                score_threshold=(
+                    score_threshold
+                    if score_threshold is not None
+                    else self._score_threshold
+                ),
+                payload_fields=self._payload_fields,
+            )
+        else:
+            docs = await self._document_store._query_by_filters(
+                filters=filters,
+                top_k=top_k,
+                payload_fields=self._payload_fields,
+            )
+
+        return {"documents": docs}
+
+    async def fetch_payloads(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "payloads": await self._document_store._query_payloads_by_filters(
+                filters=filters,
+                top_k=top_k,
+                payload_fields=payload_fields,
+            )
+        }
+
+
+@provider("numpy_store")
+class NumpyStoreProvider(DocumentStoreProvider):
+    def __init__(
+        self,
+        path: Optional[str] = os.getenv("NUMPY_STORE_PATH", None),
+        embedding_model_dim: int = (
+            int(os.getenv("EMBEDDING_MODEL_DIMENSION"))
+            if os.getenv("EMBEDDING_MODEL_DIMENSION")
+            else 0
+        ),
+        recreate_index: bool = (
+            bool(os.getenv("SHOULD_FORCE_DEPLOY"))
+            if os.getenv("SHOULD_FORCE_DEPLOY")
+            else False
+        ),
+        blue_green_indexing: bool = False,
+        **_,
+    ):
+        self._path = path
+        self._embedding_model_dim = embedding_model_dim
+        self._stores: Dict[str, NumpyDocumentStore] = {}
+        if not path:
+            logger.warning("NUMPY_STORE_PATH is not set, documents are kept in memory")
+        self._deploy_versions: Optional[DeployVersions] = None
+        if blue_green_indexing:
+            # set up before the versioned collections, which filter their reads by the active versions
+            self._deploy_versions = DeployVersions(
+                self.get_store(
+                    dataset_name="deploy_versions", recreate_index=recreate_index
+                )
+            )
+        self._reset_document_store(recreate_index)
+
+    def _reset_document_store(self, recreate_index: bool):
+        self.get_store(recreate_index=recreate_index)
+        self.get_store(dataset_name="table_descriptions", recreate_index=recreate_index)
+        self.get_store(dataset_name="view_questions", recreate_index=recreate_index)
+        self.get_store(dataset_name="sql_pairs", recreate_index=recreate_index)
+        self.get_store(dataset_name="instructions", recreate_index=recreate_index)
+        self.get_store(dataset_name="project_meta", recreate_index=recreate_index)
+
+    def get_store(
+        self,
+        dataset_name: Optional[str] = None,
+        recreate_index: bool = False,
+    ):
+        index = dataset_name or "Document"
+        if recreate_index or index not in self._stores:
+            deploy_versions = (
+                self._deploy_versions if index in VERSIONED_INDEXES else None
+            )
+            self._stores[index] = NumpyDocumentStore(
+                index=index,
+                embedding_dim=self._embedding_model_dim,
+                path=self._path,
+                recreate_index=recreate_index,
+                deploy_versions=deploy_versions,
+            )
+            if deploy_versions is not None:
+                deploy_versions.register(index, self._stores[index])
+        return self._stores[index]
+
+    def get_retriever(
+        self,
+        document_store: NumpyDocumentStore,
+        top_k: int = 10,
+        payload_fields: Optional[List[str]] = None,
+        # the vectors are not quantized, the quantization settings of the qdrant retrievers are ignored
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+    ):
+        return NumpyEmbeddingRetriever(
+            document_store=document_store,
+            top_k=top_k,
+            payload_fields=payload_fields,
+        )
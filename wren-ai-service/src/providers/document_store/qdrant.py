@@ -1,8 +1,11 @@
+import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
+import orjson
 import qdrant_client
 from haystack import Document, component
 from haystack.document_stores.types import DuplicatePolicy
@@ -22,13 +25,45 @@ from haystack_integrations.document_stores.qdrant.filters import (
     convert_filters_to_qdrant,
 )
 from qdrant_client.http import models as rest
+from qdrant_client.http.exceptions import UnexpectedResponse
 from tqdm import tqdm
 
+from src.core.deadline import within_deadline
 from src.core.provider import DocumentStoreProvider
+from src.providers.document_store.deploy_versions import (
+    DEPLOY_VERSION_FIELD,
+    VERSIONED_INDEXES,
+    DeployVersions,
+    get_filtered_project_id,
+)
 from src.providers.loader import provider
 
 logger = logging.getLogger("wren-ai-service")
 
+# the payload fields filtered on by the pipelines, indexed per collection
+# every collection is partitioned by project_id, see
+# https://qdrant.tech/documentation/guides/multiple-partitions/?q=mul#calibrate-performance
+PAYLOAD_INDEXES: Dict[str, Dict[str, str]] = {
+    "Document": {"type": "keyword", "name": "keyword", "deploy_version": "keyword"},
+    "table_descriptions": {
+        "type": "keyword",
+        "name": "keyword",
+        "deploy_version": "keyword",
+    },
+    "view_questions": {"deploy_version": "keyword"},
+    "sql_pairs": {"sql_pair_id": "keyword"},
+    "instructions": {"is_default": "bool", "instruction_id": "keyword"},
+    "project_meta": {"deploy_version": "keyword"},
+}
+
+
+def get_payload_fields_to_index(index: str) -> List[dict]:
+    fields = {"project_id": "keyword", **PAYLOAD_INDEXES.get(index, {})}
+    return [
+        {"field_name": field_name, "field_schema": field_schema}
+        for field_name, field_schema in fields.items()
+    ]
+
 
 def convert_haystack_documents_to_qdrant_points(
     documents: List[Document],
@@ -63,6 +98,184 @@ def convert_haystack_documents_to_qdrant_points(
     return points
 
 
+# none: all the projects share the shards of a collection, filtered by the project_id payload
+# project_id: a custom shard key per project
+# bucket: a custom shard key per hash bucket of the project_id
+TENANT_SHARDING_MODES = ("none", "project_id", "bucket")
+# the shard key of the documents without a project_id
+DEFAULT_SHARD_KEY = "default"
+
+
+# the HNSW graphs built for a tenancy mode, and the beam size of the searches
+# single: one graph for the whole collection, for deployments with one project or without project_id
+# multi: a graph per project_id instead of a global one, as the searches are filtered by project
+# see https://qdrant.tech/documentation/guides/multiple-partitions/?q=mul#calibrate-performance
+HNSW_CONFIGS: Dict[str, Dict[str, int]] = {
+    "single": {"m": 16, "payload_m": 0, "ef_construct": 100, "hnsw_ef": 128},
+    "multi": {"m": 0, "payload_m": 16, "ef_construct": 100, "hnsw_ef": 128},
+}
+
+
+def get_hnsw_config(
+    tenancy: str,
+    m: Optional[int] = None,
+    ef_construct: Optional[int] = None,
+    hnsw_ef: Optional[int] = None,
+) -> Tuple[rest.HnswConfigDiff, int]:
+    """
+    Returns the HNSW config of the collections and the `hnsw_ef` of the searches for the tenancy
+    mode, with the given parameters overriding the ones of the mode. `m` is the degree of the
+    graphs built for the mode, the global one or the ones per project.
+    """
+    if tenancy not in HNSW_CONFIGS:
+        raise ValueError(
+            f"Invalid tenancy '{tenancy}', expected one of {', '.join(HNSW_CONFIGS)}"
+        )
+
+    config = dict(HNSW_CONFIGS[tenancy])
+    if m is not None:
+        config["m" if tenancy == "single" else "payload_m"] = m
+    if ef_construct is not None:
+        config["ef_construct"] = ef_construct
+    if hnsw_ef is not None:
+        config["hnsw_ef"] = hnsw_ef
+
+    return (
+        rest.HnswConfigDiff(
+            m=config["m"],
+            payload_m=config["payload_m"],
+            ef_construct=config["ef_construct"],
+        ),
+        config["hnsw_ef"],
+    )
+
+
+QUANTIZATION_MODES = ("auto", "none", "scalar", "product", "binary")
+# the candidates found with the quantized vectors per result, rescored with the original vectors
+DEFAULT_OVERSAMPLING = {"scalar": 1.5, "product": 2.0, "binary": 3.0}
+
+
+def get_quantization_config(
+    quantization: str, embedding_dim: int, product_compression: str = "x16"
+) -> Optional[rest.QuantizationConfig]:
+    """
+    Returns the quantization config of the collections, with int8 scalar quantization cutting the
+    RAM of the vectors by 4x, and product quantization by the `product_compression` ratio.
+    `auto` uses binary quantization from 1024 dimensions, and no quantization below.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(
+            f"Invalid quantization '{quantization}', "
+            f"expected one of {', '.join(QUANTIZATION_MODES)}"
+        )
+
+    if quantization == "auto":
+        # reference: https://qdrant.tech/articles/binary-quantization/#when-should-you-not-use-bq
+        quantization = "binary" if embedding_dim >= 1024 else "none"
+
+    if quantization == "scalar":
+        return rest.ScalarQuantization(
+            scalar=rest.ScalarQuantizationConfig(
+                type=rest.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        )
+    if quantization == "product":
+        return rest.ProductQuantization(
+            product=rest.ProductQuantizationConfig(
+                compression=rest.CompressionRatio(product_compression),
+                always_ram=True,
+            )
+        )
+    if quantization == "binary":
+        return rest.BinaryQuantization(
+            binary=rest.BinaryQuantizationConfig(
+                always_ram=True,
+            )
+        )
+    return None
+
+
+def get_quantization_mode(
+    quantization_config: Optional[Union[dict, rest.QuantizationConfig]],
+) -> Optional[str]:
+    if isinstance(quantization_config, dict):
+        return next(iter(quantization_config), None)
+    if isinstance(quantization_config, rest.ScalarQuantization):
+        return "scalar"
+    if isinstance(quantization_config, rest.ProductQuantization):
+        return "product"
+    if isinstance(quantization_config, rest.BinaryQuantization):
+        return "binary"
+    return None
+
+
+def is_config_applied(config: Any, current: Any) -> bool:
+    # the current config of a collection also holds the defaults of the fields which are not set
+    if isinstance(config, dict):
+        return isinstance(current, dict) and all(
+            is_config_applied(value, current.get(name))
+            for name, value in config.items()
+        )
+    return config == current
+
+
+def shard_key_selector(shard_key: Optional[str]) -> Dict[str, str]:
+    # only given to the client when set, requests without it go to all the shards
+    return {"shard_key_selector": shard_key} if shard_key is not None else {}
+
+
+def with_payload_fields(payload_fields: Optional[List[str]]) -> Union[bool, List[str]]:
+    # the id is always fetched, as it is needed to convert a point back to a Document
+    return list(dict.fromkeys(["id", *payload_fields])) if payload_fields else True
+
+
+def convert_filters(
+    filters: Union[Dict[str, Any], rest.Filter, None],
+) -> Optional[rest.Filter]:
+    """
+    convert_filters_to_qdrant, where an `==` condition on None matches the points without the
+    field, as in the numpy store, e.g. the documents indexed without a project_id.
+    """
+    if not isinstance(filters, dict):
+        return convert_filters_to_qdrant(filters)
+
+    if "field" in filters and filters["operator"] == "==" and filters["value"] is None:
+        return rest.Filter(
+            must=[
+                rest.IsEmptyCondition(
+                    is_empty=rest.PayloadField(
+                        key=filters["field"].removeprefix("meta.")
+                    )
+                )
+            ]
+        )
+    if filters.get("operator") == "AND":
+        return rest.Filter(
+            must=[convert_filters(condition) for condition in filters["conditions"]]
+        )
+    return convert_filters_to_qdrant(filters)
+
+
+def estimate_point_bytes(point: rest.PointStruct) -> int:
+    """
+    Estimate the size of a point in an upsert request, from its JSON payload and
+    about 20 bytes per float of its vectors.
+    """
+
+    def _vector_size(vector: Any) -> int:
+        if isinstance(vector, dict):
+            return sum(_vector_size(v) for v in vector.values())
+        if isinstance(vector, rest.SparseVector):
+            return len(vector.indices) + len(vector.values)
+        return len(vector)
+
+    return (
+        len(orjson.dumps(point.payload, default=str)) + _vector_size(point.vector) * 20
+    )
+
+
 class AsyncQdrantDocumentStore(QdrantDocumentStore):
     def __init__(
         self,
@@ -101,7 +314,30 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         write_batch_size: int = 100,
         scroll_size: int = 10_000,
         payload_fields_to_index: Optional[List[dict]] = None,
+        client: Optional[qdrant_client.QdrantClient] = None,
+        async_client: Optional[qdrant_client.AsyncQdrantClient] = None,
+        write_batch_bytes: int = 4 * 1024 * 1024,
+        write_concurrency: int = 4,
+        tenant_sharding: str = "none",
+        tenant_shard_buckets: int = 16,
+        hnsw_ef: Optional[int] = None,
+        deploy_versions: Optional[DeployVersions] = None,
     ):
+        if payload_fields_to_index is None:
+            payload_fields_to_index = get_payload_fields_to_index(index)
+
+        if tenant_sharding not in TENANT_SHARDING_MODES:
+            raise ValueError(
+                f"Invalid tenant_sharding '{tenant_sharding}', "
+                f"expected one of {', '.join(TENANT_SHARDING_MODES)}"
+            )
+        # set before the collection is set up, which creates it with custom sharding
+        self.tenant_sharding = tenant_sharding
+        self.tenant_shard_buckets = tenant_shard_buckets
+        # the shard keys of the collection, loaded from Qdrant on first use
+        self._shard_keys: Optional[set] = None
+        self._shard_keys_lock = asyncio.Lock()
+
         super(AsyncQdrantDocumentStore, self).__init__(
             location=location,
             url=url,
@@ -140,7 +376,21 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             payload_fields_to_index=payload_fields_to_index,
         )
 
-        self.async_client = qdrant_client.AsyncQdrantClient(
+        if client is not None:
+            # share the given client, and set up the collection as the lazily created client would
+            self._client = client
+            self._set_up_collection(
+                index,
+                embedding_dim,
+                recreate_index,
+                similarity,
+                use_sparse_embeddings,
+                sparse_idf,
+                on_disk,
+                payload_fields_to_index,
+            )
+
+        self.async_client = async_client or qdrant_client.AsyncQdrantClient(
             location=location,
             url=url,
             port=port,
@@ -156,11 +406,293 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             metadata=metadata or {},
         )
 
-        # to improve the indexing performance
-        # see https://qdrant.tech/documentation/guides/multiple-partitions/?q=mul#calibrate-performance
-        self.client.create_payload_index(
-            collection_name=index, field_name="project_id", field_schema="keyword"
+        # the payload indexes are only created along with a new collection,
+        # so create them for an existing one too, which is a no-op for existing indexes
+        for payload_index in payload_fields_to_index:
+            self.client.create_payload_index(
+                collection_name=index,
+                field_name=payload_index["field_name"],
+                field_schema=payload_index["field_schema"],
+            )
+
+        if not recreate_index:
+            self._update_collection_config(hnsw_config, quantization_config)
+        # the size of the beam of the searches, the default of the collection if None
+        self.hnsw_ef = hnsw_ef
+        self.quantization = get_quantization_mode(quantization_config)
+        # the reads of a versioned collection only return the active version of a project
+        self.deploy_versions = deploy_versions
+
+        # a batch is capped by both write_batch_size points and write_batch_bytes
+        self.write_batch_bytes = write_batch_bytes
+        self.write_concurrency = write_concurrency
+
+        # the collection is set up above, writes only check it once through the async client
+        self._collection_checked = False
+        self._collection_lock = asyncio.Lock()
+
+    async def _check_collection(self) -> None:
+        if self._collection_checked:
+            return
+
+        async with self._collection_lock:
+            if self._collection_checked:
+                return
+
+            if await self.async_client.collection_exists(self.index):
+                collection_info = await self.async_client.get_collection(self.index)
+                self._check_collection_config(collection_info)
+            else:
+                # the collection was removed after the store was set up, create it off the event loop
+                await asyncio.to_thread(
+                    self._set_up_collection,
+                    self.index,
+                    self.embedding_dim,
+                    False,
+                    self.similarity,
+                    self.use_sparse_embeddings,
+                    self.sparse_idf,
+                    self.on_disk,
+                    self.payload_fields_to_index,
+                )
+
+            self._collection_checked = True
+
+    def _recreate_collection(
+        self,
+        collection_name: str,
+        distance,
+        embedding_dim: int,
+        on_disk: Optional[bool] = None,
+        use_sparse_embeddings: Optional[bool] = None,
+        sparse_idf: bool = False,
+    ):
+        if self.tenant_sharding == "none":
+            return super(AsyncQdrantDocumentStore, self)._recreate_collection(
+                collection_name,
+                distance,
+                embedding_dim,
+                on_disk,
+                use_sparse_embeddings,
+                sparse_idf,
+            )
+
+        # same as the base class, but with the points placed by custom shard keys
+        if on_disk is None:
+            on_disk = self.on_disk
+        if use_sparse_embeddings is None:
+            use_sparse_embeddings = self.use_sparse_embeddings
+
+        vectors_config = rest.VectorParams(
+            size=embedding_dim, on_disk=on_disk, distance=distance
+        )
+        sparse_vectors_config = None
+        if use_sparse_embeddings:
+            vectors_config = {DENSE_VECTORS_NAME: vectors_config}
+            sparse_vectors_config = {
+                SPARSE_VECTORS_NAME: rest.SparseVectorParams(
+                    index=rest.SparseIndexParams(on_disk=on_disk),
+                    modifier=rest.Modifier.IDF if sparse_idf else None,
+                ),
+            }
+
+        if self.client.collection_exists(collection_name):
+            self.client.delete_collection(collection_name)
+
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=vectors_config,
+            sparse_vectors_config=sparse_vectors_config,
+            shard_number=self.shard_number,
+            sharding_method=rest.ShardingMethod.CUSTOM,
+            replication_factor=self.replication_factor,
+            write_consistency_factor=self.write_consistency_factor,
+            on_disk_payload=self.on_disk_payload,
+            hnsw_config=self.hnsw_config,
+            optimizers_config=self.optimizers_config,
+            wal_config=self.wal_config,
+            quantization_config=self.quantization_config,
+            # deprecated by Qdrant, only given when set
+            **({"init_from": self.init_from} if self.init_from else {}),
         )
+        self._shard_keys = set()
+
+    def _update_collection_config(
+        self,
+        hnsw_config: Optional[Union[dict, rest.HnswConfigDiff]],
+        quantization_config: Optional[rest.QuantizationConfig],
+    ) -> None:
+        # like the payload indexes, these configs are only set along with a new collection
+        if hnsw_config is None and quantization_config is None:
+            return
+
+        config = self.client.get_collection(self.index).config
+        updates = {}
+
+        if isinstance(hnsw_config, dict):
+            hnsw_config = rest.HnswConfigDiff(**hnsw_config)
+        if hnsw_config is not None:
+            changes = {
+                name: value
+                for name, value in hnsw_config.model_dump(exclude_none=True).items()
+                if getattr(config.hnsw_config, name, None) != value
+            }
+            if changes:
+                updates["hnsw_config"] = rest.HnswConfigDiff(**changes)
+
+        # a quantization is only turned off by recreating the collection
+        current_quantization = getattr(config, "quantization_config", None)
+        if hasattr(quantization_config, "model_dump") and not is_config_applied(
+            quantization_config.model_dump(exclude_none=True),
+            current_quantization.model_dump() if current_quantization else None,
+        ):
+            updates["quantization_config"] = quantization_config
+
+        if updates:
+            # Qdrant rebuilds the graphs and the quantized vectors in the background
+            logger.info(f"Updating the config of {self.index}: {updates}")
+            self.client.update_collection(collection_name=self.index, **updates)
+
+    def get_shard_key(self, project_id: Optional[str]) -> Optional[str]:
+        if self.tenant_sharding == "none":
+            return None
+
+        if self.tenant_sharding == "bucket":
+            # crc32 rather than hash(), which differs between the processes of the service
+            bucket = zlib.crc32(str(project_id or "").encode("utf-8"))
+            return f"bucket-{bucket % self.tenant_shard_buckets}"
+
+        return str(project_id) if project_id else DEFAULT_SHARD_KEY
+
+    async def _load_shard_keys(self) -> None:
+        await self._check_collection()
+
+        cluster_info = await self.async_client.collection_cluster_info(self.index)
+        self._shard_keys = {
+            str(shard.shard_key)
+            for shard in [*cluster_info.local_shards, *cluster_info.remote_shards]
+            if shard.shard_key is not None
+        }
+
+    async def _ensure_shard_key(self, shard_key: str) -> None:
+        if self._shard_keys is None:
+            await self._load_shard_keys()
+        if shard_key in self._shard_keys:
+            return
+
+        async with self._shard_keys_lock:
+            if shard_key in self._shard_keys:
+                return
+
+            try:
+                await self.async_client.create_shard_key(
+                    self.index,
+                    shard_key=shard_key,
+                    shards_number=self.shard_number,
+                    replication_factor=self.replication_factor,
+                )
+            except UnexpectedResponse as e:
+                # created by another replica of the service in the meantime
+                if "already exists" not in str(e):
+                    raise
+            self._shard_keys.add(shard_key)
+
+    async def _get_read_shard_key(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Returns whether the filters can match any point, and the shard key to send the request to,
+        or None to send it to all the shards.
+        """
+        project_id = get_filtered_project_id(filters)
+        if self.tenant_sharding == "none" or project_id is None:
+            return True, None
+
+        shard_key = self.get_shard_key(project_id)
+        if self._shard_keys is None or shard_key not in self._shard_keys:
+            # the shard key may have been created by another replica of the service
+            await self._load_shard_keys()
+        return shard_key in self._shard_keys, shard_key
+
+    async def _with_active_version(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Union[Dict[str, Any], rest.Filter, None]:
+        """
+        Restricts the filters of a versioned collection to the active version of the project,
+        as a Qdrant filter since the haystack filters cannot match the documents without a version.
+        """
+        if self.deploy_versions is None:
+            return filters
+
+        version = await self.deploy_versions.get(get_filtered_project_id(filters))
+        condition = (
+            rest.FieldCondition(
+                key=DEPLOY_VERSION_FIELD, match=rest.MatchValue(value=version)
+            )
+            if version is not None
+            else rest.IsEmptyCondition(
+                is_empty=rest.PayloadField(key=DEPLOY_VERSION_FIELD)
+            )
+        )
+        qdrant_filters = convert_filters(filters)
+        return rest.Filter(
+            must=[condition, qdrant_filters] if qdrant_filters else [condition]
+        )
+
+    def _check_collection_config(self, collection_info: rest.CollectionInfo) -> None:
+        sharding_method = getattr(
+            collection_info.config.params, "sharding_method", None
+        )
+        if (sharding_method == rest.ShardingMethod.CUSTOM) != (
+            self.tenant_sharding != "none"
+        ):
+            msg = (
+                f"Collection '{self.index}' already exists in Qdrant, "
+                f"but it is {'not ' if sharding_method != rest.ShardingMethod.CUSTOM else ''}"
+                "sharded by tenant. If you want to use that collection with "
+                f"`tenant_sharding='{self.tenant_sharding}'`, please set `recreate_index=True` argument."
+            )
+            raise document_store.QdrantStoreError(msg)
+
+        vectors = collection_info.config.params.vectors
+        has_named_vectors = isinstance(vectors, dict) and DENSE_VECTORS_NAME in vectors
+
+        if self.use_sparse_embeddings and not has_named_vectors:
+            msg = (
+                f"Collection '{self.index}' already exists in Qdrant, "
+                "but it has been originally created without sparse embedding vectors. "
+                "If you want to use that collection, you can set `use_sparse_embeddings=False`."
+            )
+            raise document_store.QdrantStoreError(msg)
+        elif not self.use_sparse_embeddings and has_named_vectors:
+            msg = (
+                f"Collection '{self.index}' already exists in Qdrant, "
+                "but it has been originally created with sparse embedding vectors. "
+                "If you want to use that collection, you can set `use_sparse_embeddings=True`."
+            )
+            raise document_store.QdrantStoreError(msg)
+
+        if has_named_vectors:
+            vectors = vectors[DENSE_VECTORS_NAME]
+
+        distance = self.get_distance(self.similarity)
+        if vectors.distance != distance:
+            msg = (
+                f"Collection '{self.index}' already exists in Qdrant, "
+                f"but it is configured with a similarity '{vectors.distance.name}'. "
+                f"If you want to use that collection, but with a different "
+                f"similarity, please set `recreate_index=True` argument."
+            )
+            raise ValueError(msg)
+
+        if vectors.size != self.embedding_dim:
+            msg = (
+                f"Collection '{self.index}' already exists in Qdrant, "
+                f"but it is configured with a vector size '{vectors.size}'. "
+                f"If you want to use that collection, but with a different "
+                f"vector size, please set `recreate_index=True` argument."
+            )
+            raise ValueError(msg)
 
     async def _query_by_embedding(
         self,
@@ -169,30 +701,49 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         top_k: int = 10,
         scale_score: bool = True,
         return_embedding: bool = False,
+        score_threshold: Optional[float] = None,
+        payload_fields: Optional[List[str]] = None,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
     ) -> List[Document]:
-        qdrant_filters = convert_filters_to_qdrant(filters)
-
-        points = await self.async_client.search(
-            collection_name=self.index,
-            query_vector=rest.NamedVector(
-                name=DENSE_VECTORS_NAME if self.use_sparse_embeddings else "",
-                vector=query_embedding,
-            ),
-            search_params=(
-                rest.SearchParams(
-                    quantization=rest.QuantizationSearchParams(
-                        rescore=True,
-                        oversampling=3.0,
-                    ),
-                )
-                if len(query_embedding)
-                >= 1024  # reference: https://qdrant.tech/articles/binary-quantization/#when-should-you-not-use-bq
-                else None
-            ),
-            query_filter=qdrant_filters,
-            limit=top_k,
-            with_vectors=return_embedding,
+        matches, shard_key = await self._get_read_shard_key(filters)
+        if not matches:
+            return []
+
+        filters = await self._with_active_version(filters)
+        qdrant_filters = convert_filters(filters)
+        raw_score_threshold = (
+            self._raw_score_threshold(score_threshold, scale_score)
+            if score_threshold is not None
+            else None
         )
+
+        async with within_deadline():
+            points = await self.async_client.search(
+                collection_name=self.index,
+                query_vector=rest.NamedVector(
+                    name=DENSE_VECTORS_NAME if self.use_sparse_embeddings else "",
+                    vector=query_embedding,
+                ),
+                search_params=rest.SearchParams(
+                    hnsw_ef=self.hnsw_ef,
+                    quantization=(
+                        rest.QuantizationSearchParams(
+                            rescore=True if rescore is None else rescore,
+                            oversampling=oversampling
+                            or DEFAULT_OVERSAMPLING.get(self.quantization),
+                        )
+                        if self.quantization
+                        else None
+                    ),
+                ),
+                query_filter=qdrant_filters,
+                limit=top_k,
+                with_payload=with_payload_fields(payload_fields),
+                with_vectors=return_embedding,
+                score_threshold=raw_score_threshold,
+                **shard_key_selector(shard_key),
+            )
         results = [
             convert_qdrant_point_to_haystack_document(
                 point, use_sparse_embeddings=self.use_sparse_embeddings
@@ -207,23 +758,57 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 else:
                     score = float(1 / (1 + np.exp(-score / 100)))
                 document.score = score
+        if score_threshold is not None and raw_score_threshold is None:
+            results = [
+                document for document in results if document.score >= score_threshold
+            ]
         return results
 
+    def _raw_score_threshold(
+        self, score_threshold: float, scale_score: bool
+    ) -> Optional[float]:
+        """
+        Maps a threshold on the scores returned by `_query_by_embedding` to the score computed by
+        Qdrant, or None if Qdrant cannot apply it, in which case the results are filtered here.
+        """
+        if self.similarity == "l2":
+            # Qdrant keeps the points within the threshold distance instead
+            return None
+        if not scale_score:
+            return score_threshold
+        if self.similarity == "cosine":
+            return score_threshold * 2 - 1
+        if 0 < score_threshold < 1:
+            return float(100 * np.log(score_threshold / (1 - score_threshold)))
+        return None
+
     async def _query_by_filters(
         self,
         filters: Optional[Dict[str, Any]] = None,
         top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+        return_embedding: bool = False,
     ) -> List[Document]:
-        qdrant_filters = convert_filters_to_qdrant(filters)
+        matches, shard_key = await self._get_read_shard_key(filters)
+        if not matches:
+            return []
+
+        filters = await self._with_active_version(filters)
+        qdrant_filters = convert_filters(filters)
         points_list = []
         offset = None
         while True:
-            points = await self.async_client.scroll(
-                collection_name=self.index,
-                offset=offset,
-                scroll_filter=qdrant_filters,
-                limit=top_k,
-            )
+            # without top_k, Qdrant would return pages of 10 points
+            async with within_deadline():
+                points = await self.async_client.scroll(
+                    collection_name=self.index,
+                    offset=offset,
+                    scroll_filter=qdrant_filters,
+                    limit=top_k or self.scroll_size,
+                    with_payload=with_payload_fields(payload_fields),
+                    with_vectors=return_embedding,
+                    **shard_key_selector(shard_key),
+                )
             points_list.extend(points[0])
             if points[1] is None:
                 break
@@ -239,17 +824,57 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
         else:
             return []
 
+    async def _query_payloads_by_filters(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Same as _query_by_filters, but returns the raw point payloads (content and flattened meta)
+        instead of haystack Documents, skipping the vectors and the Document conversion.
+        """
+        matches, shard_key = await self._get_read_shard_key(filters)
+        if not matches:
+            return []
+
+        filters = await self._with_active_version(filters)
+        qdrant_filters = convert_filters(filters)
+        payloads = []
+        offset = None
+        while True:
+            async with within_deadline():
+                points, offset = await self.async_client.scroll(
+                    collection_name=self.index,
+                    offset=offset,
+                    scroll_filter=qdrant_filters,
+                    limit=top_k or self.scroll_size,
+                    with_payload=payload_fields or True,
+                    with_vectors=False,
+                    **shard_key_selector(shard_key),
+                )
+            payloads.extend(point.payload for point in points)
+            if offset is None:
+                break
+
+        return payloads
+
     async def delete_documents(self, filters: Optional[Dict[str, Any]] = None):
+        matches, shard_key = await self._get_read_shard_key(filters)
+        if not matches:
+            return
+
         if not filters:
             qdrant_filters = rest.Filter()
         else:
-            qdrant_filters = convert_filters_to_qdrant(filters)
+            qdrant_filters = convert_filters(filters)
 
         try:
             await self.async_client.delete(
                 collection_name=self.index,
                 points_selector=qdrant_filters,
                 wait=self.wait_result_from_api,
+                **shard_key_selector(shard_key),
             )
         except KeyError:
             logger.warning(
@@ -257,16 +882,24 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             )
 
     async def count_documents(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        matches, shard_key = await self._get_read_shard_key(filters)
+        if not matches:
+            return 0
+
+        filters = await self._with_active_version(filters)
         if not filters:
             qdrant_filters = rest.Filter()
         else:
-            qdrant_filters = convert_filters_to_qdrant(filters)
+            qdrant_filters = convert_filters(filters)
 
-        return (
-            await self.async_client.count(
-                collection_name=self.index, count_filter=qdrant_filters
-            )
-        ).count
+        async with within_deadline():
+            return (
+                await self.async_client.count(
+                    collection_name=self.index,
+                    count_filter=qdrant_filters,
+                    **shard_key_selector(shard_key),
+                )
+            ).count
 
     async def write_documents(
         self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.FAIL
@@ -276,16 +909,7 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
                 msg = f"DocumentStore.write_documents() expects a list of Documents but got an element of {type(doc)}."
                 raise ValueError(msg)
 
-        self._set_up_collection(
-            self.index,
-            self.embedding_dim,
-            False,
-            self.similarity,
-            self.use_sparse_embeddings,
-            self.sparse_idf,
-            self.on_disk,
-            self.payload_fields_to_index,
-        )
+        await self._check_collection()
 
         if len(documents) == 0:
             logger.warning(
@@ -298,26 +922,122 @@ class AsyncQdrantDocumentStore(QdrantDocumentStore):
             policy=policy,
         )
 
-        batched_documents = document_store.get_batches_from_generator(
-            document_objects, self.write_batch_size
-        )
+        # the points of an upsert all go to the shard key it is sent with
+        shard_documents: Dict[Optional[str], List[Document]] = {}
+        for document in document_objects:
+            shard_documents.setdefault(
+                self.get_shard_key(document.meta.get("project_id")), []
+            ).append(document)
+
         with tqdm(
             total=len(document_objects), disable=not self.progress_bar
         ) as progress_bar:
-            for document_batch in batched_documents:
-                batch = convert_haystack_documents_to_qdrant_points(
-                    document_batch,
-                    use_sparse_embeddings=self.use_sparse_embeddings,
+            for shard_key, documents in shard_documents.items():
+                if shard_key is not None:
+                    await self._ensure_shard_key(shard_key)
+                await self._upsert_batches(
+                    self._get_point_batches(documents), progress_bar, shard_key
                 )
+        return len(document_objects)
 
-                await self.async_client.upsert(
-                    collection_name=self.index,
-                    points=batch,
+    def _get_point_batches(
+        self, documents: Iterable[Document]
+    ) -> Iterator[List[rest.PointStruct]]:
+        batch = []
+        batch_bytes = 0
+        for document_batch in document_store.get_batches_from_generator(
+            documents, self.write_batch_size
+        ):
+            for point in convert_haystack_documents_to_qdrant_points(
+                document_batch,
+                use_sparse_embeddings=self.use_sparse_embeddings,
+            ):
+                point_bytes = estimate_point_bytes(point)
+                if batch and (
+                    len(batch) >= self.write_batch_size
+                    or batch_bytes + point_bytes > self.write_batch_bytes
+                ):
+                    yield batch
+                    batch = []
+                    batch_bytes = 0
+
+                batch.append(point)
+                batch_bytes += point_bytes
+
+        if batch:
+            yield batch
+
+    async def _upsert(
+        self,
+        points: List[rest.PointStruct],
+        wait: bool,
+        progress_bar: tqdm,
+        shard_key: Optional[str] = None,
+    ) -> None:
+        try:
+            await self.async_client.upsert(
+                collection_name=self.index,
+                points=points,
+                wait=wait,
+                **shard_key_selector(shard_key),
+            )
+        except Exception:
+            # check the collection again on the next write, it may have been removed
+            self._collection_checked = False
+            raise
+
+        progress_bar.update(len(points))
+
+    async def _upsert_batches(
+        self,
+        batches: Iterator[List[rest.PointStruct]],
+        progress_bar: tqdm,
+        shard_key: Optional[str] = None,
+    ) -> None:
+        """
+        Upsert the batches with up to `write_concurrency` requests in flight, without waiting for
+        the updates to be applied. Only the last batch waits for the result, once all the others
+        are acknowledged, since Qdrant applies the acknowledged updates of a collection in order.
+        """
+        pending = set()
+        last = None
+        try:
+            for batch in batches:
+                if last is not None:
+                    if len(pending) >= self.write_concurrency:
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            task.result()
+
+                    pending.add(
+                        asyncio.create_task(
+                            self._upsert(
+                                last,
+                                wait=False,
+                                progress_bar=progress_bar,
+                                shard_key=shard_key,
+                            )
+                        )
+                    )
+                last = batch
+
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                for task in done:
+                    task.result()
+
+            if last is not None:
+                await self._upsert(
+                    last,
                     wait=self.wait_result_from_api,
+                    progress_bar=progress_bar,
+                    shard_key=shard_key,
                 )
-
-                progress_bar.update(self.write_batch_size)
-        return len(document_objects)
+        finally:
+            for task in pending:
+                task.cancel()
 
 
 class AsyncQdrantEmbeddingRetriever(QdrantEmbeddingRetriever):
@@ -328,6 +1048,10 @@ class AsyncQdrantEmbeddingRetriever(QdrantEmbeddingRetriever):
         top_k: int = 10,
         scale_score: bool = True,
         return_embedding: bool = False,
+        score_threshold: Optional[float] = None,
+        payload_fields: Optional[List[str]] = None,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
     ):
         super(AsyncQdrantEmbeddingRetriever, self).__init__(
             document_store=document_store,
@@ -337,6 +1061,12 @@ class AsyncQdrantEmbeddingRetriever(QdrantEmbeddingRetriever):
             return_embedding=return_embedding,
         )
         self._document_store = document_store
+        self._score_threshold = score_threshold
+        # the payload fields the pipeline reads, the others are not fetched from Qdrant
+        self._payload_fields = payload_fields
+        # the search params of a quantized collection, the defaults of its quantization if None
+        self._rescore = rescore
+        self._oversampling = oversampling
 
     @component.output_types(documents=List[Document])
     async def run(
@@ -346,6 +1076,7 @@ class AsyncQdrantEmbeddingRetriever(QdrantEmbeddingRetriever):
         top_k: Optional[int] = None,
         scale_score: Optional[bool] = None,
         return_embedding: Optional[bool] = None,
+        score_threshold: Optional[float] = None,
     ):
         if query_embedding:
             docs = await self._document_store._query_by_embedding(
@@ -354,15 +1085,42 @@ class AsyncQdrantEmbeddingRetriever(QdrantEmbeddingRetriever):
                 top_k=top_k or self._top_k,
                 scale_score=scale_score or self._scale_score,
                 return_embedding=return_embedding or self._return_embedding,
+                score_threshold=(
+                    score_threshold
+                    if score_threshold is not None
+                    else self._score_threshold
+                ),
+                payload_fields=self._payload_fields,
+                rescore=self._rescore,
+                oversampling=self._oversampling,
             )
         else:
             docs = await self._document_store._query_by_filters(
                 filters=filters,
                 top_k=top_k,
+                payload_fields=self._payload_fields,
             )
 
         return {"documents": docs}
 
+    async def fetch_payloads(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        A lightweight alternative to `run` for filter-only lookups,
+        returning the payloads of the matching documents as plain dicts.
+        """
+        return {
+            "payloads": await self._document_store._query_payloads_by_filters(
+                filters=filters,
+                top_k=top_k,
+                payload_fields=payload_fields,
+            )
+        }
+
 
 @provider("qdrant")
 class QdrantProvider(DocumentStoreProvider):
@@ -383,12 +1141,64 @@ class QdrantProvider(DocumentStoreProvider):
             if os.getenv("SHOULD_FORCE_DEPLOY")
             else False
         ),
+        write_batch_size: int = 1000,
+        write_batch_bytes: int = 4 * 1024 * 1024,
+        write_concurrency: int = 4,
+        shard_number: Optional[int] = None,
+        replication_factor: Optional[int] = None,
+        tenant_sharding: str = "none",
+        tenant_shard_buckets: int = 16,
+        tenancy: str = "multi",
+        hnsw_m: Optional[int] = None,
+        hnsw_ef_construct: Optional[int] = None,
+        hnsw_ef: Optional[int] = None,
+        quantization: str = "auto",
+        product_compression: str = "x16",
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        blue_green_indexing: bool = False,
         **_,
     ):
         self._location = location
         self._api_key = Secret.from_token(api_key) if api_key else None
         self._timeout = timeout
         self._embedding_model_dim = embedding_model_dim
+        self._write_batch_size = write_batch_size
+        self._write_batch_bytes = write_batch_bytes
+        self._write_concurrency = write_concurrency
+        self._shard_number = shard_number
+        self._replication_factor = replication_factor
+        self._tenant_sharding = tenant_sharding
+        self._tenant_shard_buckets = tenant_shard_buckets
+        self._hnsw_config, self._hnsw_ef = get_hnsw_config(
+            tenancy, m=hnsw_m, ef_construct=hnsw_ef_construct, hnsw_ef=hnsw_ef
+        )
+        self._quantization_config = get_quantization_config(
+            quantization, embedding_model_dim, product_compression
+        )
+        # the defaults of the retrievers, None keeps the ones of the quantization mode
+        self._rescore = rescore
+        self._oversampling = oversampling
+        # one client, thus one connection pool, and one store per collection shared by all pipelines
+        self._client = qdrant_client.QdrantClient(
+            location=location,
+            api_key=api_key,
+            timeout=timeout,
+        )
+        self._async_client = qdrant_client.AsyncQdrantClient(
+            location=location,
+            api_key=api_key,
+            timeout=timeout,
+        )
+        self._stores: Dict[str, AsyncQdrantDocumentStore] = {}
+        self._deploy_versions: Optional[DeployVersions] = None
+        if blue_green_indexing:
+            # set up before the versioned collections, which filter their reads by the active versions
+            self._deploy_versions = DeployVersions(
+                self.get_store(
+                    dataset_name="deploy_versions", recreate_index=recreate_index
+                )
+            )
         self._reset_document_store(recreate_index)
 
     def _reset_document_store(self, recreate_index: bool):
@@ -404,37 +1214,51 @@ class QdrantProvider(DocumentStoreProvider):
         dataset_name: Optional[str] = None,
         recreate_index: bool = False,
     ):
-        return AsyncQdrantDocumentStore(
+        index = dataset_name or "Document"
+        if recreate_index or index not in self._stores:
+            self._stores[index] = self._create_store(index, recreate_index)
+        return self._stores[index]
+
+    def _create_store(self, index: str, recreate_index: bool):
+        deploy_versions = self._deploy_versions if index in VERSIONED_INDEXES else None
+        store = AsyncQdrantDocumentStore(
             location=self._location,
             api_key=self._api_key,
             embedding_dim=self._embedding_model_dim,
-            index=dataset_name or "Document",
+            index=index,
             recreate_index=recreate_index,
             on_disk=True,
             timeout=self._timeout,
-            quantization_config=(
-                rest.BinaryQuantization(
-                    binary=rest.BinaryQuantizationConfig(
-                        always_ram=True,
-                    )
-                )
-                if self._embedding_model_dim >= 1024
-                else None
-            ),
-            # to improve the indexing performance, we disable building global index for the whole collection
-            # see https://qdrant.tech/documentation/guides/multiple-partitions/?q=mul#calibrate-performance
-            hnsw_config=rest.HnswConfigDiff(
-                payload_m=16,
-                m=0,
-            ),
+            quantization_config=self._quantization_config,
+            hnsw_config=self._hnsw_config,
+            hnsw_ef=self._hnsw_ef,
+            client=self._client,
+            async_client=self._async_client,
+            write_batch_size=self._write_batch_size,
+            write_batch_bytes=self._write_batch_bytes,
+            write_concurrency=self._write_concurrency,
+            shard_number=self._shard_number,
+            replication_factor=self._replication_factor,
+            tenant_sharding=self._tenant_sharding,
+            tenant_shard_buckets=self._tenant_shard_buckets,
+            deploy_versions=deploy_versions,
         )
+        if deploy_versions is not None:
+            deploy_versions.register(index, store)
+        return store
 
     def get_retriever(
         self,
         document_store: AsyncQdrantDocumentStore,
         top_k: int = 10,
+        payload_fields: Optional[List[str]] = None,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
     ):
         return AsyncQdrantEmbeddingRetriever(
             document_store=document_store,
             top_k=top_k,
+            payload_fields=payload_fields,
+            rescore=self._rescore if rescore is None else rescore,
+            oversampling=self._oversampling if oversampling is None else oversampling,
         )
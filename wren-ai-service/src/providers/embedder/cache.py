@@ -0,0 +1,256 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger("wren-ai-service")
+
+# each row of the index holds the content hash of the text and a logical clock of its last use
+_INDEX_DTYPE = np.dtype([("key", "V16"), ("last_used", "<u8")])
+_EMPTY_KEY = bytes(16)
+_MIN_CAPACITY = 1024
+
+
+def _content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    A disk-backed cache of document embeddings for a single embedding model.
+
+    Embeddings are keyed by the content hash of the text sent to the embedding provider,
+    so unchanged chunks are never embedded twice, even across restarts. The cache lives in
+    `<path>/<model>/` and consists of three files:
+    - vectors.f32: a memory-mapped float32 matrix of shape (capacity, dim)
+    - index.bin: a memory-mapped array of (content hash, last used) rows aligned with the vectors
+    - meta.json: the dimension, capacity and logical clock of the cache
+
+    Once `max_entries` is reached, the least recently used entries are evicted
+    (`eviction_ratio` of the cache at a time, to amortize the cost of eviction).
+    The files take about `max_entries * dim * 4` bytes, e.g. 1.2GB for 100,000 entries of
+    3072 dimensions.
+
+    A single process may use the cache of a path: an exclusive lock is taken on `<model>/lock`,
+    and a RuntimeError is raised if another process holds it. Use `aget` and `aput` from the
+    event loop, they run the disk IO in a thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        max_entries: int = 100_000,
+        eviction_ratio: float = 0.1,
+    ):
+        self._dir = Path(path) / re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self._dir / "lock", "wb")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            self._lock_file.close()
+            raise RuntimeError(
+                f"The embedding cache at {self._dir} is used by another process"
+            ) from e
+
+        # the reads and writes run in threads, one at a time
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._eviction_ratio = eviction_ratio
+
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        self._clock = 0
+        self._vectors: Optional[np.memmap] = None
+        self._index: Optional[np.memmap] = None
+        self._rows: Dict[bytes, int] = {}
+        self._free_rows: List[int] = []
+
+        try:
+            self._load()
+        except Exception as e:
+            logger.warning(f"Failed to load embedding cache at {self._dir}: {e}")
+            self._reset(dim=None)
+
+    @property
+    def _meta_path(self) -> Path:
+        return self._dir / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self._dir / "vectors.f32"
+
+    @property
+    def _index_path(self) -> Path:
+        return self._dir / "index.bin"
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+
+        meta = orjson.loads(self._meta_path.read_bytes())
+        self._dim = meta["dim"]
+        self._capacity = meta["capacity"]
+        self._clock = meta["clock"]
+        self._open()
+
+        keys = self._index["key"]
+        for row in range(self._capacity):
+            key = keys[row].tobytes()
+            if key == _EMPTY_KEY:
+                self._free_rows.append(row)
+            else:
+                self._rows[key] = row
+
+        logger.info(
+            f"Loaded embedding cache at {self._dir} with {len(self._rows)} entries"
+        )
+
+    def _open(self) -> None:
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r+",
+            shape=(self._capacity, self._dim),
+        )
+        self._index = np.memmap(
+            self._index_path, dtype=_INDEX_DTYPE, mode="r+", shape=(self._capacity,)
+        )
+
+    def _close(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._index.flush()
+        self._vectors = None
+        self._index = None
+
+    def _reset(self, dim: Optional[int]) -> None:
+        self._close()
+        for path in (self._vectors_path, self._index_path, self._meta_path):
+            path.unlink(missing_ok=True)
+
+        self._dim = dim
+        self._capacity = 0
+        self._clock = 0
+        self._rows = {}
+        self._free_rows = []
+
+    def _grow(self, capacity: int) -> None:
+        self._close()
+        for path, row_size in (
+            (self._vectors_path, self._dim * np.dtype(np.float32).itemsize),
+            (self._index_path, _INDEX_DTYPE.itemsize),
+        ):
+            # extending the files fills the new rows with zeros, i.e. empty keys
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_size)
+
+        self._free_rows.extend(range(self._capacity, capacity))
+        self._capacity = capacity
+        self._open()
+
+    def _evict(self, count: int) -> None:
+        rows = list(self._rows.values())
+        last_used = self._index["last_used"][rows]
+        for i in np.argsort(last_used, kind="stable")[:count]:
+            row = rows[i]
+            del self._rows[self._index["key"][row].tobytes()]
+            self._index[row] = (_EMPTY_KEY, 0)
+            self._free_rows.append(row)
+
+    def _allocate_row(self) -> int:
+        if not self._free_rows:
+            if self._capacity < self._max_entries:
+                self._grow(
+                    min(self._max_entries, max(_MIN_CAPACITY, self._capacity * 2))
+                )
+            else:
+                self._evict(max(1, int(self._max_entries * self._eviction_ratio)))
+
+        return self._free_rows.pop()
+
+    async def aget(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return await asyncio.to_thread(self.get, texts)
+
+    async def aput(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        await asyncio.to_thread(self.put, texts, embeddings)
+
+    def get(self, texts: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            return self._get(texts)
+
+    def put(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        with self._lock:
+            self._put(texts, embeddings)
+
+    def _get(self, texts: List[str]) -> List[Optional[List[float]]]:
+        embeddings = []
+        for text in texts:
+            if (row := self._rows.get(_content_hash(text))) is None:
+                embeddings.append(None)
+                continue
+
+            self._clock += 1
+            self._index["last_used"][row] = self._clock
+            embeddings.append(self._vectors[row].tolist())
+
+        return embeddings
+
+    def _put(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        if not texts:
+            return
+
+        # never let a single write evict its own entries
+        texts = texts[-self._max_entries :]
+        embeddings = embeddings[-self._max_entries :]
+
+        dim = len(embeddings[0])
+        if self._dim != dim:
+            if self._rows:
+                logger.warning(
+                    f"Embedding dimension changed from {self._dim} to {dim}, resetting the embedding cache at {self._dir}"
+                )
+            self._reset(dim=dim)
+
+        for text, embedding in zip(texts, embeddings):
+            key = _content_hash(text)
+            if (row := self._rows.get(key)) is None:
+                row = self._allocate_row()
+                self._rows[key] = row
+
+            self._clock += 1
+            self._vectors[row] = np.asarray(embedding, dtype=np.float32)
+            self._index[row] = (key, self._clock)
+
+        self._persist()
+
+    def _persist(self) -> None:
+        self._vectors.flush()
+        self._index.flush()
+
+        # write the meta file atomically, so a crash never leaves a half-written file behind
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_bytes(
+            orjson.dumps(
+                {"dim": self._dim, "capacity": self._capacity, "clock": self._clock}
+            )
+        )
+        os.replace(tmp_path, self._meta_path)
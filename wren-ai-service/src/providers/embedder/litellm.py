@@ -1,14 +1,16 @@
 import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import backoff
 import openai
 from haystack import Document, component
 from litellm import aembedding
 
+from src.core.deadline import deadline_exceeded, remaining_time, within_deadline
 from src.core.provider import EmbedderProvider
+from src.providers.embedder.cache import EmbeddingCache
 from src.providers.loader import provider
 from src.utils import remove_trailing_slash
 
@@ -30,6 +32,87 @@ def _prepare_texts_to_embed(documents: List[Document]) -> List[str]:
     return texts_to_embed
 
 
+def _build_meta(response: Any) -> Dict[str, Any]:
+    return {
+        "model": response.model,
+        "usage": dict(response.usage) if hasattr(response, "usage") else {},
+    }
+
+
+class EmbeddingMicroBatcher:
+    """
+    Collect concurrent single-text embedding requests and send them as one batched call.
+
+    The first request opens a window of `batch_window_ms`; every request arriving within the window
+    joins the same batch, and the batch is flushed early once it reaches `max_batch_size` texts.
+    Identical texts within a batch are only embedded once. Each caller gets its own vector back,
+    along with the model of the batched call it was part of. The usage of the call is reported to
+    a single caller, so that summing the usage of every caller doesn't count it more than once.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Awaitable[Any]],
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 32,
+    ):
+        self._embed = embed
+        self._batch_window = batch_window_ms / 1000
+        self._max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # keep a reference to the batches being sent, so they aren't garbage collected
+        self._tasks = set()
+
+    async def embed(self, text: str) -> Tuple[List[float], Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[: self._max_batch_size]
+            self._pending = self._pending[self._max_batch_size :]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # callers may have been cancelled while waiting for the window to close
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            response = await self._embed(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        meta = _build_meta(response)
+        # the embeddings may come back in any order, each one carries the index of its text
+        embeddings = {texts[el["index"]]: el["embedding"] for el in response.data}
+        for text, future in batch:
+            if not future.done():
+                future.set_result((embeddings[text], meta))
+                meta = {**meta, "usage": {}}
+
+
 @component
 class AsyncTextEmbedder:
     def __init__(
@@ -38,16 +121,24 @@ class AsyncTextEmbedder:
         api_key: Optional[str] = None,
         api_base_url: Optional[str] = None,
         timeout: Optional[float] = None,
+        batcher: Optional[EmbeddingMicroBatcher] = None,
         **kwargs,
     ):
         self._api_key = api_key
         self._model = model
         self._api_base_url = api_base_url
         self._timeout = timeout
+        self._batcher = batcher
         self._kwargs = kwargs
 
     @component.output_types(embedding=List[float], meta=Dict[str, Any])
-    @backoff.on_exception(backoff.expo, openai.APIError, max_time=60.0, max_tries=3)
+    @backoff.on_exception(
+        backoff.expo,
+        openai.APIError,
+        max_time=lambda: remaining_time(60.0),
+        max_tries=3,
+        giveup=lambda _: deadline_exceeded(),
+    )
     async def run(self, text: str):
         if not isinstance(text, str):
             raise TypeError(
@@ -59,22 +150,26 @@ class AsyncTextEmbedder:
         # replace newlines, which can negatively affect performance.
         text_to_embed = text.replace("\n", " ")
 
+        if self._batcher is not None:
+            # the batch is shared with other requests, only this caller stops waiting for it
+            async with within_deadline():
+                embedding, meta = await self._batcher.embed(text_to_embed)
+            return {"embedding": embedding, "meta": meta}
+
         response = await aembedding(
             model=self._model,
             input=[text_to_embed],
             api_key=self._api_key,
             api_base=self._api_base_url,
-            timeout=self._timeout,
+            timeout=remaining_time(self._timeout),
             **self._kwargs,
         )
 
-        meta = {
-            "model": response.model,
-            "usage": dict(response.usage) if hasattr(response, "usage") else {},
+        return {
+            "embedding": response.data[0]["embedding"],
+            "meta": _build_meta(response),
         }
 
-        return {"embedding": response.data[0]["embedding"], "meta": meta}
-
 
 @component
 class AsyncDocumentEmbedder:
@@ -85,6 +180,7 @@ class AsyncDocumentEmbedder:
         api_key: Optional[str] = None,
         api_base_url: Optional[str] = None,
         timeout: Optional[float] = None,
+        cache: Optional[EmbeddingCache] = None,
         **kwargs,
     ):
         self._api_key = api_key
@@ -92,6 +188,7 @@ class AsyncDocumentEmbedder:
         self._batch_size = batch_size
         self._api_base_url = api_base_url
         self._timeout = timeout
+        self._cache = cache
         self._kwargs = kwargs
 
     async def _embed_batch(
@@ -151,16 +248,45 @@ class AsyncDocumentEmbedder:
 
         texts_to_embed = _prepare_texts_to_embed(documents=documents)
 
-        embeddings, meta = await self._embed_batch(
-            texts_to_embed=texts_to_embed,
-            batch_size=self._batch_size,
-        )
+        if self._cache is None:
+            embeddings, meta = await self._embed_batch(
+                texts_to_embed=texts_to_embed,
+                batch_size=self._batch_size,
+            )
+        else:
+            embeddings, meta = await self._embed_with_cache(texts_to_embed)
 
         for doc, emb in zip(documents, embeddings):
             doc.embedding = emb
 
         return {"documents": documents, "meta": meta}
 
+    async def _embed_with_cache(
+        self, texts_to_embed: List[str]
+    ) -> Tuple[List[List[float]], Dict[str, Any]]:
+        embeddings = await self._cache.aget(texts_to_embed)
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        # only the texts missing from the cache are sent to the embedding provider
+        missed_embeddings, meta = await self._embed_batch(
+            texts_to_embed=[texts_to_embed[i] for i in misses],
+            batch_size=self._batch_size,
+        )
+        await self._cache.aput([texts_to_embed[i] for i in misses], missed_embeddings)
+
+        for i, embedding in zip(misses, missed_embeddings):
+            embeddings[i] = embedding
+
+        meta["cache"] = {
+            "hits": len(texts_to_embed) - len(misses),
+            "misses": len(misses),
+        }
+        logger.info(
+            f"Embedding cache hits: {meta['cache']['hits']}, misses: {meta['cache']['misses']}"
+        )
+
+        return embeddings, meta
+
 
 @provider("litellm_embedder")
 class LitellmEmbedderProvider(EmbedderProvider):
@@ -172,6 +298,11 @@ class LitellmEmbedderProvider(EmbedderProvider):
         ] = None,  # e.g. EMBEDDER_OPENAI_API_KEY, EMBEDDER_ANTHROPIC_API_KEY, etc.
         api_base: Optional[str] = None,
         timeout: float = 120.0,
+        micro_batching: bool = False,
+        micro_batch_window_ms: float = 5.0,
+        micro_batch_max_size: int = 32,
+        embedding_cache_path: Optional[str] = os.getenv("EMBEDDING_CACHE_PATH"),
+        embedding_cache_max_entries: int = 100_000,
         **kwargs,
     ):
         self._api_key = os.getenv(api_key_name) if api_key_name else None
@@ -182,12 +313,47 @@ class LitellmEmbedderProvider(EmbedderProvider):
             del kwargs["provider"]
         self._kwargs = kwargs
 
+        # one batcher per provider, so concurrent requests from all pipelines are batched together
+        self._batcher = (
+            EmbeddingMicroBatcher(
+                embed=self._embed_texts,
+                batch_window_ms=micro_batch_window_ms,
+                max_batch_size=micro_batch_max_size,
+            )
+            if micro_batching
+            else None
+        )
+
+        # one cache per provider, shared by all document embedders of the same model
+        self._cache = None
+        if embedding_cache_path:
+            try:
+                self._cache = EmbeddingCache(
+                    path=embedding_cache_path,
+                    model=model,
+                    max_entries=embedding_cache_max_entries,
+                )
+            except RuntimeError as e:
+                # e.g. another worker of the service, only one process writes to a cache
+                logger.warning(f"{e}, the document embeddings are not cached")
+
+    async def _embed_texts(self, texts: List[str]) -> Any:
+        return await aembedding(
+            model=self._embedding_model,
+            input=texts,
+            api_key=self._api_key,
+            api_base=self._api_base,
+            timeout=self._timeout,
+            **self._kwargs,
+        )
+
     def get_text_embedder(self):
         return AsyncTextEmbedder(
             api_key=self._api_key,
             api_base_url=self._api_base,
             model=self._embedding_model,
             timeout=self._timeout,
+            batcher=self._batcher,
             **self._kwargs,
         )
 
@@ -197,5 +363,6 @@ class LitellmEmbedderProvider(EmbedderProvider):
             api_base_url=self._api_base,
             model=self._embedding_model,
             timeout=self._timeout,
+            cache=self._cache,
             **self._kwargs,
         )
@@ -7,6 +7,7 @@ from typing import Any, Dict, Optional, Tuple
 import aiohttp
 import orjson
 
+from src.core.deadline import remaining_time
 from src.core.engine import Engine, remove_limit_statement
 from src.providers.loader import provider
 
@@ -32,6 +33,7 @@ class WrenUI(Engine):
         limit: int = 500,
         **kwargs,
     ) -> Tuple[bool, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        timeout = remaining_time(timeout)
         data = {
             "sql": remove_limit_statement(sql),
             "projectId": project_id,
@@ -132,6 +134,7 @@ class WrenIbis(Engine):
         limit: int = 500,
         **kwargs,
     ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        timeout = remaining_time(timeout)
         api_endpoint = f"{self._endpoint}/v3/connector/{self._source}/query"
         if dry_run:
             api_endpoint += "?dryRun=true&limit=1"
@@ -182,6 +185,7 @@ class WrenIbis(Engine):
         allow_fallback: bool = True,
         **kwargs,
     ) -> Tuple[bool, str]:
+        timeout = remaining_time(timeout)
         api_endpoint = f"{self._endpoint}/v3/connector/{data_source}/dry-plan"
         try:
             async with session.post(
@@ -214,6 +218,7 @@ class WrenIbis(Engine):
         data_source: str,
         timeout: float = 30.0,
     ) -> list[str]:
+        timeout = remaining_time(timeout)
         api_endpoint = f"{self._endpoint}/v3/connector/{data_source}/functions"
         try:
             async with session.get(api_endpoint, timeout=timeout) as response:
@@ -251,6 +256,7 @@ class WrenEngine(Engine):
         limit: int = 500,
         **kwargs,
     ) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+        timeout = remaining_time(timeout)
         api_endpoint = (
             f"{self._endpoint}/v1/mdl/dry-run"
             if dry_run
@@ -9,6 +9,7 @@ from haystack.components.generators.openai_utils import (
 from haystack.dataclasses import ChatMessage, StreamingChunk
 from litellm import Router, acompletion
 
+from src.core.deadline import deadline_exceeded, remaining_time
 from src.core.provider import LLMProvider
 from src.providers.llm import (
     build_chunk,
@@ -71,7 +72,13 @@ class LitellmLLMProvider(LLMProvider):
             **(self._model_kwargs or {}),
         }
 
-        @backoff.on_exception(backoff.expo, openai.APIError, max_time=60.0, max_tries=3)
+        @backoff.on_exception(
+            backoff.expo,
+            openai.APIError,
+            max_time=lambda: remaining_time(60.0),
+            max_tries=3,
+            giveup=lambda _: deadline_exceeded(),
+        )
         async def _run(
             prompt: str,
             history_messages: Optional[List[ChatMessage]] = None,
@@ -100,6 +107,10 @@ class LitellmLLMProvider(LLMProvider):
             }
 
             if self._has_fallbacks:
+                # the router keeps its own timeout unless the request has a deadline
+                if (timeout := remaining_time()) is not None:
+                    generation_kwargs["timeout"] = timeout
+
                 completion = await self._router.acompletion(
                     model=self._model,
                     messages=openai_formatted_messages,
@@ -113,7 +124,7 @@ class LitellmLLMProvider(LLMProvider):
                     api_key=self._api_key,
                     api_base=self._api_base,
                     api_version=self._api_version,
-                    timeout=self._timeout,
+                    timeout=remaining_time(self._timeout),
                     messages=openai_formatted_messages,
                     stream=streaming_callback is not None,
                     **generation_kwargs,
@@ -1,7 +1,7 @@
 import uuid
 from dataclasses import asdict
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 
 from src.globals import (
@@ -31,7 +31,6 @@ router = APIRouter()
 @router.post("/asks")
 async def ask(
     ask_request: AskRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
     service_metadata: ServiceMetadata = Depends(get_service_metadata),
 ) -> AskResponse:
@@ -41,8 +40,7 @@ async def ask(
         status="understanding",
     )
 
-    background_tasks.add_task(
-        service_container.ask_service.ask,
+    service_container.ask_service.start_ask(
         ask_request,
         service_metadata=asdict(service_metadata),
     )
@@ -53,14 +51,10 @@ async def ask(
 async def stop_ask(
     query_id: str,
     stop_ask_request: StopAskRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
 ) -> StopAskResponse:
     stop_ask_request.query_id = query_id
-    background_tasks.add_task(
-        service_container.ask_service.stop_ask,
-        stop_ask_request,
-    )
+    service_container.ask_service.stop_ask(stop_ask_request)
     return StopAskResponse(query_id=query_id)
 
 
@@ -88,7 +82,6 @@ async def get_ask_streaming_result(
 @router.post("/ask-feedbacks")
 async def ask_feedback(
     ask_feedback_request: AskFeedbackRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
     service_metadata: ServiceMetadata = Depends(get_service_metadata),
 ) -> AskFeedbackResponse:
@@ -100,8 +93,7 @@ async def ask_feedback(
         status="searching",
     )
 
-    background_tasks.add_task(
-        service_container.ask_service.ask_feedback,
+    service_container.ask_service.start_ask_feedback(
         ask_feedback_request,
         service_metadata=asdict(service_metadata),
     )
@@ -112,14 +104,10 @@ async def ask_feedback(
 async def stop_ask_feedback(
     query_id: str,
     stop_ask_feedback_request: StopAskFeedbackRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
 ) -> StopAskFeedbackResponse:
     stop_ask_feedback_request.query_id = query_id
-    background_tasks.add_task(
-        service_container.ask_service.stop_ask_feedback,
-        stop_ask_feedback_request,
-    )
+    service_container.ask_service.stop_ask_feedback(stop_ask_feedback_request)
     return StopAskFeedbackResponse(query_id=query_id)
 
 
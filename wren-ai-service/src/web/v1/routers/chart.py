@@ -1,7 +1,7 @@
 import uuid
 from dataclasses import asdict
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
 
 from src.globals import (
     ServiceContainer,
@@ -24,7 +24,6 @@ router = APIRouter()
 @router.post("/charts")
 async def chart(
     chart_request: ChartRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
     service_metadata: ServiceMetadata = Depends(get_service_metadata),
 ) -> ChartResponse:
@@ -34,8 +33,7 @@ async def chart(
         status="fetching",
     )
 
-    background_tasks.add_task(
-        service_container.chart_service.chart,
+    service_container.chart_service.start_chart(
         chart_request,
         service_metadata=asdict(service_metadata),
     )
@@ -46,14 +44,10 @@ async def chart(
 async def stop_chart(
     query_id: str,
     stop_chart_request: StopChartRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
 ) -> StopChartResponse:
     stop_chart_request.query_id = query_id
-    background_tasks.add_task(
-        service_container.ask_service.stop_ask,
-        stop_chart_request,
-    )
+    service_container.chart_service.stop_chart(stop_chart_request)
     return StopChartResponse(query_id=query_id)
 
 
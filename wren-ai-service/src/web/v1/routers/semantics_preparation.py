@@ -1,6 +1,13 @@
 from dataclasses import asdict
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
 
 from src.globals import (
     ServiceContainer,
@@ -57,3 +64,38 @@ async def delete_semantics(
     if not project_id:
         raise HTTPException(status_code=400, detail="Project ID is required")
     await service_container.semantics_preparation_service.delete_semantics(project_id)
+
+
+@router.get("/semantics-preparations/{project_id}/snapshot")
+async def export_semantics_snapshot(
+    project_id: str,
+    service_container: ServiceContainer = Depends(get_service_container),
+) -> Response:
+    data = await service_container.semantics_preparation_service.export_snapshot(
+        project_id
+    )
+    return Response(
+        content=data,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{project_id}.snapshot.zip"'
+        },
+    )
+
+
+@router.post("/semantics-preparations/{project_id}/snapshot")
+async def import_semantics_snapshot(
+    project_id: str,
+    request: Request,
+    service_container: ServiceContainer = Depends(get_service_container),
+) -> dict[str, int]:
+    """
+    Load the body, a snapshot exported by the GET endpoint, as the documents of the project.
+    Returns the number of documents imported into each collection.
+    """
+    try:
+        return await service_container.semantics_preparation_service.import_snapshot(
+            project_id, await request.body()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,7 @@
 import uuid
 from dataclasses import asdict
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 
 from src.globals import (
@@ -15,6 +15,8 @@ from src.web.v1.services.sql_answer import (
     SqlAnswerResponse,
     SqlAnswerResultRequest,
     SqlAnswerResultResponse,
+    StopSqlAnswerRequest,
+    StopSqlAnswerResponse,
 )
 
 router = APIRouter()
@@ -23,7 +25,6 @@ router = APIRouter()
 @router.post("/sql-answers")
 async def sql_answer(
     sql_answer_request: SqlAnswerRequest,
-    background_tasks: BackgroundTasks,
     service_container: ServiceContainer = Depends(get_service_container),
     service_metadata: ServiceMetadata = Depends(get_service_metadata),
 ) -> SqlAnswerResponse:
@@ -35,14 +36,24 @@ async def sql_answer(
         status="preprocessing",
     )
 
-    background_tasks.add_task(
-        service_container.sql_answer_service.sql_answer,
+    service_container.sql_answer_service.start_sql_answer(
         sql_answer_request,
         service_metadata=asdict(service_metadata),
     )
     return SqlAnswerResponse(query_id=query_id)
 
 
+@router.patch("/sql-answers/{query_id}")
+async def stop_sql_answer(
+    query_id: str,
+    stop_sql_answer_request: StopSqlAnswerRequest,
+    service_container: ServiceContainer = Depends(get_service_container),
+) -> StopSqlAnswerResponse:
+    stop_sql_answer_request.query_id = query_id
+    service_container.sql_answer_service.stop_sql_answer(stop_sql_answer_request)
+    return StopSqlAnswerResponse(query_id=query_id)
+
+
 @router.get("/sql-answers/{query_id}")
 async def get_sql_answer_result(
     query_id: str,
@@ -1,5 +1,6 @@
+import asyncio
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Coroutine, Dict, Literal, Optional, Set
 
 import orjson
 import pytz
@@ -74,6 +75,37 @@ class BaseRequest(BaseModel):
         self._query_id = query_id
 
 
+class QueryTasks:
+    """
+    The asyncio tasks running for each query_id, so a stop request can cancel them.
+
+    The cancellation is raised at the await the task is suspended at, e.g. the LLM completion,
+    the embedding or the engine request, which aborts the underlying HTTP request.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Set[asyncio.Task]] = {}
+
+    def create(self, query_id: str, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.setdefault(query_id, set()).add(task)
+        task.add_done_callback(lambda task: self._discard(query_id, task))
+        return task
+
+    def _discard(self, query_id: str, task: asyncio.Task) -> None:
+        if (tasks := self._tasks.get(query_id)) is None:
+            return
+        tasks.discard(task)
+        if not tasks:
+            del self._tasks[query_id]
+
+    def cancel(self, query_id: str) -> bool:
+        tasks = self._tasks.pop(query_id, set())
+        for task in tasks:
+            task.cancel()
+        return bool(tasks)
+
+
 # Put the services imports here to avoid circular imports and make them accessible directly to the rest of packages
 from .ask import AskService  # noqa: E402
 from .chart import ChartService  # noqa: E402
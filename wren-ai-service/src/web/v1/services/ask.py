@@ -1,17 +1,54 @@
 import asyncio
 import logging
+import re
 from typing import Dict, List, Literal, Optional
 
 from cachetools import TTLCache
 from langfuse.decorators import observe
 from pydantic import AliasChoices, BaseModel, Field
 
+from src.core.deadline import deadline_exceeded, with_deadline
+from src.core.embedding import with_embedding_context
 from src.core.pipeline import BasicPipeline
 from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest, SSEEvent
+from src.web.v1.services import BaseRequest, QueryTasks, SSEEvent
 
 logger = logging.getLogger("wren-ai-service")
 
+# the pipelines streaming their output to the clients of an ask
+_STREAMING_PIPELINES = (
+    "sql_generation_reasoning",
+    "followup_sql_generation_reasoning",
+    "misleading_assistance",
+    "data_assistance",
+    "user_guide_assistance",
+)
+
+# the share of words a rephrased question must have in common with the original one,
+# for the schema retrieved with the original question to be used
+_SPECULATIVE_RETRIEVAL_SIMILARITY = 0.8
+
+
+def _differs_materially(query: str, rephrased_question: str) -> bool:
+    words = set(re.findall(r"\w+", query.lower()))
+    rephrased_words = set(re.findall(r"\w+", rephrased_question.lower()))
+    if not words or not rephrased_words:
+        return words != rephrased_words
+
+    similarity = len(words & rephrased_words) / len(words | rephrased_words)
+    return similarity < _SPECULATIVE_RETRIEVAL_SIMILARITY
+
+
+def _cancel_tasks(*tasks: Optional[asyncio.Task]) -> None:
+    for task in tasks:
+        if task is None:
+            continue
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            # the result isn't used, only mark the exception as retrieved if any
+            task.exception()
+
 
 class AskHistory(BaseModel):
     sql: str
@@ -29,6 +66,8 @@ class AskRequest(BaseRequest):
     enable_column_pruning: bool = False
     use_dry_plan: bool = False
     allow_dry_plan_fallback: bool = True
+    # the seconds the ask may take, the deadline set in the settings is used if not given
+    deadline: Optional[float] = None
 
 
 class AskResponse(BaseModel):
@@ -144,6 +183,8 @@ class AskService:
         enable_column_pruning: bool = False,
         max_sql_correction_retries: int = 3,
         max_histories: int = 5,
+        enable_speculative_retrieval: bool = False,
+        deadline: float = 0,
         maxsize: int = 1_000_000,
         ttl: int = 120,
     ):
@@ -160,6 +201,9 @@ class AskService:
         self._enable_column_pruning = enable_column_pruning
         self._max_histories = max_histories
         self._max_sql_correction_retries = max_sql_correction_retries
+        self._enable_speculative_retrieval = enable_speculative_retrieval
+        self._deadline = deadline
+        self._tasks = QueryTasks()
 
     def _is_stopped(self, query_id: str, container: dict):
         if (
@@ -171,6 +215,8 @@ class AskService:
 
     @observe(name="Ask Question")
     @trace_metadata
+    @with_embedding_context
+    @with_deadline
     async def ask(
         self,
         ask_request: AskRequest,
@@ -212,6 +258,10 @@ class AskService:
         current_sql_correction_retries = 0
         use_dry_plan = ask_request.use_dry_plan
         allow_dry_plan_fallback = ask_request.allow_dry_plan_fallback
+        sql_pairs_retrieval = None
+        instructions_retrieval = None
+        speculative_retrieval = None
+        speculative_sql_functions = None
 
         try:
             user_query = ask_request.query
@@ -225,6 +275,39 @@ class AskService:
                     is_followup=True if histories else False,
                 )
 
+                # the lookups are launched together, the SQL pairs and instructions are
+                # cancelled if a historical question is found
+                sql_pairs_retrieval = asyncio.create_task(
+                    self._pipelines["sql_pairs_retrieval"].run(
+                        query=user_query,
+                        project_id=ask_request.project_id,
+                    )
+                )
+                instructions_retrieval = asyncio.create_task(
+                    self._pipelines["instructions_retrieval"].run(
+                        query=user_query,
+                        project_id=ask_request.project_id,
+                    )
+                )
+                if self._enable_speculative_retrieval:
+                    # most questions are TEXT_TO_SQL ones, so the retrievals start along with
+                    # the lookups and the intent classification, and are cancelled if the
+                    # question is a historical one or the intent is another one
+                    speculative_retrieval = asyncio.create_task(
+                        self._pipelines["db_schema_retrieval"].run(
+                            query=user_query,
+                            histories=histories,
+                            project_id=ask_request.project_id,
+                            enable_column_pruning=enable_column_pruning,
+                        )
+                    )
+                    if allow_sql_functions_retrieval:
+                        speculative_sql_functions = asyncio.create_task(
+                            self._pipelines["sql_functions_retrieval"].run(
+                                project_id=ask_request.project_id,
+                            )
+                        )
+
                 historical_question = await self._pipelines["historical_question"].run(
                     query=user_query,
                     project_id=ask_request.project_id,
@@ -236,6 +319,12 @@ class AskService:
                 ).get("documents", [])[:1]
 
                 if historical_question_result:
+                    _cancel_tasks(
+                        sql_pairs_retrieval,
+                        instructions_retrieval,
+                        speculative_retrieval,
+                        speculative_sql_functions,
+                    )
                     api_results = [
                         AskResult(
                             **{
@@ -248,16 +337,8 @@ class AskService:
                     ]
                     sql_generation_reasoning = ""
                 else:
-                    # Run both pipeline operations concurrently
                     sql_samples_task, instructions_task = await asyncio.gather(
-                        self._pipelines["sql_pairs_retrieval"].run(
-                            query=user_query,
-                            project_id=ask_request.project_id,
-                        ),
-                        self._pipelines["instructions_retrieval"].run(
-                            query=user_query,
-                            project_id=ask_request.project_id,
-                        ),
+                        sql_pairs_retrieval, instructions_retrieval
                     )
 
                     # Extract results from completed tasks
@@ -289,7 +370,8 @@ class AskService:
                             user_query = rephrased_question
 
                         if intent == "MISLEADING_QUERY":
-                            asyncio.create_task(
+                            self._tasks.create(
+                                query_id,
                                 self._pipelines["misleading_assistance"].run(
                                     query=user_query,
                                     histories=histories,
@@ -298,7 +380,7 @@ class AskService:
                                     ),
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -313,7 +395,8 @@ class AskService:
                             results["metadata"]["type"] = "MISLEADING_QUERY"
                             return results
                         elif intent == "GENERAL":
-                            asyncio.create_task(
+                            self._tasks.create(
+                                query_id,
                                 self._pipelines["data_assistance"].run(
                                     query=user_query,
                                     histories=histories,
@@ -322,7 +405,7 @@ class AskService:
                                     ),
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -337,12 +420,13 @@ class AskService:
                             results["metadata"]["type"] = "GENERAL"
                             return results
                         elif intent == "USER_GUIDE":
-                            asyncio.create_task(
+                            self._tasks.create(
+                                query_id,
                                 self._pipelines["user_guide_assistance"].run(
                                     query=user_query,
                                     language=ask_request.configurations.language,
                                     query_id=ask_request.query_id,
-                                )
+                                ),
                             )
 
                             self._ask_results[query_id] = AskResultResponse(
@@ -375,12 +459,18 @@ class AskService:
                     is_followup=True if histories else False,
                 )
 
-                retrieval_result = await self._pipelines["db_schema_retrieval"].run(
-                    query=user_query,
-                    histories=histories,
-                    project_id=ask_request.project_id,
-                    enable_column_pruning=enable_column_pruning,
-                )
+                if speculative_retrieval is not None and not _differs_materially(
+                    ask_request.query, user_query
+                ):
+                    retrieval_result = await speculative_retrieval
+                else:
+                    _cancel_tasks(speculative_retrieval)
+                    retrieval_result = await self._pipelines["db_schema_retrieval"].run(
+                        query=user_query,
+                        histories=histories,
+                        project_id=ask_request.project_id,
+                        enable_column_pruning=enable_column_pruning,
+                    )
                 _retrieval_result = retrieval_result.get(
                     "construct_retrieval_results", {}
                 )
@@ -469,7 +559,9 @@ class AskService:
                     is_followup=True if histories else False,
                 )
 
-                if allow_sql_functions_retrieval:
+                if speculative_sql_functions is not None:
+                    sql_functions = await speculative_sql_functions
+                elif allow_sql_functions_retrieval:
                     sql_functions = await self._pipelines[
                         "sql_functions_retrieval"
                     ].run(
@@ -538,7 +630,11 @@ class AskService:
                         invalid_sql = failed_dry_run_result["sql"]
                         error_message = failed_dry_run_result["error"]
 
-                        if failed_dry_run_result["type"] == "TIME_OUT":
+                        # no correction could be checked within the time left
+                        if (
+                            failed_dry_run_result["type"] == "TIME_OUT"
+                            or deadline_exceeded()
+                        ):
                             break
 
                         current_sql_correction_retries += 1
@@ -636,15 +732,37 @@ class AskService:
             results["metadata"]["error_message"] = str(e)
             results["metadata"]["type"] = "TEXT_TO_SQL"
             return results
+        finally:
+            # the tasks left are not used, e.g. for the other intents or on errors
+            _cancel_tasks(
+                sql_pairs_retrieval,
+                instructions_retrieval,
+                speculative_retrieval,
+                speculative_sql_functions,
+            )
+
+    def start_ask(
+        self,
+        ask_request: AskRequest,
+        **kwargs,
+    ) -> asyncio.Task:
+        return self._tasks.create(ask_request.query_id, self.ask(ask_request, **kwargs))
 
     def stop_ask(
         self,
         stop_ask_request: StopAskRequest,
     ):
-        self._ask_results[stop_ask_request.query_id] = AskResultResponse(
+        query_id = stop_ask_request.query_id
+        self._ask_results[query_id] = AskResultResponse(
             status="stopped",
         )
 
+        if self._tasks.cancel(query_id):
+            logger.info(f"ask pipeline - query {query_id} is cancelled")
+        for name in _STREAMING_PIPELINES:
+            if (pipeline := self._pipelines.get(name)) is not None:
+                pipeline.stop_streaming(query_id)
+
     def get_ask_result(
         self,
         ask_result_request: AskResultRequest,
@@ -694,6 +812,7 @@ class AskService:
 
     @observe(name="Ask Feedback")
     @trace_metadata
+    @with_embedding_context
     async def ask_feedback(
         self,
         ask_feedback_request: AskFeedbackRequest,
@@ -876,16 +995,28 @@ class AskService:
             results["metadata"]["error_message"] = str(e)
             return results
 
+    def start_ask_feedback(
+        self,
+        ask_feedback_request: AskFeedbackRequest,
+        **kwargs,
+    ) -> asyncio.Task:
+        return self._tasks.create(
+            ask_feedback_request.query_id,
+            self.ask_feedback(ask_feedback_request, **kwargs),
+        )
+
     def stop_ask_feedback(
         self,
         stop_ask_feedback_request: StopAskFeedbackRequest,
     ):
-        self._ask_feedback_results[
-            stop_ask_feedback_request.query_id
-        ] = AskFeedbackResultResponse(
+        query_id = stop_ask_feedback_request.query_id
+        self._ask_feedback_results[query_id] = AskFeedbackResultResponse(
             status="stopped",
         )
 
+        if self._tasks.cancel(query_id):
+            logger.info(f"ask feedback pipeline - query {query_id} is cancelled")
+
     def get_ask_feedback_result(
         self,
         ask_feedback_result_request: AskFeedbackResultRequest,
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Any, Dict, Literal, Optional
 
@@ -7,7 +8,7 @@ from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest
+from src.web.v1.services import BaseRequest, QueryTasks
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -70,6 +71,7 @@ class ChartService:
         self._chart_results: Dict[str, ChartResultResponse] = TTLCache(
             maxsize=maxsize, ttl=ttl
         )
+        self._tasks = QueryTasks()
 
     def _is_stopped(self, query_id: str):
         if (
@@ -166,14 +168,27 @@ class ChartService:
             results["metadata"]["error_message"] = str(e)
             return results
 
+    def start_chart(
+        self,
+        chart_request: ChartRequest,
+        **kwargs,
+    ) -> asyncio.Task:
+        return self._tasks.create(
+            chart_request.query_id, self.chart(chart_request, **kwargs)
+        )
+
     def stop_chart(
         self,
         stop_chart_request: StopChartRequest,
     ):
-        self._chart_results[stop_chart_request.query_id] = ChartResultResponse(
+        query_id = stop_chart_request.query_id
+        self._chart_results[query_id] = ChartResultResponse(
             status="stopped",
         )
 
+        if self._tasks.cancel(query_id):
+            logger.info(f"chart pipeline - query {query_id} is cancelled")
+
     def get_chart_result(
         self,
         chart_result_request: ChartResultRequest,
@@ -2,11 +2,16 @@ import asyncio
 import logging
 from typing import Dict, Literal, Optional
 
+import orjson
 from cachetools import TTLCache
 from langfuse.decorators import observe
 from pydantic import AliasChoices, BaseModel, Field
 
 from src.core.pipeline import BasicPipeline
+from src.core.provider import DocumentStoreProvider
+from src.pipelines.indexing.utils import snapshot
+from src.pipelines.indexing.utils.manifest import MDLDiff, MDLManifest
+from src.providers.document_store.deploy_versions import DeployVersions
 from src.utils import trace_metadata
 from src.web.v1.services import BaseRequest
 
@@ -43,17 +48,70 @@ class SemanticsPreparationStatusResponse(BaseModel):
     error: Optional[SemanticsPreparationError] = None
 
 
+def _with_deploy_version(input: dict, deploy_version: Optional[str]) -> dict:
+    return {**input, "deploy_version": deploy_version} if deploy_version else input
+
+
 class SemanticsPreparationService:
     def __init__(
         self,
         pipelines: Dict[str, BasicPipeline],
         maxsize: int = 1_000_000,
         ttl: int = 120,
+        enable_incremental_indexing: bool = False,
+        deploy_versions: Optional[DeployVersions] = None,
+        document_store_provider: Optional[DocumentStoreProvider] = None,
     ):
         self._pipelines = pipelines
         self._prepare_semantics_statuses: Dict[
             str, SemanticsPreparationStatusResponse
         ] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._enable_incremental_indexing = enable_incremental_indexing
+        # the manifest of the last successfully indexed MDL of each project, kept in memory,
+        # so the first deployment of a project after a restart is always a full reindex
+        self._manifests: Dict[Optional[str], MDLManifest] = {}
+        # with blue/green indexing, the documents are written under a new deploy version,
+        # which is only activated once all the pipelines are done
+        self._deploy_versions = deploy_versions
+        # the stores of all the collections, for the snapshots of the projects
+        self._document_store_provider = document_store_provider
+
+    def _full_indexing_tasks(
+        self, input: dict, deploy_version: Optional[str] = None
+    ) -> list:
+        versioned_input = _with_deploy_version(input, deploy_version)
+        return [
+            self._pipelines[name].run(**versioned_input)
+            for name in [
+                "db_schema",
+                "historical_question",
+                "table_description",
+                "project_meta",
+            ]
+        ] + [
+            # the sql pairs are also written through their own API, so they are not versioned
+            self._pipelines["sql_pairs"].run(**input),
+        ]
+
+    def _incremental_indexing_tasks(
+        self, input: dict, diff: MDLDiff, deploy_version: Optional[str] = None
+    ) -> list:
+        tasks = []
+        versioned_input = _with_deploy_version(input, deploy_version)
+
+        if names := diff.names:
+            tasks += [
+                self._pipelines[name].run(**versioned_input, names=names)
+                for name in ["db_schema", "table_description"]
+            ]
+        if diff.views:
+            tasks.append(self._pipelines["historical_question"].run(**versioned_input))
+        if diff.boilerplates_changed:
+            tasks.append(self._pipelines["sql_pairs"].run(**input))
+        if diff.data_source_changed:
+            tasks.append(self._pipelines["project_meta"].run(**versioned_input))
+
+        return tasks
 
     @observe(name="Prepare Semantics")
     @trace_metadata
@@ -70,26 +128,84 @@ class SemanticsPreparationService:
             },
         }
 
+        project_id = prepare_semantics_request.project_id
+        previous = self._manifests.get(project_id)
+
+        if (
+            self._enable_incremental_indexing
+            and previous is not None
+            and previous.mdl_hash == prepare_semantics_request.mdl_hash
+        ):
+            logger.info(
+                f"Project ID: {project_id}, MDL {previous.mdl_hash} is already indexed, skipping..."
+            )
+            self._prepare_semantics_statuses[
+                prepare_semantics_request.mdl_hash
+            ] = SemanticsPreparationStatusResponse(
+                status="finished",
+            )
+            return results
+
+        new_version = None
+        deploy_version = None
         try:
             logger.info(f"MDL: {prepare_semantics_request.mdl}")
 
             input = {
                 "mdl_str": prepare_semantics_request.mdl,
-                "project_id": prepare_semantics_request.project_id,
+                "project_id": project_id,
             }
 
-            tasks = [
-                self._pipelines[name].run(**input)
-                for name in [
-                    "db_schema",
-                    "historical_question",
-                    "table_description",
-                    "sql_pairs",
-                    "project_meta",
-                ]
-            ]
+            manifest = None
+            if self._enable_incremental_indexing:
+                manifest = MDLManifest.from_mdl(
+                    prepare_semantics_request.mdl_hash,
+                    orjson.loads(prepare_semantics_request.mdl),
+                )
 
+            if manifest is not None and previous is not None:
+                diff = previous.diff(manifest)
+                if diff.is_empty:
+                    logger.info(
+                        f"Project ID: {project_id}, MDL {manifest.mdl_hash} has no semantic change, skipping..."
+                    )
+                    self._manifests[project_id] = manifest
+                    self._prepare_semantics_statuses[
+                        prepare_semantics_request.mdl_hash
+                    ] = SemanticsPreparationStatusResponse(
+                        status="finished",
+                    )
+                    return results
+
+                logger.info(
+                    f"Project ID: {project_id}, incremental indexing: {len(diff.models)} models, {len(diff.views)} views, {len(diff.metrics)} metrics changed"
+                )
+                # the changed documents are replaced within the active version
+                deploy_version = (
+                    await self._deploy_versions.get(project_id)
+                    if self._deploy_versions is not None
+                    else None
+                )
+                tasks = self._incremental_indexing_tasks(input, diff, deploy_version)
+            else:
+                if self._deploy_versions is not None:
+                    new_version = deploy_version = await self._deploy_versions.begin(
+                        project_id
+                    )
+                tasks = self._full_indexing_tasks(input, new_version)
+
+            # drop the manifest first, so a failed run always falls back to a full reindex
+            self._manifests.pop(project_id, None)
             await asyncio.gather(*tasks)
+            if new_version is not None:
+                await self._deploy_versions.activate(project_id, new_version)
+            if deploy_version is not None:
+                # the DDL cache is only refreshed once the documents are served
+                self._pipelines["db_schema"].activate_ddl_cache(
+                    project_id, deploy_version
+                )
+            if manifest is not None:
+                self._manifests[project_id] = manifest
 
             self._prepare_semantics_statuses[
                 prepare_semantics_request.mdl_hash
@@ -98,6 +214,13 @@ class SemanticsPreparationService:
             )
         except Exception as e:
             logger.exception(f"Failed to prepare semantics: {e}")
+            if deploy_version is not None:
+                self._pipelines["db_schema"].discard_ddl_cache(
+                    project_id, deploy_version
+                )
+            if new_version is not None:
+                # the previous version stays active, the partial one is removed later
+                self._deploy_versions.abort(project_id, new_version)
 
             self._prepare_semantics_statuses[
                 prepare_semantics_request.mdl_hash
@@ -139,6 +262,7 @@ class SemanticsPreparationService:
     @trace_metadata
     async def delete_semantics(self, project_id: str, **kwargs):
         logger.info(f"Project ID: {project_id}, Deleting semantics documents...")
+        self._manifests.pop(project_id, None)
 
         tasks = [
             self._pipelines[name].clean(project_id=project_id)
@@ -157,3 +281,31 @@ class SemanticsPreparationService:
         ]
 
         await asyncio.gather(*tasks)
+        if self._deploy_versions is not None:
+            await self._deploy_versions.remove(project_id)
+
+    def _snapshot_stores(self) -> dict:
+        return {
+            index: self._document_store_provider.get_store(dataset_name=index)
+            for index in snapshot.SNAPSHOT_INDEXES
+        }
+
+    @observe(name="Export Semantics Snapshot", capture_output=False)
+    async def export_snapshot(self, project_id: str) -> bytes:
+        logger.info(f"Project ID: {project_id}, Exporting semantics snapshot...")
+        return await snapshot.export_snapshot(self._snapshot_stores(), project_id)
+
+    @observe(name="Import Semantics Snapshot", capture_input=False)
+    async def import_snapshot(self, project_id: str, data: bytes) -> Dict[str, int]:
+        logger.info(f"Project ID: {project_id}, Importing semantics snapshot...")
+        # the next deployment of the project is a full reindex
+        self._manifests.pop(project_id, None)
+        try:
+            return await snapshot.import_snapshot(
+                self._snapshot_stores(),
+                project_id,
+                data,
+                deploy_versions=self._deploy_versions,
+            )
+        finally:
+            self._pipelines["db_schema"].invalidate_ddl_cache(project_id)
@@ -8,7 +8,7 @@ from pydantic import BaseModel
 
 from src.core.pipeline import BasicPipeline
 from src.utils import trace_metadata
-from src.web.v1.services import BaseRequest, SSEEvent
+from src.web.v1.services import BaseRequest, QueryTasks, SSEEvent
 
 logger = logging.getLogger("wren-ai-service")
 
@@ -25,6 +25,15 @@ class SqlAnswerResponse(BaseModel):
     query_id: str
 
 
+# PATCH /v1/sql-answers/{query_id}
+class StopSqlAnswerRequest(BaseRequest):
+    status: Literal["stopped"]
+
+
+class StopSqlAnswerResponse(BaseModel):
+    query_id: str
+
+
 # GET /v1/sql-answers/{query_id}
 class SqlAnswerResultRequest(BaseModel):
     query_id: str
@@ -35,7 +44,7 @@ class SqlAnswerResultResponse(BaseModel):
         code: Literal["OTHERS"]
         message: str
 
-    status: Literal["preprocessing", "succeeded", "failed"]
+    status: Literal["preprocessing", "succeeded", "failed", "stopped"]
     num_rows_used_in_llm: Optional[int] = None
     error: Optional[SqlAnswerError] = None
     trace_id: Optional[str] = None
@@ -52,6 +61,7 @@ class SqlAnswerService:
         self._sql_answer_results: Dict[str, SqlAnswerResultResponse] = TTLCache(
             maxsize=maxsize, ttl=ttl
         )
+        self._tasks = QueryTasks()
 
     @observe(name="SQL Answer")
     @trace_metadata
@@ -93,7 +103,8 @@ class SqlAnswerService:
                 trace_id=trace_id,
             )
 
-            asyncio.create_task(
+            self._tasks.create(
+                query_id,
                 self._pipelines["sql_answer"].run(
                     query=sql_answer_request.query,
                     sql=sql_answer_request.sql,
@@ -102,7 +113,7 @@ class SqlAnswerService:
                     current_time=sql_answer_request.configurations.show_current_time(),
                     query_id=query_id,
                     custom_instruction=sql_answer_request.custom_instruction,
-                )
+                ),
             )
 
             return results
@@ -124,6 +135,29 @@ class SqlAnswerService:
             results["metadata"]["error_message"] = str(e)
             return results
 
+    def start_sql_answer(
+        self,
+        sql_answer_request: SqlAnswerRequest,
+        **kwargs,
+    ) -> asyncio.Task:
+        return self._tasks.create(
+            sql_answer_request.query_id,
+            self.sql_answer(sql_answer_request, **kwargs),
+        )
+
+    def stop_sql_answer(
+        self,
+        stop_sql_answer_request: StopSqlAnswerRequest,
+    ):
+        query_id = stop_sql_answer_request.query_id
+        self._sql_answer_results[query_id] = SqlAnswerResultResponse(
+            status="stopped",
+        )
+
+        if self._tasks.cancel(query_id):
+            logger.info(f"sql answer pipeline - query {query_id} is cancelled")
+        self._pipelines["sql_answer"].stop_streaming(query_id)
+
     def get_sql_answer_result(
         self,
         sql_answer_result_request: SqlAnswerResultRequest,
@@ -0,0 +1,208 @@
+"""
+Compare the latency of the lookups done by an ask before the intent classification, on stub
+document stores and a stub embedder with fixed round trip latencies:
+- sequential: the historical question lookup, then the SQL pairs and instructions retrievals
+- fan-out: the three lookups at once, the others being cancelled on a historical question hit,
+  as done by AskService.ask
+
+Each retrieval pipeline runs its count along with the embedding of the question, so it takes
+max(count, embed) + search instead of count + embed + search. The embedding is shared by the
+lookups of the same ask, as in AskService.ask. The fan-out only saves time when no historical
+question is found, a hit costs the same as the sequential lookups.
+
+Usage:
+    poetry run python -m tests.benchmarks.ask_lookup_fanout
+    poetry run python -m tests.benchmarks.ask_lookup_fanout --count-ms 5 --embed-ms 80 --search-ms 15 --rounds 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from haystack import Document
+
+from src.core.embedding import embedding_context
+from src.pipelines.retrieval import (
+    HistoricalQuestionRetrieval,
+    Instructions,
+    SqlPairsRetrieval,
+)
+from tests.benchmarks.stubs import percentile
+
+
+class _StubStore:
+    def __init__(self, dataset_name: str, latency: float):
+        self.dataset_name = dataset_name
+        self._latency = latency
+
+    async def count_documents(self, filters=None) -> int:
+        await asyncio.sleep(self._latency)
+        return 1
+
+
+class _StubRetriever:
+    def __init__(self, documents: list[Document], latency: float):
+        self._documents = documents
+        self._latency = latency
+
+    async def run(self, query_embedding=None, filters=None, **kwargs) -> dict:
+        await asyncio.sleep(self._latency)
+        return {"documents": self._documents}
+
+
+class _StubEmbedder:
+    _model = "stub"
+
+    def __init__(self, latency: float):
+        self._latency = latency
+        self.requests = 0
+
+    async def run(self, text: str) -> dict:
+        self.requests += 1
+        await asyncio.sleep(self._latency)
+        return {"embedding": [0.0] * 8, "meta": {}}
+
+
+class _StubDocumentStoreProvider:
+    def __init__(self, args: argparse.Namespace, documents: dict[str, list[Document]]):
+        self._args = args
+        self._documents = documents
+
+    def get_store(self, dataset_name: str = "Document", **kwargs) -> _StubStore:
+        return _StubStore(dataset_name, self._args.count_ms / 1000)
+
+    def get_retriever(self, document_store: _StubStore, **kwargs) -> _StubRetriever:
+        return _StubRetriever(
+            self._documents[document_store.dataset_name], self._args.search_ms / 1000
+        )
+
+
+class _StubEmbedderProvider:
+    def __init__(self, embedder: _StubEmbedder):
+        self._embedder = embedder
+
+    def get_text_embedder(self) -> _StubEmbedder:
+        return self._embedder
+
+
+def _documents(historical_hit: bool) -> dict[str, list[Document]]:
+    return {
+        "view_questions": [
+            Document(
+                content="How many books are there?",
+                meta={"statement": "SELECT COUNT(*) FROM book", "viewId": ""},
+                score=0.95,
+            )
+        ]
+        if historical_hit
+        else [],
+        "sql_pairs": [
+            Document(
+                content="How many authors are there?",
+                meta={"sql": "SELECT COUNT(*) FROM author"},
+                score=0.8,
+            )
+        ],
+        "instructions": [
+            Document(
+                content="Count the books",
+                meta={"instruction": "Use COUNT(*)", "instruction_id": "1"},
+                score=0.8,
+            )
+        ],
+    }
+
+
+async def _sequential(pipelines: dict, query: str) -> None:
+    historical_question = await pipelines["historical_question"].run(query=query)
+    if historical_question["formatted_output"]["documents"]:
+        return
+
+    await asyncio.gather(
+        pipelines["sql_pairs_retrieval"].run(query=query),
+        pipelines["instructions_retrieval"].run(query=query),
+    )
+
+
+async def _fan_out(pipelines: dict, query: str) -> None:
+    tasks = [
+        asyncio.create_task(pipelines[name].run(query=query))
+        for name in ["sql_pairs_retrieval", "instructions_retrieval"]
+    ]
+    historical_question = await pipelines["historical_question"].run(query=query)
+    if historical_question["formatted_output"]["documents"]:
+        for task in tasks:
+            task.cancel()
+        return
+
+    await asyncio.gather(*tasks)
+
+
+async def _measure(args: argparse.Namespace, lookups, historical_hit: bool) -> tuple:
+    embedder = _StubEmbedder(args.embed_ms / 1000)
+    document_store_provider = _StubDocumentStoreProvider(
+        args, _documents(historical_hit)
+    )
+    embedder_provider = _StubEmbedderProvider(embedder)
+    pipelines = {
+        "historical_question": HistoricalQuestionRetrieval(
+            embedder_provider=embedder_provider,
+            document_store_provider=document_store_provider,
+        ),
+        "sql_pairs_retrieval": SqlPairsRetrieval(
+            embedder_provider=embedder_provider,
+            document_store_provider=document_store_provider,
+        ),
+        "instructions_retrieval": Instructions(
+            embedder_provider=embedder_provider,
+            document_store_provider=document_store_provider,
+        ),
+    }
+
+    latencies = []
+    for i in range(args.rounds):
+        with embedding_context():
+            start = time.perf_counter()
+            await lookups(pipelines, f"question {i}")
+            latencies.append(time.perf_counter() - start)
+
+    return (
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 95) * 1000,
+        embedder.requests / args.rounds,
+    )
+
+
+async def _run(args: argparse.Namespace):
+    chained = args.count_ms + args.embed_ms + args.search_ms
+    collapsed = max(args.count_ms, args.embed_ms) + args.search_ms
+    print(
+        f"count {args.count_ms}ms, embed {args.embed_ms}ms, search {args.search_ms}ms, "
+        f"{args.rounds} rounds"
+    )
+    print(
+        f"expected per pipeline: {chained:.0f}ms with the count, embedding and search "
+        f"chained, {collapsed:.0f}ms with the count and embedding concurrent"
+    )
+    print(f"{'lookups':<12} {'historical':<11} {'p50':>9} {'p95':>9} {'embeds':>7}")
+    for historical_hit in [False, True]:
+        for name, lookups in [("sequential", _sequential), ("fan-out", _fan_out)]:
+            p50, p95, embeds = await _measure(args, lookups, historical_hit)
+            print(
+                f"{name:<12} {'hit' if historical_hit else 'miss':<11} "
+                f"{p50:7.1f}ms {p95:7.1f}ms {embeds:7.1f}"
+            )
+
+
+def main(args: argparse.Namespace):
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count-ms", type=float, default=10.0)
+    parser.add_argument("--embed-ms", type=float, default=60.0)
+    parser.add_argument("--search-ms", type=float, default=20.0)
+    parser.add_argument("--rounds", type=int, default=20)
+
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+"""
+Benchmark query embedding with and without micro-batching against a local stub embedding server.
+
+Usage:
+    poetry run python -m tests.benchmarks.embedder_micro_batching --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from src.providers.embedder.litellm import LitellmEmbedderProvider
+from tests.benchmarks.stubs import StubEmbeddingServer, percentile
+
+os.environ.setdefault("BENCHMARK_EMBEDDER_API_KEY", "sk-stub")
+
+
+async def _run(
+    server: StubEmbeddingServer,
+    concurrency: int,
+    rounds: int,
+    **provider_kwargs,
+) -> dict:
+    provider = LitellmEmbedderProvider(
+        model="openai/text-embedding-3-small",
+        api_key_name="BENCHMARK_EMBEDDER_API_KEY",
+        api_base=server.url,
+        **provider_kwargs,
+    )
+    embedder = provider.get_text_embedder()
+    latencies = []
+
+    async def _embed(text: str):
+        start = time.perf_counter()
+        await embedder.run(text)
+        latencies.append(time.perf_counter() - start)
+
+    server.reset()
+    start = time.perf_counter()
+    for r in range(rounds):
+        await asyncio.gather(*[_embed(f"question {r}-{i}") for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "provider_requests": server.requests,
+        "texts": server.texts,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": len(latencies) / elapsed,
+    }
+
+
+async def main(args: argparse.Namespace):
+    server = StubEmbeddingServer(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        max_concurrency=args.provider_concurrency,
+    )
+    await server.start()
+
+    batching_label = f"micro batching ({args.window_ms}ms, max {args.max_batch_size})"
+    try:
+        results = {
+            "no batching": await _run(server, args.concurrency, args.rounds),
+            batching_label: await _run(
+                server,
+                args.concurrency,
+                args.rounds,
+                micro_batching=True,
+                micro_batch_window_ms=args.window_ms,
+                micro_batch_max_size=args.max_batch_size,
+            ),
+        }
+    finally:
+        await server.stop()
+
+    for name, result in results.items():
+        print(
+            f"{name:<40} requests={result['provider_requests']:<6} "
+            f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+            f"throughput={result['throughput_rps']:.1f}/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--provider-concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=18080)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,185 @@
+"""
+Benchmark the latency of the filters used by the retrieval pipelines on a large Qdrant collection:
+a collection with a payload index on project_id only, filtered with an OR of `name ==` conditions
+as before, against a collection with the payload indexes of `PAYLOAD_INDEXES`, filtered with a
+single `name in [...]` match.
+
+Payload indexes have no effect in the local mode of qdrant-client, so this needs a running Qdrant.
+
+Usage:
+    poetry run python -m tests.benchmarks.qdrant_filter_latency --location http://localhost:6333
+    poetry run python -m tests.benchmarks.qdrant_filter_latency --points 100000 --names 5 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+
+from src.providers.document_store.qdrant import (
+    PAYLOAD_INDEXES,
+    AsyncQdrantDocumentStore,
+    get_payload_fields_to_index,
+)
+
+
+def _documents(args: argparse.Namespace):
+    rng = random.Random(0)
+    for i in range(args.points):
+        yield Document(
+            id=str(i),
+            content=f"document {i}",
+            meta={
+                "project_id": str(i % args.projects),
+                "type": "TABLE_SCHEMA" if i % 2 else "TABLE_DESCRIPTION",
+                "name": f"table_{i // args.projects % args.tables}",
+                "is_default": i % 50 == 0,
+                "sql_pair_id": str(i),
+                "instruction_id": str(i),
+            },
+            embedding=[rng.random() for _ in range(args.embedding_dim)],
+        )
+
+
+def _queries(args: argparse.Namespace, names: int, in_match: bool):
+    project = {"field": "project_id", "operator": "==", "value": "0"}
+    table_names = [f"table_{i}" for i in range(names)]
+    name_condition = (
+        {"field": "name", "operator": "in", "value": table_names}
+        if in_match
+        else {
+            "operator": "OR",
+            "conditions": [
+                {"field": "name", "operator": "==", "value": table_name}
+                for table_name in table_names
+            ],
+        }
+    )
+    return {
+        f"dbschema_retrieval {names} names": {
+            "operator": "AND",
+            "conditions": [
+                {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
+                name_condition,
+                project,
+            ],
+        },
+        "default instructions": {
+            "operator": "AND",
+            "conditions": [
+                {"field": "is_default", "operator": "==", "value": True},
+                project,
+            ],
+        },
+        "sql pairs by id": {
+            "operator": "AND",
+            "conditions": [
+                {
+                    "field": "sql_pair_id",
+                    "operator": "in",
+                    "value": [str(i * args.projects) for i in range(names)],
+                },
+                project,
+            ],
+        },
+    }
+
+
+async def _create_store(
+    args: argparse.Namespace, index: str, payload_fields_to_index: list[dict]
+) -> AsyncQdrantDocumentStore:
+    store = AsyncQdrantDocumentStore(
+        location=args.location,
+        embedding_dim=args.embedding_dim,
+        index=index,
+        recreate_index=not args.reuse,
+        on_disk=True,
+        progress_bar=False,
+        payload_fields_to_index=payload_fields_to_index,
+        write_batch_size=1000,
+    )
+    if not args.reuse:
+        batch = []
+        for document in _documents(args):
+            batch.append(document)
+            if len(batch) == 100_000:
+                await store.write_documents(batch, policy=DuplicatePolicy.OVERWRITE)
+                batch = []
+        await store.write_documents(batch, policy=DuplicatePolicy.OVERWRITE)
+    return store
+
+
+async def _measure(
+    store: AsyncQdrantDocumentStore, filters: dict, repeats: int
+) -> tuple[float, int]:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        payloads = await store._query_payloads_by_filters(
+            filters=filters, payload_fields=["name"]
+        )
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), len(payloads)
+
+
+async def _run(args: argparse.Namespace):
+    # the union of the payload indexes of all the collections, as the points carry all the fields
+    indexed_fields = list(
+        {
+            payload_index["field_name"]: payload_index
+            for index in PAYLOAD_INDEXES
+            for payload_index in get_payload_fields_to_index(index)
+        }.values()
+    )
+
+    stores = {
+        "before": await _create_store(
+            args,
+            "filter_latency_before",
+            [{"field_name": "project_id", "field_schema": "keyword"}],
+        ),
+        "after": await _create_store(args, "filter_latency_after", indexed_fields),
+    }
+
+    print(f"{args.points} points, {args.projects} projects on {args.location}")
+    print(f"{'':<32} {'before':>10} {'after':>10} {'matches':>8}")
+    for names in args.names:
+        before = _queries(args, names, in_match=False)
+        after = _queries(args, names, in_match=True)
+        for name in before:
+            before_latency, matches = await _measure(
+                stores["before"], before[name], args.repeats
+            )
+            after_latency, _ = await _measure(
+                stores["after"], after[name], args.repeats
+            )
+            print(
+                f"{name:<32} {before_latency * 1000:8.2f}ms "
+                f"{after_latency * 1000:8.2f}ms {matches:>8}"
+            )
+
+
+def main(args: argparse.Namespace):
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--location", default="http://localhost:6333")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--names", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--embedding-dim", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="query the collections written by a previous run",
+    )
+
+    main(parser.parse_args())
@@ -0,0 +1,206 @@
+"""
+Sweep the HNSW parameters of the Qdrant document stores on synthetic schemas, and report the
+recall@k against an exact search and the search latency of each combination, for searches
+filtered by project as sent by the pipelines and for searches without a project.
+
+Every project has tables made of a description and column chunks, embedded around a centroid of
+the project and one of the table, so the neighbours of a question are the chunks of a few tables.
+The graphs of the `single` tenancy mode are global ones, with `--m` as their degree, and the ones
+of the `multi` mode are built per project_id, with `--m` as their `payload_m`.
+
+Payload indexes and HNSW graphs have no effect in the local mode of qdrant-client, so this needs a
+running Qdrant.
+
+Usage:
+    poetry run python -m tests.benchmarks.qdrant_hnsw_sweep --location http://localhost:6333
+    poetry run python -m tests.benchmarks.qdrant_hnsw_sweep --tenancy single --m 8 16 32 --hnsw-ef 32 64 128 256
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+from qdrant_client.http import models as rest
+
+from src.providers.document_store.qdrant import (
+    AsyncQdrantDocumentStore,
+    get_hnsw_config,
+)
+
+
+def _schemas(args: argparse.Namespace) -> tuple[list[Document], np.ndarray]:
+    rng = np.random.default_rng(0)
+    documents = []
+    embeddings = []
+    for project in range(args.projects):
+        project_centroid = rng.normal(size=args.embedding_dim)
+        for table in range(args.tables):
+            table_centroid = project_centroid + rng.normal(size=args.embedding_dim)
+            for chunk in range(args.chunks):
+                embedding = table_centroid + 0.5 * rng.normal(size=args.embedding_dim)
+                embedding /= np.linalg.norm(embedding)
+                embeddings.append(embedding)
+                documents.append(
+                    Document(
+                        id=str(len(documents)),
+                        content=f"table_{table} chunk {chunk}",
+                        meta={
+                            "project_id": str(project),
+                            "type": "TABLE_SCHEMA",
+                            "name": f"table_{table}",
+                        },
+                        embedding=embedding.tolist(),
+                    )
+                )
+    return documents, np.array(embeddings, dtype=np.float32)
+
+
+def _queries(
+    args: argparse.Namespace, embeddings: np.ndarray
+) -> list[tuple[str, np.ndarray]]:
+    rng = np.random.default_rng(1)
+    per_project = args.tables * args.chunks
+    queries = []
+    for _ in range(args.queries):
+        row = int(rng.integers(len(embeddings)))
+        query = embeddings[row] + 0.5 * rng.normal(size=args.embedding_dim) / np.sqrt(
+            args.embedding_dim
+        )
+        queries.append((str(row // per_project), query / np.linalg.norm(query)))
+    return queries
+
+
+def _exact_neighbours(
+    args: argparse.Namespace,
+    embeddings: np.ndarray,
+    project_id: str | None,
+    query: np.ndarray,
+) -> set[str]:
+    offset = 0
+    if project_id is not None:
+        per_project = args.tables * args.chunks
+        offset = int(project_id) * per_project
+        embeddings = embeddings[offset : offset + per_project]
+    top = np.argsort(-(embeddings @ query), kind="stable")[: args.top_k]
+    return {str(offset + row) for row in top}
+
+
+async def _wait_for_indexing(store: AsyncQdrantDocumentStore) -> None:
+    while True:
+        collection = await store.async_client.get_collection(store.index)
+        if (
+            collection.status == rest.CollectionStatus.GREEN
+            and collection.optimizer_status == rest.OptimizersStatusOneOf.OK
+        ):
+            return
+        await asyncio.sleep(1)
+
+
+async def _search(
+    args: argparse.Namespace,
+    store: AsyncQdrantDocumentStore,
+    embeddings: np.ndarray,
+    queries: list[tuple[str, np.ndarray]],
+    filtered: bool,
+) -> tuple[float, float, float]:
+    recalls = []
+    latencies = []
+    for project_id, query in queries:
+        project_id = project_id if filtered else None
+        filters = (
+            {"field": "project_id", "operator": "==", "value": project_id}
+            if project_id is not None
+            else None
+        )
+        start = time.perf_counter()
+        documents = await store._query_by_embedding(
+            query.tolist(), filters=filters, top_k=args.top_k
+        )
+        latencies.append(time.perf_counter() - start)
+
+        expected = _exact_neighbours(args, embeddings, project_id, query)
+        recalls.append(
+            len(expected & {document.id for document in documents}) / len(expected)
+        )
+
+    latencies.sort()
+    return (
+        statistics.mean(recalls),
+        statistics.median(latencies),
+        latencies[int(len(latencies) * 0.95) - 1],
+    )
+
+
+async def _run(args: argparse.Namespace):
+    documents, embeddings = _schemas(args)
+    queries = _queries(args, embeddings)
+
+    print(
+        f"{len(documents)} chunks, {args.projects} projects, {args.queries} queries, "
+        f"recall@{args.top_k} on {args.location}"
+    )
+    print(
+        f"{'tenancy':<8} {'m':>4} {'ef_construct':>12} {'hnsw_ef':>8} {'index':>8} "
+        f"{'search':<10} {'recall':>7} {'p50':>9} {'p95':>9}"
+    )
+    for tenancy in args.tenancy:
+        for m in args.m:
+            for ef_construct in args.ef_construct:
+                hnsw_config, _ = get_hnsw_config(
+                    tenancy, m=m, ef_construct=ef_construct
+                )
+                store = AsyncQdrantDocumentStore(
+                    location=args.location,
+                    embedding_dim=args.embedding_dim,
+                    index="hnsw_sweep",
+                    recreate_index=True,
+                    on_disk=True,
+                    progress_bar=False,
+                    hnsw_config=hnsw_config,
+                    # index the vectors as soon as they are written
+                    optimizers_config=rest.OptimizersConfigDiff(indexing_threshold=1),
+                )
+
+                start = time.perf_counter()
+                await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+                await _wait_for_indexing(store)
+                indexing = time.perf_counter() - start
+
+                for hnsw_ef in args.hnsw_ef:
+                    store.hnsw_ef = hnsw_ef
+                    for search, filtered in [("project", True), ("all", False)]:
+                        recall, p50, p95 = await _search(
+                            args, store, embeddings, queries, filtered
+                        )
+                        print(
+                            f"{tenancy:<8} {m:>4} {ef_construct:>12} {hnsw_ef:>8} "
+                            f"{indexing:7.1f}s {search:<10} {recall:7.3f} "
+                            f"{p50 * 1000:7.2f}ms {p95 * 1000:7.2f}ms"
+                        )
+
+
+def main(args: argparse.Namespace):
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--location", default="http://localhost:6333")
+    parser.add_argument(
+        "--tenancy", nargs="+", choices=["single", "multi"], default=["single", "multi"]
+    )
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construct", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+
+    main(parser.parse_args())
@@ -0,0 +1,221 @@
+"""
+Measure the recall@k and the p50/p99 search latency of the quantization options of the Qdrant
+document stores on indexed data, with the RAM taken by the vectors kept in memory.
+
+The points of an indexed collection are copied to one collection per quantization, and searched
+by perturbed copies of their own vectors, filtered by their project as the pipelines do, with every
+combination of rescoring and oversampling. The exact neighbours are computed from the original
+vectors.
+
+Usage:
+    poetry run python -m tests.benchmarks.qdrant_quantization --location http://localhost:6333
+    poetry run python -m tests.benchmarks.qdrant_quantization --collection Document --quantization scalar product --oversampling 1 2 4
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import qdrant_client
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+from qdrant_client.http import models as rest
+
+from src.providers.document_store.qdrant import (
+    AsyncQdrantDocumentStore,
+    AsyncQdrantEmbeddingRetriever,
+    get_hnsw_config,
+    get_quantization_config,
+)
+
+
+def _vector_bytes(quantization: str, dim: int, product_compression: str) -> float:
+    if quantization == "scalar":
+        return dim
+    if quantization == "product":
+        return dim * 4 / int(product_compression[1:])
+    if quantization == "binary":
+        return dim / 8
+    return dim * 4
+
+
+async def _load_points(args: argparse.Namespace) -> list[rest.Record]:
+    client = qdrant_client.AsyncQdrantClient(location=args.location)
+    points = []
+    offset = None
+    while True:
+        records, offset = await client.scroll(
+            collection_name=args.collection,
+            offset=offset,
+            limit=1000,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points.extend(records)
+        if offset is None or len(points) >= args.max_points:
+            return points[: args.max_points]
+
+
+def _queries(
+    args: argparse.Namespace, points: list[rest.Record], vectors: np.ndarray
+) -> list[tuple[str, np.ndarray, set[str]]]:
+    rng = np.random.default_rng(0)
+    projects = np.array([point.payload.get("project_id", "") for point in points])
+    ids = np.array([point.payload["id"] for point in points])
+
+    queries = []
+    for row in rng.choice(
+        len(points), size=min(args.queries, len(points)), replace=False
+    ):
+        query = vectors[row] + args.noise * rng.normal(size=vectors.shape[1]) / np.sqrt(
+            vectors.shape[1]
+        )
+        query /= np.linalg.norm(query)
+
+        rows = np.flatnonzero(projects == projects[row])
+        top = rows[np.argsort(-(vectors[rows] @ query), kind="stable")[: args.top_k]]
+        queries.append((str(projects[row]), query, set(ids[top])))
+    return queries
+
+
+async def _wait_for_indexing(store: AsyncQdrantDocumentStore) -> None:
+    while True:
+        collection = await store.async_client.get_collection(store.index)
+        if (
+            collection.status == rest.CollectionStatus.GREEN
+            and collection.optimizer_status == rest.OptimizersStatusOneOf.OK
+        ):
+            return
+        await asyncio.sleep(1)
+
+
+async def _measure(
+    args: argparse.Namespace,
+    retriever: AsyncQdrantEmbeddingRetriever,
+    queries: list[tuple[str, np.ndarray, set[str]]],
+) -> tuple[float, float, float]:
+    recalls = []
+    latencies = []
+    for project_id, query, expected in queries:
+        filters = (
+            {"field": "project_id", "operator": "==", "value": project_id}
+            if project_id
+            else None
+        )
+        start = time.perf_counter()
+        documents = (
+            await retriever.run(
+                query_embedding=query.tolist(), filters=filters, top_k=args.top_k
+            )
+        )["documents"]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(
+            len(expected & {document.id for document in documents}) / len(expected)
+        )
+
+    return (
+        float(np.mean(recalls)),
+        float(np.percentile(latencies, 50)),
+        float(np.percentile(latencies, 99)),
+    )
+
+
+async def _run(args: argparse.Namespace):
+    points = await _load_points(args)
+    if not points:
+        print(f"{args.collection} has no points on {args.location}")
+        return
+
+    vectors = np.array([point.vector for point in points], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    dim = vectors.shape[1]
+    documents = [
+        Document.from_dict({**point.payload, "embedding": point.vector})
+        for point in points
+    ]
+    queries = _queries(args, points, vectors)
+
+    print(
+        f"{len(points)} points of {args.collection} ({dim} dims), {len(queries)} queries, "
+        f"recall@{args.top_k} on {args.location}"
+    )
+    print(
+        f"{'quantization':<12} {'ram':>10} {'rescore':>8} {'oversampling':>12} "
+        f"{'recall':>7} {'p50':>9} {'p99':>9}"
+    )
+    for quantization in args.quantization:
+        store = AsyncQdrantDocumentStore(
+            location=args.location,
+            index=f"{args.collection}_quantization_{quantization}",
+            embedding_dim=dim,
+            recreate_index=True,
+            on_disk=True,
+            progress_bar=False,
+            hnsw_config=get_hnsw_config(args.tenancy)[0],
+            quantization_config=get_quantization_config(
+                quantization, dim, args.product_compression
+            ),
+        )
+        await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+        await _wait_for_indexing(store)
+
+        ram = len(points) * _vector_bytes(quantization, dim, args.product_compression)
+        settings = (
+            [
+                (rescore, oversampling)
+                for rescore in [True, False]
+                for oversampling in args.oversampling
+            ]
+            if store.quantization
+            else [(None, None)]
+        )
+        for rescore, oversampling in settings:
+            retriever = AsyncQdrantEmbeddingRetriever(
+                document_store=store,
+                top_k=args.top_k,
+                rescore=rescore,
+                oversampling=oversampling,
+            )
+            recall, p50, p99 = await _measure(args, retriever, queries)
+            print(
+                f"{quantization:<12} {ram / 1024 / 1024:8.1f}MB "
+                f"{'-' if rescore is None else str(rescore):>8} "
+                f"{'-' if oversampling is None else oversampling:>12} {recall:7.3f} "
+                f"{p50 * 1000:7.2f}ms {p99 * 1000:7.2f}ms"
+            )
+
+        if not args.keep:
+            await store.async_client.delete_collection(store.index)
+
+
+def main(args: argparse.Namespace):
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--location", default="http://localhost:6333")
+    parser.add_argument("--collection", default="table_descriptions")
+    parser.add_argument("--max-points", type=int, default=100_000)
+    parser.add_argument(
+        "--quantization",
+        nargs="+",
+        choices=["none", "scalar", "product", "binary"],
+        default=["none", "scalar", "product", "binary"],
+    )
+    parser.add_argument("--product-compression", default="x16")
+    parser.add_argument(
+        "--oversampling", type=float, nargs="+", default=[1.0, 2.0, 3.0]
+    )
+    parser.add_argument("--tenancy", choices=["single", "multi"], default="multi")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help="keep the quantized copies of the collection",
+    )
+
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+"""
+Benchmark the start up of the Qdrant document stores: a new store, with its own clients, for
+every `get_store` call as before, against the stores and clients shared by `QdrantProvider`.
+Every client holds its own connection pool, so the number of clients is the number of pools
+kept open by the service.
+
+Usage:
+    poetry run python -m tests.benchmarks.qdrant_store_registry --location http://localhost:6333
+"""
+
+import argparse
+import time
+
+from src.providers.document_store.qdrant import (
+    AsyncQdrantDocumentStore,
+    QdrantProvider,
+)
+
+DATASETS = [
+    None,
+    "table_descriptions",
+    "view_questions",
+    "sql_pairs",
+    "instructions",
+    "project_meta",
+]
+
+
+def _report(name: str, elapsed: float, stores: list[AsyncQdrantDocumentStore]):
+    clients = {id(store.client) for store in stores}
+    async_clients = {id(store.async_client) for store in stores}
+    print(
+        f"{name:<24} {elapsed * 1000:9.2f}ms "
+        f"{len({id(store) for store in stores}):>7} {len(clients) + len(async_clients):>8}"
+    )
+
+
+def main(args: argparse.Namespace):
+    # roughly the number of `get_store` calls made while creating the service container
+    datasets = [DATASETS[i % len(DATASETS)] for i in range(args.calls)]
+
+    print(f"{args.calls} get_store calls on {args.location}")
+    print(f"{'':<24} {'startup':>11} {'stores':>7} {'clients':>8}")
+
+    start = time.perf_counter()
+    stores = [
+        AsyncQdrantDocumentStore(
+            location=args.location,
+            embedding_dim=args.embedding_dim,
+            index=dataset or "Document",
+            on_disk=True,
+        )
+        for dataset in datasets
+    ]
+    _report("store per call (before)", time.perf_counter() - start, stores)
+
+    start = time.perf_counter()
+    provider = QdrantProvider(
+        location=args.location, embedding_model_dim=args.embedding_dim
+    )
+    stores = [provider.get_store(dataset_name=dataset) for dataset in datasets]
+    _report("shared stores (after)", time.perf_counter() - start, stores)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--location", default="http://localhost:6333")
+    parser.add_argument("--embedding-dim", type=int, default=3072)
+    parser.add_argument("--calls", type=int, default=40)
+
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Benchmark the indexing throughput of AsyncQdrantDocumentStore.write_documents: sequential upserts
+of 100 points, each waiting for the result as before, against pipelined upserts of batches capped
+by payload bytes, with only the last one waiting.
+
+By default, the upserts go to an in-process stand-in of Qdrant, which models the round trip,
+the transfer of the request and the in-order application of the updates in the background.
+Pass --location to write to a real Qdrant instead.
+
+Usage:
+    poetry run python -m tests.benchmarks.qdrant_write_throughput --points 10000 100000 1000000
+    poetry run python -m tests.benchmarks.qdrant_write_throughput --location http://localhost:6333
+"""
+
+import argparse
+import asyncio
+import time
+
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+from haystack_integrations.document_stores.qdrant import document_store
+
+from src.providers.document_store.qdrant import (
+    QdrantProvider,
+    convert_haystack_documents_to_qdrant_points,
+    estimate_point_bytes,
+)
+
+
+class StandInAsyncClient:
+    def __init__(self, rtt_ms: float, mb_per_second: float, apply_us_per_point: float):
+        self._rtt = rtt_ms / 1000
+        self._bytes_per_second = mb_per_second * 1024 * 1024
+        self._apply_per_point = apply_us_per_point / 1_000_000
+        self._applied_at = 0.0
+
+    async def upsert(self, collection_name: str, points: list, wait: bool = True):
+        loop = asyncio.get_running_loop()
+        request_bytes = sum(estimate_point_bytes(point) for point in points)
+        await asyncio.sleep(self._rtt + request_bytes / self._bytes_per_second)
+
+        # the acknowledged updates are applied one after another in the background
+        self._applied_at = (
+            max(self._applied_at, loop.time()) + len(points) * self._apply_per_point
+        )
+        if wait:
+            await asyncio.sleep(max(0.0, self._applied_at - loop.time()))
+
+
+async def _sequential_write(store, documents: list[Document]) -> None:
+    for document_batch in document_store.get_batches_from_generator(documents, 100):
+        await store.async_client.upsert(
+            collection_name=store.index,
+            points=convert_haystack_documents_to_qdrant_points(
+                document_batch, use_sparse_embeddings=False
+            ),
+            wait=True,
+        )
+
+
+async def _pipelined_write(store, documents: list[Document]) -> None:
+    await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+
+
+async def _run(args: argparse.Namespace, points: int) -> dict[str, float]:
+    # all the documents share one embedding to keep the memory usage flat at 1M points
+    embedding = [0.1] * args.embedding_dim
+    documents = [
+        Document(
+            id=str(i),
+            content=f"document {i} " + "x" * args.content_bytes,
+            meta={"project_id": "benchmark", "type": "TABLE_SCHEMA"},
+            embedding=embedding,
+        )
+        for i in range(points)
+    ]
+
+    provider = QdrantProvider(
+        location=args.location or ":memory:",
+        embedding_model_dim=args.embedding_dim,
+        write_concurrency=args.concurrency,
+    )
+
+    results = {}
+    for name, write in [
+        ("sequential (before)", _sequential_write),
+        ("pipelined (after)", _pipelined_write),
+    ]:
+        store = provider.get_store(dataset_name="benchmark", recreate_index=True)
+        store.progress_bar = False
+        if not args.location:
+            store.async_client = StandInAsyncClient(
+                args.rtt_ms, args.mb_per_second, args.apply_us_per_point
+            )
+            store._collection_checked = True
+
+        start = time.perf_counter()
+        await write(store, documents)
+        results[name] = time.perf_counter() - start
+
+    return results
+
+
+def main(args: argparse.Namespace):
+    print(
+        f"{args.location or 'in-process stand-in'}, {args.embedding_dim} dims, "
+        f"{args.concurrency} requests in flight"
+    )
+    for points in args.points:
+        for name, elapsed in asyncio.run(_run(args, points)).items():
+            print(
+                f"{points:>9} points {name:<20} {elapsed:9.2f}s "
+                f"{points / elapsed:>10.0f} points/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--points", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--location", default=None)
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--content-bytes", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--mb-per-second", type=float, default=200.0)
+    parser.add_argument("--apply-us-per-point", type=float, default=20.0)
+
+    main(parser.parse_args())
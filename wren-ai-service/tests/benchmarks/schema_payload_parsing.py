@@ -0,0 +1,109 @@
+"""
+Benchmark parsing DB schema documents at retrieval time: the legacy str(dict) content parsed
+with ast.literal_eval (twice, as the retrieval pipeline used to), against the JSON content
+parsed once with orjson, and the haystack Document conversion against plain payload dicts.
+
+Usage:
+    poetry run python -m tests.benchmarks.schema_payload_parsing --tables 100 --columns 50
+"""
+
+import argparse
+import ast
+import asyncio
+import timeit
+
+import orjson
+from haystack_integrations.document_stores.qdrant.converters import (
+    convert_qdrant_point_to_haystack_document,
+)
+from qdrant_client.http import models as rest
+
+from src.pipelines.common import parse_schema_content
+from src.pipelines.indexing.db_schema import DDLChunker
+
+
+def _mdl(tables: int, columns: int) -> dict:
+    return {
+        "models": [
+            {
+                "name": f"table_{t}",
+                "primaryKey": "column_0",
+                "properties": {"description": f"The description of table {t}"},
+                "columns": [
+                    {
+                        "name": f"column_{c}",
+                        "type": "VARCHAR",
+                        "properties": {
+                            "description": f"The description of column {c}",
+                            "displayName": f"Column {c}",
+                        },
+                    }
+                    for c in range(columns)
+                ],
+            }
+            for t in range(tables)
+        ],
+        "relationships": [],
+        "views": [],
+        "metrics": [],
+    }
+
+
+def _timeit(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def main(args: argparse.Namespace):
+    documents = asyncio.run(
+        DDLChunker().run(
+            _mdl(args.tables, args.columns), column_batch_size=args.column_batch_size
+        )
+    )["documents"]
+    json_contents = [document.content for document in documents]
+    legacy_contents = [str(orjson.loads(content)) for content in json_contents]
+    records = [
+        rest.Record(
+            id=i,
+            payload={
+                "id": document.id,
+                "content": document.content,
+                **document.meta,
+            },
+        )
+        for i, document in enumerate(documents)
+    ]
+
+    results = {
+        "ast.literal_eval x2 (legacy)": _timeit(
+            lambda: [ast.literal_eval(c) for c in legacy_contents * 2], args.repeat
+        ),
+        "orjson.loads x1": _timeit(
+            lambda: [parse_schema_content(c) for c in json_contents], args.repeat
+        ),
+        "records -> Documents": _timeit(
+            lambda: [
+                convert_qdrant_point_to_haystack_document(
+                    record, use_sparse_embeddings=False
+                )
+                for record in records
+            ],
+            args.repeat,
+        ),
+        "records -> payload dicts": _timeit(
+            lambda: [record.payload for record in records], args.repeat
+        ),
+    }
+
+    print(f"{len(documents)} documents, {args.tables} tables x {args.columns} columns")
+    for name, elapsed_ms in results.items():
+        print(f"{name:<32} {elapsed_ms:8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--columns", type=int, default=50)
+    parser.add_argument("--column-batch-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    main(parser.parse_args())
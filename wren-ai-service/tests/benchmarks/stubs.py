@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import random
+import time
+
+from aiohttp import web
+
+
+def fake_embedding(text: str, dimension: int) -> list[float]:
+    # deterministic pseudo embedding, so the same text always maps to the same vector
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dimension)]
+
+
+class StubEmbeddingServer:
+    """
+    A local OpenAI-compatible embedding server for benchmarks.
+
+    Every request takes `latency_ms` plus `per_text_latency_ms` for each input text,
+    and at most `max_concurrency` requests are served at the same time to mimic
+    provider-side rate limiting. Requests and embedded texts are counted.
+    """
+
+    def __init__(
+        self,
+        port: int = 18080,
+        dimension: int = 1536,
+        latency_ms: float = 50.0,
+        per_text_latency_ms: float = 0.5,
+        max_concurrency: int = 8,
+    ):
+        self.port = port
+        self._dimension = dimension
+        self._latency = latency_ms / 1000
+        self._per_text_latency = per_text_latency_ms / 1000
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._runner = None
+        self.requests = 0
+        self.texts = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.texts = 0
+
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+
+        async with self._semaphore:
+            self.requests += 1
+            self.texts += len(texts)
+            await asyncio.sleep(self._latency + self._per_text_latency * len(texts))
+
+        return web.json_response(
+            {
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": fake_embedding(text, self._dimension),
+                    }
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)},
+            }
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/embeddings", self._embeddings)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.elapsed = time.perf_counter() - self.start
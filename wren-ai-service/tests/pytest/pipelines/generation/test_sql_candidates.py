@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.pipelines.generation.utils.sql import (
+    SQLGenPostProcessor,
+    check_sql_candidates,
+    sql_candidates_generation_kwargs,
+)
+
+
+class EngineMock:
+    """
+    Dry runs each SQL after its latency; the SQLs listed as valid succeed, the others fail.
+    """
+
+    def __init__(self, latencies: dict[str, float], valid: set[str]):
+        self._latencies = latencies
+        self._valid = valid
+        self.dry_runs = []
+        self.cancelled = []
+
+    async def execute_sql(self, sql: str, session, **kwargs):
+        self.dry_runs.append(sql)
+        try:
+            await asyncio.sleep(self._latencies.get(sql, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(sql)
+            raise
+
+        if sql in self._valid:
+            return True, None, {"correlation_id": sql}
+        return False, None, {"error_message": f"{sql} is invalid"}
+
+
+def _reply(sql: str) -> str:
+    return f'{{"sql": "{sql}"}}'
+
+
+def test_sql_candidates_generation_kwargs():
+    assert sql_candidates_generation_kwargs(1, temperature=0.7) is None
+    assert sql_candidates_generation_kwargs(3, temperature=0.7) == {
+        "n": 3,
+        "temperature": 0.7,
+    }
+    assert sql_candidates_generation_kwargs(3) == {"n": 3}
+
+
+def test_check_sql_candidates(caplog):
+    check_sql_candidates([_reply("SELECT 1"), _reply("SELECT 2")], candidates=2)
+    assert not caplog.records
+
+    # the provider ignored n
+    check_sql_candidates([_reply("SELECT 1")], candidates=2)
+    assert "1 of 2 SQL candidates" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_first_valid_candidate_wins():
+    engine = EngineMock(
+        latencies={"SELECT 1": 0, "SELECT 2": 0.01, "SELECT 3": 1},
+        valid={"SELECT 2", "SELECT 3"},
+    )
+
+    result = await SQLGenPostProcessor(engine=engine).run(
+        [_reply("SELECT 1"), _reply("SELECT 2"), _reply("SELECT 3")]
+    )
+
+    assert result["valid_generation_result"]["sql"] == "SELECT 2"
+    assert result["invalid_generation_result"] == {}
+    # the validation of the slower candidate is cancelled
+    assert engine.cancelled == ["SELECT 3"]
+
+
+@pytest.mark.asyncio
+async def test_no_valid_candidate():
+    engine = EngineMock(latencies={"SELECT 1": 0.01}, valid=set())
+
+    result = await SQLGenPostProcessor(engine=engine).run(
+        [_reply("SELECT 1"), _reply("SELECT 2"), "not a json {"]
+    )
+
+    assert result["valid_generation_result"] == {}
+    assert result["invalid_generation_result"]["sql"] == "SELECT 1"
+    assert result["invalid_generation_result"]["type"] == "DRY_RUN"
+
+
+@pytest.mark.asyncio
+async def test_identical_candidates_are_validated_once():
+    engine = EngineMock(latencies={}, valid={"SELECT 1"})
+
+    result = await SQLGenPostProcessor(engine=engine).run(
+        [_reply("SELECT 1"), _reply("SELECT 1")]
+    )
+
+    assert result["valid_generation_result"]["sql"] == "SELECT 1"
+    assert engine.dry_runs == ["SELECT 1"]
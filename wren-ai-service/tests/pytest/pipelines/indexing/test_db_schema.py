@@ -1,3 +1,4 @@
+import asyncio
 from unittest.mock import AsyncMock
 
 import orjson
@@ -5,6 +6,7 @@ import pytest
 from haystack import Document
 from pytest_mock import MockFixture
 
+from src.pipelines.ddl_cache import DDLCache
 from src.pipelines.indexing.db_schema import DBSchema, DDLChunker
 
 
@@ -40,7 +42,7 @@ async def test_single_model():
 
     document: Document = actual["documents"][0]
     assert document.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document.content == str(
+    assert orjson.loads(document.content) == (
         {
             "type": "TABLE",
             "comment": "\n/* {'alias': 'user', 'description': 'A table containing user information.'} */\n",
@@ -79,7 +81,7 @@ async def test_multiple_models():
 
     document_1: Document = actual["documents"][0]
     assert document_1.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_1.content == str(
+    assert orjson.loads(document_1.content) == (
         {
             "type": "TABLE",
             "comment": "\n/* {'alias': 'user', 'description': 'A table containing user information.'} */\n",
@@ -89,7 +91,7 @@ async def test_multiple_models():
 
     document_2: Document = actual["documents"][1]
     assert document_2.meta == {"type": "TABLE_SCHEMA", "name": "order"}
-    assert document_2.content == str(
+    assert orjson.loads(document_2.content) == (
         {
             "type": "TABLE",
             "comment": "\n/* {'alias': 'order', 'description': 'A table containing order details.'} */\n",
@@ -124,7 +126,7 @@ async def test_column_is_primary_key():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -169,7 +171,7 @@ async def test_column_with_properties():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -186,7 +188,7 @@ async def test_column_with_properties():
 
     document_1: Document = actual["documents"][1]
     assert document_1.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_1.content == str(
+    assert orjson.loads(document_1.content) == (
         {
             "type": "TABLE",
             "comment": "\n/* {'alias': '', 'description': ''} */\n",
@@ -226,7 +228,7 @@ async def test_column_with_nested_columns():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -242,6 +244,50 @@ async def test_column_with_nested_columns():
     )
 
 
+@pytest.mark.asyncio
+async def test_token_counts():
+    class CharEncoding:
+        name = "chars"
+
+        def encode(self, text: str, **kwargs) -> list[int]:
+            return [ord(char) for char in text]
+
+    chunker = DDLChunker(encoding=CharEncoding())
+    mdl = {
+        "models": [
+            {
+                "name": "user",
+                "columns": [
+                    {"name": "id", "type": "INTEGER"},
+                    {"name": "name", "type": "VARCHAR"},
+                ],
+            }
+        ],
+        "views": [],
+        "relationships": [],
+        "metrics": [],
+    }
+    actual = await chunker.run(mdl, column_batch_size=2)
+    assert len(actual["documents"]) == 2
+
+    columns, table = actual["documents"]
+    assert columns.meta == {
+        "type": "TABLE_SCHEMA",
+        "name": "user",
+        "tokens": len("id INTEGER,\n  name VARCHAR,\n  "),
+        "column_tokens": [len("id INTEGER,\n  "), len("name VARCHAR,\n  ")],
+        "token_encoding": "chars",
+    }
+    assert table.meta == {
+        "type": "TABLE_SCHEMA",
+        "name": "user",
+        "tokens": len(
+            "\n/* {'alias': '', 'description': ''} */\nCREATE TABLE user (\n  \n);"
+        ),
+        "token_encoding": "chars",
+    }
+
+
 @pytest.mark.asyncio
 async def test_column_with_calculated_property():
     chunker = DDLChunker()
@@ -269,7 +315,7 @@ async def test_column_with_calculated_property():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -333,7 +379,7 @@ async def test_column_with_relationship():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -350,7 +396,7 @@ async def test_column_with_relationship():
 
     document_1: Document = actual["documents"][1]
     assert document_1.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_1.content == str(
+    assert orjson.loads(document_1.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -366,7 +412,7 @@ async def test_column_with_relationship():
 
     document_4: Document = actual["documents"][4]
     assert document_4.meta == {"type": "TABLE_SCHEMA", "name": "order"}
-    assert document_4.content == str(
+    assert orjson.loads(document_4.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -404,7 +450,7 @@ async def test_column_batch_size():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -428,7 +474,7 @@ async def test_column_batch_size():
 
     document_1: Document = actual["documents"][1]
     assert document_1.meta == {"type": "TABLE_SCHEMA", "name": "user"}
-    assert document_1.content == str(
+    assert orjson.loads(document_1.content) == (
         {
             "type": "TABLE_COLUMNS",
             "columns": [
@@ -458,7 +504,7 @@ async def test_view():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "view_1"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "VIEW",
             "comment": "",
@@ -488,7 +534,7 @@ async def test_view_with_properties():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "view_1"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "VIEW",
             "comment": "/* {'description': 'A view containing user information.'} */\n",
@@ -523,7 +569,7 @@ async def test_metric():
 
     document_0: Document = actual["documents"][0]
     assert document_0.meta == {"type": "TABLE_SCHEMA", "name": "metric_1"}
-    assert document_0.content == str(
+    assert orjson.loads(document_0.content) == (
         {
             "type": "METRIC",
             "comment": "\n/* This table is a metric */\n/* Metric Base Object: user */\n",
@@ -546,6 +592,96 @@ async def test_metric():
     )
 
 
+@pytest.mark.asyncio
+async def test_selected_names():
+    chunker = DDLChunker()
+    mdl = {
+        "models": [
+            {
+                "name": "user",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            },
+            {
+                "name": "order",
+                "columns": [{"name": "user_id", "type": "INTEGER"}],
+                "primaryKey": "user_id",
+            },
+        ],
+        "views": [{"name": "view_1", "statement": "SELECT * FROM user"}],
+        "relationships": [
+            {
+                "name": "relationship_1",
+                "condition": "user.id = order.user_id",
+                "joinType": "ONE_TO_MANY",
+                "models": ["user", "order"],
+            }
+        ],
+        "metrics": [],
+    }
+
+    actual = await chunker.run(mdl, column_batch_size=10, names=["order"])
+    assert {document.meta["name"] for document in actual["documents"]} == {"order"}
+
+    # the primary key of the unselected related model is still referenced
+    assert "REFERENCES user(id)" in actual["documents"][0].content
+
+    actual = await chunker.run(mdl, column_batch_size=10, names=[])
+    assert actual == {"documents": []}
+
+
+@pytest.mark.asyncio
+async def test_stream():
+    chunker = DDLChunker()
+    mdl = {
+        "models": [
+            {
+                "name": f"model_{i}",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            }
+            for i in range(3)
+        ],
+        "views": [{"name": "view_1", "statement": "SELECT * FROM model_0"}],
+        "relationships": [
+            {
+                "name": "relationship_1",
+                "condition": "model_0.id = model_1.id",
+                "joinType": "ONE_TO_ONE",
+                "models": ["model_0", "model_1"],
+            }
+        ],
+        "metrics": [],
+    }
+
+    batches = [
+        batch
+        async for batch in chunker.stream(
+            mdl, column_batch_size=10, batch_size=3, project_id="test-project"
+        )
+    ]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+    # the same documents as the ones of run, in the same order
+    expected = (
+        await chunker.run(mdl, column_batch_size=10, project_id="test-project")
+    )["documents"]
+    actual = [document for batch in batches for document in batch]
+    assert [(document.content, document.meta) for document in actual] == [
+        (document.content, document.meta) for document in expected
+    ]
+
+    batches = [
+        batch
+        async for batch in chunker.stream(
+            mdl, column_batch_size=10, batch_size=3, names=["view_1"]
+        )
+    ]
+    assert [[document.meta["name"] for document in batch] for batch in batches] == [
+        ["view_1"]
+    ]
+
+
 @pytest.mark.asyncio
 async def test_pipeline_run(mocker: MockFixture):
     test_mdl = {
@@ -619,3 +755,228 @@ async def test_pipeline_run(mocker: MockFixture):
     result = await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
     assert result is not None
     assert result == {"write": {"documents_written": 6}}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_puts_small_schema(mocker: MockFixture):
+    test_mdl = {
+        "models": [
+            {
+                "name": "user",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            },
+            {
+                "name": "order",
+                "columns": [{"name": "user_id", "type": "INTEGER"}],
+                "primaryKey": "user_id",
+            },
+        ],
+        "views": [],
+        "relationships": [],
+        "metrics": [],
+    }
+
+    embedder_provider = mocker.patch("src.core.provider.EmbedderProvider")
+    embedder = mocker.Mock()
+    mocker.patch.object(
+        embedder,
+        "run",
+        new_callable=AsyncMock,
+        side_effect=lambda documents: {"documents": documents},
+    )
+    embedder_provider.get_document_embedder.return_value = embedder
+
+    document_store = mocker.Mock()
+    mocker.patch.object(
+        document_store, "delete_documents", new_callable=AsyncMock, return_value=None
+    )
+    mocker.patch.object(
+        document_store,
+        "write_documents",
+        new_callable=AsyncMock,
+        side_effect=lambda documents, *_, **__: len(documents),
+    )
+    document_store_provider = mocker.patch("src.core.provider.DocumentStoreProvider")
+    document_store_provider.get_store.return_value = document_store
+
+    ddl_cache = DDLCache()
+    pipe = DBSchema(
+        embedder_provider=embedder_provider,
+        document_store_provider=document_store_provider,
+        ddl_cache=ddl_cache,
+        token_encoding="cl100k_base",
+        small_schema_token_threshold=1000,
+    )
+    await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
+    schema = ddl_cache.get_schema("test-project")
+    assert [table.name for table in schema] == ["user", "order"]
+
+    # reindexing a model keeps the rest of the schema
+    test_mdl["models"][1]["columns"].append({"name": "amount", "type": "INTEGER"})
+    await pipe.run(orjson.dumps(test_mdl), project_id="test-project", names=["order"])
+    schema = ddl_cache.get_schema("test-project")
+    assert [table.name for table in schema] == ["user", "order"]
+    assert "amount INTEGER" in schema[1].ddl
+
+    # the schema is not kept once it exceeds the threshold
+    pipe = DBSchema(
+        embedder_provider=embedder_provider,
+        document_store_provider=document_store_provider,
+        ddl_cache=ddl_cache,
+        token_encoding="cl100k_base",
+        small_schema_token_threshold=10,
+    )
+    await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
+    assert ddl_cache.get_schema("test-project") is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_with_deploy_version_defers_ddl_cache(
+    mocker: MockFixture,
+):
+    test_mdl = {
+        "models": [
+            {
+                "name": "user",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            },
+        ],
+        "views": [],
+        "relationships": [],
+        "metrics": [],
+    }
+
+    embedder_provider = mocker.patch("src.core.provider.EmbedderProvider")
+    embedder = mocker.Mock()
+    mocker.patch.object(
+        embedder,
+        "run",
+        new_callable=AsyncMock,
+        side_effect=lambda documents: {"documents": documents},
+    )
+    embedder_provider.get_document_embedder.return_value = embedder
+
+    document_store = mocker.Mock()
+    mocker.patch.object(
+        document_store, "delete_documents", new_callable=AsyncMock, return_value=None
+    )
+    mocker.patch.object(
+        document_store,
+        "write_documents",
+        new_callable=AsyncMock,
+        side_effect=lambda documents, *_, **__: len(documents),
+    )
+    document_store_provider = mocker.patch("src.core.provider.DocumentStoreProvider")
+    document_store_provider.get_store.return_value = document_store
+
+    ddl_cache = DDLCache()
+    pipe = DBSchema(
+        embedder_provider=embedder_provider,
+        document_store_provider=document_store_provider,
+        ddl_cache=ddl_cache,
+        token_encoding="cl100k_base",
+        small_schema_token_threshold=1000,
+    )
+    version = ddl_cache.version("test-project")
+
+    # the cache is left as is until the deploy version is activated
+    await pipe.run(
+        orjson.dumps(test_mdl), project_id="test-project", deploy_version="v1"
+    )
+    assert ddl_cache.version("test-project") == version
+    assert ddl_cache.get_schema("test-project") is None
+
+    pipe.activate_ddl_cache("test-project", "v1")
+    assert ddl_cache.version("test-project") == version + 1
+    assert [table.name for table in ddl_cache.get_schema("test-project")] == ["user"]
+
+    # an aborted version is never put in the cache
+    await pipe.run(
+        orjson.dumps(test_mdl), project_id="test-project", deploy_version="v2"
+    )
+    pipe.discard_ddl_cache("test-project", "v2")
+    assert ddl_cache.get_schema("test-project") is None
+    pipe.activate_ddl_cache("test-project", "v2")
+    assert ddl_cache.get_schema("test-project") is None
+    assert not pipe._staged
+
+    # nothing is staged without the small schema cache, the whole project is invalidated
+    pipe._small_schema_token_threshold = 0
+    await pipe.run(
+        orjson.dumps(test_mdl), project_id="test-project", deploy_version="v3"
+    )
+    assert not pipe._staged
+    version = ddl_cache.version("test-project")
+    pipe.activate_ddl_cache("test-project", "v3")
+    assert ddl_cache.version("test-project") == version + 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_streaming(mocker: MockFixture):
+    test_mdl = {
+        "models": [
+            {
+                "name": f"model_{i}",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            }
+            for i in range(10)
+        ],
+        "views": [],
+        "relationships": [],
+        "metrics": [],
+    }
+
+    in_flight = 0
+    max_in_flight = 0
+
+    async def _embed(documents):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"documents": documents}
+
+    embedder_provider = mocker.patch("src.core.provider.EmbedderProvider")
+    embedder = mocker.Mock()
+    mocker.patch.object(embedder, "run", new_callable=AsyncMock, side_effect=_embed)
+    embedder_provider.get_document_embedder.return_value = embedder
+
+    document_store = mocker.Mock()
+    mocker.patch.object(
+        document_store, "delete_documents", new_callable=AsyncMock, return_value=None
+    )
+    mocker.patch.object(
+        document_store,
+        "write_documents",
+        new_callable=AsyncMock,
+        side_effect=lambda documents, *_, **__: len(documents),
+    )
+    document_store_provider = mocker.patch("src.core.provider.DocumentStoreProvider")
+    document_store_provider.get_store.return_value = document_store
+
+    ddl_cache = DDLCache()
+    pipe = DBSchema(
+        embedder_provider=embedder_provider,
+        document_store_provider=document_store_provider,
+        ddl_cache=ddl_cache,
+        token_encoding="cl100k_base",
+        small_schema_token_threshold=1000,
+        streaming_concurrency=2,
+        streaming_batch_size=3,
+    )
+    result = await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
+    assert result == {"write": {"documents_written": 20}}
+    assert embedder.run.await_count == 7
+    assert max_in_flight == 2
+    document_store.delete_documents.assert_awaited_once()
+    assert len(ddl_cache.get_schema("test-project")) == 10
+
+    # a failed batch fails the indexing
+    embedder.run.side_effect = RuntimeError("embedding failed")
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        await pipe.run(orjson.dumps(test_mdl), project_id="test-project")
+    assert ddl_cache.get_schema("test-project") is None
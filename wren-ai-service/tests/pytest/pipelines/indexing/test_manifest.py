@@ -0,0 +1,110 @@
+from src.pipelines.indexing.utils.manifest import MDLManifest
+
+MDL = {
+    "dataSource": "postgres",
+    "models": [
+        {
+            "name": "user",
+            "columns": [{"name": "id", "type": "INTEGER"}],
+            "primaryKey": "id",
+            "properties": {"boilerplate": "hubspot"},
+        },
+        {
+            "name": "order",
+            "columns": [{"name": "user_id", "type": "INTEGER"}],
+            "primaryKey": "user_id",
+        },
+        {
+            "name": "product",
+            "columns": [{"name": "id", "type": "INTEGER"}],
+            "primaryKey": "id",
+        },
+    ],
+    "relationships": [
+        {
+            "name": "user_order",
+            "condition": "user.id = order.user_id",
+            "joinType": "ONE_TO_MANY",
+            "models": ["user", "order"],
+        }
+    ],
+    "views": [{"name": "view_1", "statement": "SELECT * FROM user"}],
+    "metrics": [],
+}
+
+
+def _mdl(**changes) -> dict:
+    return {**MDL, **changes}
+
+
+def test_identical_mdl():
+    diff = MDLManifest.from_mdl("1", MDL).diff(MDLManifest.from_mdl("2", MDL))
+
+    assert diff.is_empty
+
+
+def test_changed_model():
+    models = [
+        *MDL["models"][:2],
+        {**MDL["models"][2], "columns": [{"name": "sku", "type": "VARCHAR"}]},
+    ]
+
+    diff = MDLManifest.from_mdl("1", MDL).diff(
+        MDLManifest.from_mdl("2", _mdl(models=models))
+    )
+
+    assert diff.names == ["product"]
+    assert not diff.data_source_changed
+    assert not diff.boilerplates_changed
+
+
+def test_added_and_removed_objects():
+    diff = MDLManifest.from_mdl("1", MDL).diff(
+        MDLManifest.from_mdl(
+            "2",
+            _mdl(
+                views=[],
+                metrics=[{"name": "metric_1", "baseObject": "user"}],
+            ),
+        )
+    )
+
+    assert diff.models == []
+    assert diff.views == ["view_1"]
+    assert diff.metrics == ["metric_1"]
+
+
+def test_primary_key_change_touches_related_models():
+    models = [
+        {**MDL["models"][0], "primaryKey": "uuid"},
+        *MDL["models"][1:],
+    ]
+
+    diff = MDLManifest.from_mdl("1", MDL).diff(
+        MDLManifest.from_mdl("2", _mdl(models=models))
+    )
+
+    assert diff.models == ["order", "user"]
+
+
+def test_relationship_change():
+    diff = MDLManifest.from_mdl("1", MDL).diff(
+        MDLManifest.from_mdl("2", _mdl(relationships=[]))
+    )
+
+    assert diff.models == ["order", "user"]
+
+
+def test_data_source_and_boilerplates_change():
+    models = [
+        {**MDL["models"][0], "properties": {}},
+        *MDL["models"][1:],
+    ]
+
+    diff = MDLManifest.from_mdl("1", MDL).diff(
+        MDLManifest.from_mdl("2", _mdl(dataSource="bigquery", models=models))
+    )
+
+    assert diff.models == ["user"]
+    assert diff.data_source_changed
+    assert diff.boilerplates_changed
@@ -0,0 +1,132 @@
+import io
+import zipfile
+
+import orjson
+import pytest
+from haystack import Document
+
+from src.pipelines.indexing.utils.snapshot import (
+    SNAPSHOT_INDEXES,
+    export_snapshot,
+    import_snapshot,
+)
+from src.providers.document_store.numpy_store import NumpyStoreProvider
+
+
+def _stores(provider: NumpyStoreProvider) -> dict:
+    return {index: provider.get_store(dataset_name=index) for index in SNAPSHOT_INDEXES}
+
+
+async def _write_project(stores: dict, project_id: str) -> None:
+    await stores["Document"].write_documents(
+        [
+            Document(
+                id=f"{project_id}-user",
+                content="user",
+                meta={"project_id": project_id, "type": "TABLE_SCHEMA", "name": "user"},
+                embedding=[1.0, 0.0, 0.0],
+            ),
+            Document(
+                id=f"{project_id}-order",
+                content="order",
+                meta={
+                    "project_id": project_id,
+                    "type": "TABLE_SCHEMA",
+                    "name": "order",
+                },
+                embedding=[0.0, 1.0, 0.0],
+            ),
+        ]
+    )
+    await stores["project_meta"].write_documents(
+        [
+            Document(
+                id=f"{project_id}-meta",
+                meta={"project_id": project_id, "data_source": "postgres"},
+            )
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_export_snapshot():
+    stores = _stores(NumpyStoreProvider(embedding_model_dim=3))
+    await _write_project(stores, "1")
+    await _write_project(stores, "2")
+
+    with zipfile.ZipFile(io.BytesIO(await export_snapshot(stores, "1"))) as archive:
+        manifest = orjson.loads(archive.read("manifest.json"))
+        lines = archive.read("payloads.jsonl").splitlines()
+        vectors = archive.read("vectors.f32")
+
+    assert manifest["embedding_dim"] == 3
+    assert manifest["collections"]["Document"] == 2
+    assert manifest["collections"]["project_meta"] == 1
+    assert manifest["collections"]["sql_pairs"] == 0
+    assert len(lines) == 3
+    assert len(vectors) == 2 * 3 * 4
+
+
+@pytest.mark.asyncio
+async def test_import_snapshot_into_another_project():
+    stores = _stores(NumpyStoreProvider(embedding_model_dim=3))
+    await _write_project(stores, "1")
+    await stores["Document"].write_documents(
+        [
+            Document(
+                id="2-stale",
+                content="stale",
+                meta={"project_id": "2", "type": "TABLE_SCHEMA", "name": "stale"},
+                embedding=[0.0, 0.0, 1.0],
+            )
+        ]
+    )
+
+    counts = await import_snapshot(stores, "2", await export_snapshot(stores, "1"))
+    assert counts["Document"] == 2
+    assert counts["project_meta"] == 1
+
+    project = {"field": "project_id", "operator": "==", "value": "2"}
+    documents = await stores["Document"]._query_by_embedding(
+        [1.0, 0.0, 0.0], filters=project, top_k=1
+    )
+    assert documents[0].content == "user"
+    assert documents[0].meta["project_id"] == "2"
+    assert documents[0].id != "1-user"
+    assert await stores["Document"].count_documents(project) == 2
+    # the documents of the exported project are left as they are
+    assert (
+        await stores["Document"].count_documents(
+            {"field": "project_id", "operator": "==", "value": "1"}
+        )
+        == 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_snapshot_with_blue_green_indexing():
+    provider = NumpyStoreProvider(embedding_model_dim=3, blue_green_indexing=True)
+    provider.get_deploy_versions()._ttl = 0
+    stores = _stores(provider)
+    await _write_project(stores, "1")
+
+    await import_snapshot(
+        stores, "1", await export_snapshot(stores, "1"), provider.get_deploy_versions()
+    )
+    project = {"field": "project_id", "operator": "==", "value": "1"}
+    assert await stores["Document"].count_documents(project) == 2
+    assert await provider.get_deploy_versions().get("1") is not None
+
+
+@pytest.mark.asyncio
+async def test_import_snapshot_rejects_invalid_snapshots():
+    stores = _stores(NumpyStoreProvider(embedding_model_dim=3))
+    await _write_project(stores, "1")
+    data = await export_snapshot(stores, "1")
+
+    with pytest.raises(ValueError):
+        await import_snapshot(stores, "2", b"not a snapshot")
+    with pytest.raises(ValueError):
+        await import_snapshot(
+            _stores(NumpyStoreProvider(embedding_model_dim=4)), "2", data
+        )
@@ -0,0 +1,149 @@
+import orjson
+import pytest
+from haystack import Document
+
+from src.pipelines.ddl_cache import DDLCache, TableDDL
+from src.pipelines.retrieval import db_schema_retrieval
+from src.pipelines.retrieval.db_schema_retrieval import (
+    dbschema_retrieval,
+    embedding,
+    small_schema,
+)
+
+PAYLOADS = [
+    {
+        "name": "user",
+        "content": orjson.dumps(
+            {"type": "TABLE", "comment": "", "name": "user"}
+        ).decode("utf-8"),
+    },
+    {
+        "name": "user",
+        "content": orjson.dumps(
+            {
+                "type": "TABLE_COLUMNS",
+                "columns": [
+                    {
+                        "type": "COLUMN",
+                        "comment": "",
+                        "name": "id",
+                        "data_type": "INTEGER",
+                        "is_primary_key": True,
+                    }
+                ],
+            }
+        ).decode("utf-8"),
+    },
+    {
+        "name": "view_1",
+        "content": orjson.dumps(
+            {
+                "type": "VIEW",
+                "comment": "",
+                "name": "view_1",
+                "statement": "SELECT * FROM user",
+            }
+        ).decode("utf-8"),
+    },
+]
+
+
+@pytest.fixture
+def table_retrieval() -> dict:
+    return {
+        "documents": [
+            Document(content="", meta={"name": "view_1"}),
+            Document(content="", meta={"name": "user"}),
+        ]
+    }
+
+
+@pytest.fixture
+def dbschema_retriever(mocker):
+    retriever = mocker.Mock()
+    retriever.fetch_payloads = mocker.AsyncMock(return_value={"payloads": PAYLOADS})
+    return retriever
+
+
+@pytest.mark.asyncio
+async def test_dbschema_retrieval(table_retrieval, dbschema_retriever):
+    tables = await dbschema_retrieval(
+        table_retrieval, "1", dbschema_retriever, ddl_cache=None, small_schema=None
+    )
+
+    assert [(table.name, table.type) for table in tables] == [
+        ("user", "TABLE"),
+        ("view_1", "VIEW"),
+    ]
+    assert tables[0].ddl == "CREATE TABLE user (\n  id INTEGER PRIMARY KEY\n);"
+
+
+@pytest.mark.asyncio
+async def test_dbschema_retrieval_with_ddl_cache(table_retrieval, dbschema_retriever):
+    ddl_cache = DDLCache()
+
+    tables = await dbschema_retrieval(
+        table_retrieval, "1", dbschema_retriever, ddl_cache, small_schema=None
+    )
+    cached_tables = await dbschema_retrieval(
+        table_retrieval, "1", dbschema_retriever, ddl_cache, small_schema=None
+    )
+
+    assert cached_tables == tables
+    assert dbschema_retriever.fetch_payloads.await_count == 1
+
+    # reindexing a table only refetches that table
+    ddl_cache.invalidate("1", ["user"])
+    dbschema_retriever.fetch_payloads.return_value = {"payloads": PAYLOADS[:2]}
+    await dbschema_retrieval(
+        table_retrieval, "1", dbschema_retriever, ddl_cache, small_schema=None
+    )
+
+    filters = dbschema_retriever.fetch_payloads.await_args.kwargs["filters"]
+    assert filters["conditions"][1] == {
+        "field": "name",
+        "operator": "in",
+        "value": ["user"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_small_schema(mocker, dbschema_retriever):
+    ddl_cache = DDLCache()
+    schema = [
+        TableDDL(
+            name="user", type="TABLE", ddl="CREATE TABLE user (\n  id INTEGER\n);"
+        ),
+        TableDDL(name="view_1", type="VIEW", ddl="CREATE VIEW view_1\nAS SELECT 1"),
+    ]
+
+    assert small_schema("1", [], ddl_cache) is None
+
+    ddl_cache.put_schema("1", schema, ddl_cache.version("1"))
+    assert small_schema("1", [], ddl_cache) == schema
+    assert small_schema("1", ["view_1"], ddl_cache) == schema[1:]
+    assert small_schema("2", [], ddl_cache) is None
+
+    # neither the embedder nor the document store are called
+    embedder = mocker.AsyncMock()
+    table_retriever = mocker.AsyncMock()
+    assert await embedding("query", embedder, [], small_schema=schema) == {}
+    assert (
+        await db_schema_retrieval.table_retrieval(
+            {}, "1", [], table_retriever, small_schema=schema
+        )
+        == {}
+    )
+    assert (
+        await dbschema_retrieval(
+            {}, "1", dbschema_retriever, ddl_cache, small_schema=schema
+        )
+        == schema
+    )
+    embedder.run.assert_not_called()
+    table_retriever.run.assert_not_called()
+    dbschema_retriever.fetch_payloads.assert_not_called()
+
+    # reindexing drops the schema until the indexing puts it again
+    ddl_cache.invalidate("1", ["user"])
+    assert small_schema("1", [], ddl_cache) is None
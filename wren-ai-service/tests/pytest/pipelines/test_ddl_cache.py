@@ -0,0 +1,186 @@
+import time
+
+from src.pipelines.common import build_table_ddl, count_ddl_tokens
+from src.pipelines.ddl_cache import DDLCache, build_table_ddls
+
+USER_TABLE = {
+    "type": "TABLE",
+    "comment": "\n/* {'alias': 'user', 'description': ''} */\n",
+    "name": "user",
+}
+USER_COLUMNS = {
+    "type": "TABLE_COLUMNS",
+    "columns": [
+        {
+            "type": "COLUMN",
+            "comment": "-- This column is a Calculated Field\n  -- column expression: 1\n  ",
+            "name": "id",
+            "data_type": "INTEGER",
+            "is_primary_key": True,
+        },
+        {
+            "type": "COLUMN",
+            "comment": "",
+            "name": "profile",
+            "data_type": "JSON",
+            "is_primary_key": False,
+        },
+        {
+            "type": "FOREIGN_KEY",
+            "comment": "",
+            "constraint": "FOREIGN KEY (id) REFERENCES order(user_id)",
+            "tables": ["user", "order"],
+        },
+    ],
+}
+VIEW = {
+    "type": "VIEW",
+    "comment": "",
+    "name": "view_1",
+    "statement": "SELECT * FROM user",
+}
+
+
+class CharEncoding:
+    """A stand-in for a tiktoken encoding, which counts one token per character."""
+
+    name = "chars"
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text: str, **kwargs) -> list[int]:
+        self.calls += 1
+        return [ord(char) for char in text]
+
+
+def _documents() -> list[dict]:
+    return [
+        {"name": "view_1", "content": VIEW},
+        {"name": "user", "content": USER_COLUMNS},
+        {"name": "user", "content": USER_TABLE},
+        {"name": "order", "content": USER_COLUMNS},
+    ]
+
+
+def test_build_table_ddls():
+    tables = build_table_ddls(_documents())
+
+    assert [(table.name, table.type) for table in tables] == [
+        ("user", "TABLE"),
+        ("view_1", "VIEW"),
+    ]
+
+    user = tables[0]
+    assert (user.ddl, user.has_calculated_field, user.has_json_field) == (
+        build_table_ddl({**USER_TABLE, "columns": USER_COLUMNS["columns"]})
+    )
+    assert tables[1].ddl == "CREATE VIEW view_1\nAS SELECT * FROM user"
+
+
+def test_prune_is_memoized(mocker):
+    user = build_table_ddls(_documents())[0]
+    build = mocker.patch(
+        "src.pipelines.ddl_cache.build_table_ddl", wraps=build_table_ddl
+    )
+
+    pruned = user.prune(columns={"profile"}, tables={"user", "order"})
+    assert pruned == build_table_ddl(
+        user.schema, columns={"profile"}, tables={"user", "order"}
+    )
+    assert "PRIMARY KEY" not in pruned[0]
+    assert "FOREIGN KEY" in pruned[0]
+
+    # tables which are not referenced by the foreign keys don't change the DDL
+    assert user.prune(columns={"profile"}, tables={"user", "order", "book"}) == pruned
+    assert build.call_count == 1
+
+    assert "FOREIGN KEY" not in user.prune(columns={"profile"}, tables={"user"})[0]
+    assert build.call_count == 2
+
+
+def test_cache_get_and_put():
+    cache = DDLCache()
+    tables = build_table_ddls(_documents())
+
+    cache.put("1", tables, cache.version("1"))
+
+    assert cache.get("1", ["user", "view_1", "book"]) == {
+        "user": tables[0],
+        "view_1": tables[1],
+    }
+    assert cache.get("2", ["user"]) == {}
+
+
+def test_cache_invalidate():
+    cache = DDLCache()
+    tables = build_table_ddls(_documents())
+    cache.put("1", tables, cache.version("1"))
+
+    cache.invalidate("1", ["user"])
+    assert cache.get("1", ["user", "view_1"]) == {"view_1": tables[1]}
+
+    cache.invalidate("1")
+    assert cache.get("1", ["user", "view_1"]) == {}
+
+
+def test_cache_ignores_stale_put():
+    cache = DDLCache()
+    version = cache.version("1")
+
+    # the project is reindexed while the lookup is in flight
+    cache.invalidate("1")
+    cache.put("1", build_table_ddls(_documents()), version)
+
+    assert cache.get("1", ["user"]) == {}
+
+
+def test_cache_schema_expires():
+    cache = DDLCache(ttl=0.01)
+    cache.put_schema("1", build_table_ddls(_documents()), cache.version("1"))
+    assert cache.get_schema("1") is not None
+
+    time.sleep(0.02)
+    assert cache.get_schema("1") is None
+
+
+def test_count_ddl_tokens():
+    encoding = CharEncoding()
+    ddl, _, _ = build_table_ddl({**USER_TABLE, "columns": USER_COLUMNS["columns"]})
+
+    table_tokens, _ = count_ddl_tokens(USER_TABLE, encoding)
+    columns_tokens, column_tokens = count_ddl_tokens(USER_COLUMNS, encoding)
+
+    assert len(column_tokens) == len(USER_COLUMNS["columns"])
+    assert columns_tokens == sum(column_tokens)
+    # every column is counted with its separator, including the last one
+    assert table_tokens + columns_tokens == len(ddl) + len(",\n  ")
+    assert count_ddl_tokens(VIEW, encoding)[0] == len(
+        "CREATE VIEW view_1\nAS SELECT * FROM user"
+    )
+
+
+def test_count_tokens_uses_stored_counts():
+    encoding = CharEncoding()
+    documents = [
+        {**document, "tokens": 10, "token_encoding": "chars"}
+        for document in _documents()
+    ]
+    user, view = build_table_ddls(documents)
+
+    assert user.count_tokens(encoding) == 20
+    assert view.count_tokens(encoding) == 10
+    assert encoding.calls == 0
+
+
+def test_count_tokens_without_stored_counts():
+    encoding = CharEncoding()
+    documents = _documents()
+    # counted with another encoding, or by an older version without counts
+    documents[1] = {**documents[1], "tokens": 10, "token_encoding": "o200k_base"}
+    user, view = build_table_ddls(documents)
+
+    assert user.count_tokens(encoding) == len(user.ddl)
+    assert view.count_tokens(encoding) == len(view.ddl)
+    assert user.count_tokens(encoding) == len(user.ddl)
+    assert encoding.calls == 2
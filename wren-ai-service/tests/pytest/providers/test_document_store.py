@@ -0,0 +1,818 @@
+import asyncio
+import time
+import uuid
+import zlib
+from types import SimpleNamespace
+
+import pytest
+import qdrant_client
+from haystack import Document
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+from haystack_integrations.document_stores.qdrant.converters import convert_id
+from haystack_integrations.document_stores.qdrant.document_store import (
+    QdrantStoreError,
+)
+from qdrant_client.http import models as rest
+
+from src.providers.document_store.deploy_versions import DeployVersions
+from src.providers.document_store.numpy_store import (
+    NumpyEmbeddingRetriever,
+    NumpyStoreProvider,
+)
+from src.providers.document_store.qdrant import (
+    QdrantProvider,
+    convert_filters,
+    convert_haystack_documents_to_qdrant_points,
+    estimate_point_bytes,
+    get_hnsw_config,
+    get_payload_fields_to_index,
+    get_quantization_config,
+)
+
+
+def test_qdrant_provider_shares_stores_and_clients():
+    provider = QdrantProvider(location=":memory:", embedding_model_dim=8)
+
+    store = provider.get_store()
+    assert provider.get_store() is store
+    assert provider.get_store(dataset_name="Document") is store
+
+    table_descriptions = provider.get_store(dataset_name="table_descriptions")
+    assert table_descriptions is not store
+    assert table_descriptions.index == "table_descriptions"
+    assert table_descriptions.client is store.client
+    assert table_descriptions.async_client is store.async_client
+
+
+def test_qdrant_provider_recreates_store():
+    provider = QdrantProvider(location=":memory:", embedding_model_dim=8)
+
+    store = provider.get_store(dataset_name="sql_pairs")
+    recreated = provider.get_store(dataset_name="sql_pairs", recreate_index=True)
+
+    assert recreated is not store
+    assert provider.get_store(dataset_name="sql_pairs") is recreated
+    assert recreated.async_client is store.async_client
+
+
+def test_qdrant_provider_creates_payload_indexes(mocker):
+    create_payload_index = mocker.patch.object(
+        qdrant_client.QdrantClient, "create_payload_index"
+    )
+    QdrantProvider(location=":memory:", embedding_model_dim=8)
+
+    indexed = {
+        (call.kwargs["collection_name"], call.kwargs["field_name"])
+        for call in create_payload_index.call_args_list
+    }
+    assert {
+        ("Document", "project_id"),
+        ("Document", "type"),
+        ("Document", "name"),
+        ("table_descriptions", "name"),
+        ("view_questions", "project_id"),
+        ("sql_pairs", "sql_pair_id"),
+        ("instructions", "is_default"),
+        ("instructions", "instruction_id"),
+        ("project_meta", "project_id"),
+    } <= indexed
+    assert ("view_questions", "name") not in indexed
+    assert get_payload_fields_to_index("instructions") == [
+        {"field_name": "project_id", "field_schema": "keyword"},
+        {"field_name": "is_default", "field_schema": "bool"},
+        {"field_name": "instruction_id", "field_schema": "keyword"},
+    ]
+
+
+def test_get_hnsw_config():
+    hnsw_config, hnsw_ef = get_hnsw_config("multi")
+    # a graph per project instead of a global one
+    assert (hnsw_config.m, hnsw_config.payload_m) == (0, 16)
+    hnsw_config, _ = get_hnsw_config("multi", m=32)
+    assert (hnsw_config.m, hnsw_config.payload_m) == (0, 32)
+
+    hnsw_config, hnsw_ef = get_hnsw_config("single", ef_construct=200, hnsw_ef=64)
+    assert (hnsw_config.m, hnsw_config.payload_m) == (16, 0)
+    assert (hnsw_config.ef_construct, hnsw_ef) == (200, 64)
+
+    with pytest.raises(ValueError):
+        get_hnsw_config("tenant")
+
+
+@pytest.mark.asyncio
+async def test_tenancy_updates_hnsw_config_of_existing_collections(mocker):
+    mocker.patch.object(
+        qdrant_client.QdrantClient,
+        "get_collection",
+        return_value=SimpleNamespace(
+            config=SimpleNamespace(
+                hnsw_config=rest.HnswConfig(
+                    m=0, payload_m=16, ef_construct=100, full_scan_threshold=10000
+                )
+            )
+        ),
+    )
+    update_collection = mocker.patch.object(
+        qdrant_client.QdrantClient, "update_collection"
+    )
+
+    provider = QdrantProvider(
+        location=":memory:", embedding_model_dim=8, tenancy="single"
+    )
+
+    assert update_collection.call_count == 6
+    assert update_collection.call_args.kwargs["hnsw_config"] == rest.HnswConfigDiff(
+        m=16, payload_m=0
+    )
+
+    store = provider.get_store()
+    store.async_client = mocker.AsyncMock()
+    store.async_client.search.return_value = []
+    await store._query_by_embedding([0.1] * 8)
+    assert store.async_client.search.await_args.kwargs["search_params"].hnsw_ef == 128
+
+    update_collection.reset_mock()
+    QdrantProvider(location=":memory:", embedding_model_dim=8, tenancy="multi")
+    update_collection.assert_not_called()
+
+
+def test_get_quantization_config():
+    assert get_quantization_config("auto", 768) is None
+    assert isinstance(get_quantization_config("auto", 3072), rest.BinaryQuantization)
+
+    scalar = get_quantization_config("scalar", 768)
+    assert scalar.scalar.type == rest.ScalarType.INT8
+    product = get_quantization_config("product", 768, product_compression="x32")
+    assert product.product.compression == rest.CompressionRatio.X32
+    assert get_quantization_config("none", 3072) is None
+
+    with pytest.raises(ValueError):
+        get_quantization_config("int4", 768)
+
+
+@pytest.mark.asyncio
+async def test_scalar_quantization_search_params(mocker):
+    hnsw_config, _ = get_hnsw_config("multi")
+    mocker.patch.object(
+        qdrant_client.QdrantClient,
+        "get_collection",
+        return_value=SimpleNamespace(
+            config=SimpleNamespace(
+                hnsw_config=rest.HnswConfig(
+                    **hnsw_config.model_dump(exclude_none=True),
+                    full_scan_threshold=10000,
+                ),
+                quantization_config=None,
+            )
+        ),
+    )
+    update_collection = mocker.patch.object(
+        qdrant_client.QdrantClient, "update_collection"
+    )
+
+    provider = QdrantProvider(
+        location=":memory:", embedding_model_dim=8, quantization="scalar"
+    )
+    # the existing collections are quantized
+    assert update_collection.call_count == 6
+    assert isinstance(
+        update_collection.call_args.kwargs["quantization_config"],
+        rest.ScalarQuantization,
+    )
+    assert "hnsw_config" not in update_collection.call_args.kwargs
+
+    store = provider.get_store()
+    store.async_client = mocker.AsyncMock()
+    store.async_client.search.return_value = []
+
+    await provider.get_retriever(store).run(query_embedding=[0.1] * 8)
+    quantization = store.async_client.search.await_args.kwargs[
+        "search_params"
+    ].quantization
+    assert (quantization.rescore, quantization.oversampling) == (True, 1.5)
+
+    await provider.get_retriever(store, rescore=False, oversampling=4.0).run(
+        query_embedding=[0.1] * 8
+    )
+    quantization = store.async_client.search.await_args.kwargs[
+        "search_params"
+    ].quantization
+    assert (quantization.rescore, quantization.oversampling) == (False, 4.0)
+
+    # the settings of the provider are the defaults of its retrievers
+    provider = QdrantProvider(
+        location=":memory:",
+        embedding_model_dim=8,
+        quantization="scalar",
+        rescore=False,
+        oversampling=2.0,
+    )
+    store = provider.get_store()
+    store.async_client = mocker.AsyncMock()
+    store.async_client.search.return_value = []
+    await provider.get_retriever(store).run(query_embedding=[0.1] * 8)
+    quantization = store.async_client.search.await_args.kwargs[
+        "search_params"
+    ].quantization
+    assert (quantization.rescore, quantization.oversampling) == (False, 2.0)
+
+
+@pytest.mark.asyncio
+async def test_write_documents_does_not_block_event_loop(mocker):
+    store = QdrantProvider(location=":memory:", embedding_model_dim=8).get_store()
+
+    async def _upsert(**_):
+        await asyncio.sleep(0.01)
+
+    store.async_client = mocker.AsyncMock()
+    store.async_client.collection_exists.return_value = True
+    store.async_client.get_collection.return_value = SimpleNamespace(
+        config=SimpleNamespace(
+            params=SimpleNamespace(
+                vectors=rest.VectorParams(size=8, distance=rest.Distance.COSINE)
+            )
+        )
+    )
+    store.async_client.upsert.side_effect = _upsert
+    # the blocking set up with the sync client must not be used while writing
+    set_up_collection = mocker.patch.object(
+        store, "_set_up_collection", side_effect=lambda *_: time.sleep(0.2)
+    )
+
+    gaps = []
+
+    async def _ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            gaps.append(time.perf_counter() - start)
+
+    ticker = asyncio.create_task(_ticker())
+    documents = [
+        Document(id=str(i), content=f"document {i}", embedding=[0.1] * 8)
+        for i in range(10)
+    ]
+    for _ in range(3):
+        assert (
+            await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+            == 10
+        )
+    ticker.cancel()
+
+    assert max(gaps) < 0.1
+    set_up_collection.assert_not_called()
+    # the collection is only checked by the first write
+    assert store.async_client.collection_exists.await_count == 1
+    assert store.async_client.upsert.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_write_documents_pipelines_upserts(mocker):
+    store = QdrantProvider(
+        location=":memory:",
+        embedding_model_dim=8,
+        write_batch_size=10,
+        write_concurrency=2,
+    ).get_store()
+    store._collection_checked = True
+
+    in_flight = 0
+    max_in_flight = 0
+    upserts = []
+
+    async def _upsert(collection_name, points, wait):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        upserts.append((len(points), wait))
+
+    store.async_client = mocker.AsyncMock()
+    store.async_client.upsert.side_effect = _upsert
+
+    documents = [
+        Document(id=str(i), content=f"document {i}", embedding=[0.1] * 8)
+        for i in range(95)
+    ]
+    written = await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
+
+    assert written == 95
+    assert max_in_flight == 2
+    assert sum(points for points, _ in upserts) == 95
+    # only the last batch waits for the result, after all the others
+    assert upserts[-1] == (5, True)
+    assert all(not wait for _, wait in upserts[:-1])
+
+
+def test_point_batches_are_capped_by_bytes():
+    store = QdrantProvider(
+        location=":memory:", embedding_model_dim=8, write_batch_size=100
+    ).get_store()
+    documents = [
+        Document(id=str(i), content="x" * 1000, embedding=[0.1] * 8) for i in range(10)
+    ]
+    point_bytes = estimate_point_bytes(
+        convert_haystack_documents_to_qdrant_points(
+            documents[:1], use_sparse_embeddings=False
+        )[0]
+    )
+
+    store.write_batch_bytes = point_bytes * 3
+    batches = list(store._get_point_batches(documents))
+
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_retriever_projects_payloads_and_pushes_score_threshold(mocker):
+    provider = QdrantProvider(location=":memory:", embedding_model_dim=8)
+    store = provider.get_store(dataset_name="table_descriptions")
+    store.async_client = mocker.AsyncMock()
+    store.async_client.search.return_value = [
+        rest.ScoredPoint(
+            id=convert_id("1"),
+            version=0,
+            score=0.9,
+            payload={"id": "1", "name": "user"},
+        )
+    ]
+    store.async_client.scroll.return_value = ([], None)
+
+    retriever = provider.get_retriever(store, payload_fields=["name"])
+    documents = (await retriever.run(query_embedding=[0.1] * 8, score_threshold=0.8))[
+        "documents"
+    ]
+
+    assert [(document.id, document.meta) for document in documents] == [
+        ("1", {"name": "user"})
+    ]
+    assert documents[0].score == pytest.approx(0.95)
+    search = store.async_client.search.await_args.kwargs
+    # the scaled cosine threshold of 0.8 is a raw score of 0.6 in Qdrant
+    assert search["score_threshold"] == pytest.approx(0.6)
+    assert search["with_payload"] == ["id", "name"]
+
+    await retriever.run(query_embedding=[])
+    scroll = store.async_client.scroll.await_args.kwargs
+    assert scroll["limit"] == store.scroll_size
+    assert scroll["with_payload"] == ["id", "name"]
+
+
+class StandInClusterClient:
+    """
+    An async client of a Qdrant cluster with custom sharding, which places every shard key on
+    one of its nodes and records the nodes each request is sent to.
+    """
+
+    def __init__(self, nodes: int = 3):
+        self._nodes = nodes
+        self.shards = {}
+        self.requests = []
+
+    def _route(self, method: str, shard_key_selector=None) -> list:
+        shard_keys = (
+            [shard_key_selector]
+            if shard_key_selector is not None
+            else list(self.shards)
+        )
+        nodes = {list(self.shards).index(key) % self._nodes for key in shard_keys}
+        self.requests.append((method, nodes))
+        return shard_keys
+
+    async def collection_exists(self, collection_name):
+        return True
+
+    async def get_collection(self, collection_name):
+        return SimpleNamespace(
+            config=SimpleNamespace(
+                params=SimpleNamespace(
+                    vectors=rest.VectorParams(size=8, distance=rest.Distance.COSINE),
+                    sharding_method=rest.ShardingMethod.CUSTOM,
+                )
+            )
+        )
+
+    async def collection_cluster_info(self, collection_name):
+        return SimpleNamespace(
+            local_shards=[SimpleNamespace(shard_key=key) for key in self.shards],
+            remote_shards=[],
+        )
+
+    async def create_shard_key(self, collection_name, shard_key, **_):
+        self.shards[shard_key] = {}
+
+    async def upsert(self, collection_name, points, wait, shard_key_selector=None):
+        # points can only be written to a shard key of a collection with custom sharding
+        assert shard_key_selector in self.shards
+        self._route("upsert", shard_key_selector)
+        self.shards[shard_key_selector].update({point.id: point for point in points})
+
+    async def count(self, collection_name, count_filter, shard_key_selector=None):
+        shard_keys = self._route("count", shard_key_selector)
+        return SimpleNamespace(count=sum(len(self.shards[key]) for key in shard_keys))
+
+    async def scroll(self, collection_name, shard_key_selector=None, **_):
+        shard_keys = self._route("scroll", shard_key_selector)
+        return [
+            point for key in shard_keys for point in self.shards[key].values()
+        ], None
+
+
+@pytest.mark.asyncio
+async def test_tenant_sharding_routes_projects_to_shard_keys():
+    store = QdrantProvider(
+        location=":memory:", embedding_model_dim=8, tenant_sharding="project_id"
+    ).get_store()
+    store.async_client = StandInClusterClient()
+
+    documents = [
+        Document(
+            id=str(i),
+            content=f"document {i}",
+            meta={"project_id": project_id} if project_id else {},
+            embedding=[0.1] * 8,
+        )
+        for i, project_id in enumerate(["1", "1", "2", "1", None])
+    ]
+    assert await store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE) == 5
+    assert {key: len(points) for key, points in store.async_client.shards.items()} == {
+        "1": 3,
+        "2": 1,
+        "default": 1,
+    }
+    # every upsert goes to the one node holding the shard key of its project
+    assert all(len(nodes) == 1 for _, nodes in store.async_client.requests)
+
+    store.async_client.requests.clear()
+    project_filters = {
+        "operator": "AND",
+        "conditions": [
+            {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
+            {"field": "project_id", "operator": "==", "value": "2"},
+        ],
+    }
+    assert await store.count_documents(project_filters) == 1
+    payloads = await store._query_payloads_by_filters(project_filters)
+    assert [payload["id"] for payload in payloads] == ["2"]
+    assert store.async_client.requests == [("count", {1}), ("scroll", {1})]
+
+    # a project without a shard key has no documents, nothing is sent to the shards
+    store.async_client.requests.clear()
+    assert (
+        await store.count_documents(
+            {"field": "project_id", "operator": "==", "value": "3"}
+        )
+        == 0
+    )
+    assert store.async_client.requests == []
+
+    # without a project, a request goes to all the shards
+    assert await store.count_documents() == 5
+    assert store.async_client.requests == [("count", {0, 1, 2})]
+
+
+def test_tenant_sharding_buckets():
+    store = QdrantProvider(
+        location=":memory:",
+        embedding_model_dim=8,
+        tenant_sharding="bucket",
+        tenant_shard_buckets=4,
+    ).get_store()
+
+    shard_keys = {store.get_shard_key(str(project_id)) for project_id in range(100)}
+    assert shard_keys == {"bucket-0", "bucket-1", "bucket-2", "bucket-3"}
+    assert store.get_shard_key("1") == f"bucket-{zlib.crc32(b'1') % 4}"
+
+    with pytest.raises(ValueError):
+        QdrantProvider(
+            location=":memory:", embedding_model_dim=8, tenant_sharding="tenant"
+        )
+
+
+@pytest.mark.asyncio
+async def test_tenant_sharding_rejects_collection_without_custom_sharding(mocker):
+    store = QdrantProvider(
+        location=":memory:", embedding_model_dim=8, tenant_sharding="project_id"
+    ).get_store()
+    store.async_client = mocker.AsyncMock()
+    store.async_client.collection_exists.return_value = True
+    store.async_client.get_collection.return_value = SimpleNamespace(
+        config=SimpleNamespace(
+            params=SimpleNamespace(
+                vectors=rest.VectorParams(size=8, distance=rest.Distance.COSINE),
+                sharding_method=None,
+            )
+        )
+    )
+
+    with pytest.raises(QdrantStoreError):
+        await store.write_documents(
+            [Document(id="1", content="document", meta={"project_id": "1"})],
+            policy=DuplicatePolicy.OVERWRITE,
+        )
+    store.async_client.upsert.assert_not_called()
+
+
+def _numpy_documents() -> list[Document]:
+    return [
+        Document(
+            id="1",
+            content="user",
+            meta={"project_id": "1", "type": "TABLE_DESCRIPTION", "name": "user"},
+            embedding=[1.0, 0.0, 0.0],
+        ),
+        Document(
+            id="2",
+            content="order",
+            meta={"project_id": "1", "type": "TABLE_DESCRIPTION", "name": "order"},
+            embedding=[0.6, 0.8, 0.0],
+        ),
+        Document(
+            id="3",
+            content="book",
+            meta={"project_id": "2", "type": "TABLE_DESCRIPTION", "name": "book"},
+            embedding=[0.0, 0.0, 1.0],
+        ),
+        Document(
+            id="4",
+            content="{}",
+            meta={"project_id": "1", "type": "TABLE_SCHEMA", "name": "user"},
+        ),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_query_by_embedding():
+    provider = NumpyStoreProvider(embedding_model_dim=3)
+    store = provider.get_store(dataset_name="table_descriptions")
+    assert provider.get_store(dataset_name="table_descriptions") is store
+    await store.write_documents(_numpy_documents())
+
+    retriever = provider.get_retriever(store, top_k=2, rescore=True, oversampling=2.0)
+    documents = (await retriever.run(query_embedding=[2.0, 0.1, 0.0]))["documents"]
+    assert [document.id for document in documents] == ["1", "2"]
+    assert documents[0].score > documents[1].score
+    assert documents[0].meta == {
+        "project_id": "1",
+        "type": "TABLE_DESCRIPTION",
+        "name": "user",
+    }
+
+    documents = (
+        await retriever.run(
+            query_embedding=[1.0, 0.0, 0.0],
+            filters={
+                "operator": "AND",
+                "conditions": [
+                    {"field": "project_id", "operator": "==", "value": "2"},
+                ],
+            },
+        )
+    )["documents"]
+    assert [document.id for document in documents] == ["3"]
+
+    retriever = provider.get_retriever(store, payload_fields=["name"])
+    documents = (
+        await retriever.run(query_embedding=[2.0, 0.1, 0.0], score_threshold=0.9)
+    )["documents"]
+    # order scores 0.82 and book 0.5
+    assert [(document.id, document.meta) for document in documents] == [
+        ("1", {"name": "user"})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_filters():
+    store = NumpyStoreProvider(embedding_model_dim=3).get_store()
+    await store.write_documents(_numpy_documents())
+    retriever = NumpyEmbeddingRetriever(store)
+
+    filters = {
+        "operator": "AND",
+        "conditions": [
+            {"field": "project_id", "operator": "==", "value": "1"},
+            {
+                "operator": "OR",
+                "conditions": [
+                    {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
+                    {"field": "name", "operator": "in", "value": ["order"]},
+                ],
+            },
+        ],
+    }
+    documents = (await retriever.run(query_embedding=[], filters=filters))["documents"]
+    assert [document.id for document in documents] == ["2", "4"]
+    assert await store.count_documents(filters) == 2
+    assert await store.count_documents() == 4
+
+    payloads = await retriever.fetch_payloads(
+        filters=filters, payload_fields=["name", "content"]
+    )
+    assert payloads == {
+        "payloads": [
+            {"name": "order", "content": "order"},
+            {"name": "user", "content": "{}"},
+        ]
+    }
+
+    with pytest.raises(ValueError):
+        await store.count_documents(
+            {"field": "project_id", "operator": "!=", "value": "1"}
+        )
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_write_policies_and_delete():
+    store = NumpyStoreProvider(embedding_model_dim=3).get_store()
+    await store.write_documents(_numpy_documents())
+
+    with pytest.raises(DuplicateDocumentError):
+        await store.write_documents(_numpy_documents()[:1])
+    assert (
+        await store.write_documents(_numpy_documents()[:1], policy=DuplicatePolicy.SKIP)
+        == 0
+    )
+
+    updated = Document(
+        id="1", content="users", meta={"project_id": "1"}, embedding=[0.0, 1.0, 0.0]
+    )
+    await store.write_documents([updated], policy=DuplicatePolicy.OVERWRITE)
+    documents = await store._query_by_embedding([0.0, 1.0, 0.0], top_k=1)
+    assert (documents[0].id, documents[0].content) == ("1", "users")
+    assert (
+        await store.count_documents(
+            {"field": "type", "operator": "==", "value": "TABLE_DESCRIPTION"}
+        )
+        == 2
+    )
+
+    await store.delete_documents(
+        {"field": "project_id", "operator": "==", "value": "1"}
+    )
+    assert await store.count_documents() == 1
+    await store.delete_documents()
+    assert await store.count_documents() == 0
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_persistence(tmp_path):
+    store = NumpyStoreProvider(path=str(tmp_path), embedding_model_dim=3).get_store()
+    await store.write_documents(_numpy_documents())
+    await store.delete_documents({"field": "name", "operator": "==", "value": "book"})
+
+    # a new provider loads the collection from the files
+    provider = NumpyStoreProvider(path=str(tmp_path), embedding_model_dim=3)
+    reloaded = provider.get_store()
+    assert await reloaded.count_documents() == 3
+    documents = await reloaded._query_by_embedding([0.6, 0.8, 0.0], top_k=1)
+    assert documents[0].id == "2"
+    assert documents[0].score == pytest.approx(1.0)
+
+    with pytest.raises(ValueError):
+        NumpyStoreProvider(path=str(tmp_path), embedding_model_dim=4)
+
+    recreated = provider.get_store(recreate_index=True)
+    assert await recreated.count_documents() == 0
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_persistence_after_overwrite(tmp_path):
+    store = NumpyStoreProvider(path=str(tmp_path), embedding_model_dim=3).get_store()
+    await store.write_documents(
+        [Document(id="a", content="user", meta={"project_id": "1"})]
+    )
+    await store.write_documents(
+        [Document(id="a", content="user", meta={"project_id": "2"})],
+        policy=DuplicatePolicy.OVERWRITE,
+    )
+
+    reloaded = NumpyStoreProvider(path=str(tmp_path), embedding_model_dim=3).get_store()
+    assert (
+        await reloaded.count_documents(
+            {"field": "project_id", "operator": "==", "value": "1"}
+        )
+        == 0
+    )
+    assert (
+        await reloaded.count_documents(
+            {"field": "project_id", "operator": "==", "value": "2"}
+        )
+        == 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_blue_green_indexing():
+    provider = NumpyStoreProvider(embedding_model_dim=3, blue_green_indexing=True)
+    deploy_versions = provider.get_deploy_versions()
+    deploy_versions._ttl = 0
+    store = provider.get_store(dataset_name="table_descriptions")
+    project = {"field": "project_id", "operator": "==", "value": "1"}
+
+    def _documents(version: str) -> list[Document]:
+        # the documents of project 1
+        documents = _numpy_documents()[:2]
+        for document in documents:
+            document.id = f"{document.id}-{version}"
+            if version:
+                document.meta["deploy_version"] = version
+        return documents
+
+    # the documents written before blue/green indexing have no version
+    await store.write_documents(_documents("") + _numpy_documents()[2:3])
+    assert await store.count_documents(project) == 2
+
+    # the documents of a new version are only returned once it is activated
+    version = await deploy_versions.begin("1")
+    await store.write_documents(_documents(version))
+    documents = await store._query_by_embedding([1.0, 0.0, 0.0], filters=project)
+    assert [document.id for document in documents] == ["1-", "2-"]
+
+    await deploy_versions.activate("1", version)
+    documents = await store._query_by_embedding([1.0, 0.0, 0.0], filters=project)
+    assert [document.id for document in documents] == [f"1-{version}", f"2-{version}"]
+    assert await store.count_documents(project) == 2
+
+    # the stale versions are removed, but not the one being written by the next deployment
+    next_version = await deploy_versions.begin("1")
+    await store.write_documents(_documents(next_version)[:1])
+    await asyncio.gather(*deploy_versions._tasks)
+
+    # the documents written without a project are cleaned up on their own
+    await deploy_versions.activate(None, await deploy_versions.begin(None))
+    await asyncio.gather(*deploy_versions._tasks)
+
+    assert sorted(
+        payload["id"]
+        for payload in store._payloads.values()
+        if payload["project_id"] == "1"
+    ) == sorted([f"1-{version}", f"2-{version}", f"1-{next_version}"])
+    assert (
+        await store.count_documents(
+            {"field": "project_id", "operator": "==", "value": "2"}
+        )
+        == 1
+    )
+    assert provider.get_store(dataset_name="sql_pairs").deploy_versions is None
+
+    # the active versions are read back from the deploy_versions collection
+    reloaded = DeployVersions(provider.get_store(dataset_name="deploy_versions"))
+    assert await reloaded.get("1") == version
+    await deploy_versions.remove("1")
+    assert await deploy_versions.get("1") is None
+
+
+@pytest.mark.asyncio
+async def test_numpy_store_blue_green_indexing_without_project_id():
+    provider = NumpyStoreProvider(embedding_model_dim=3, blue_green_indexing=True)
+    deploy_versions = provider.get_deploy_versions()
+    deploy_versions._ttl = 0
+    store = provider.get_store(dataset_name="table_descriptions")
+
+    async def _deploy() -> str:
+        # the indexing pipelines write no project_id field without a project_id
+        version = await deploy_versions.begin(None)
+        await store.write_documents(
+            [
+                Document(
+                    id=str(uuid.uuid4()),
+                    content=name,
+                    meta={"name": name, "deploy_version": version},
+                    embedding=[1.0, 0.0, 0.0],
+                )
+                for name in ["user", "order"]
+            ]
+        )
+        await deploy_versions.activate(None, version)
+        await asyncio.gather(*deploy_versions._tasks)
+        return version
+
+    await _deploy()
+    version = await _deploy()
+
+    assert [payload["deploy_version"] for payload in store._payloads.values()] == [
+        version,
+        version,
+    ]
+    assert await store.count_documents() == 2
+
+    await deploy_versions.remove(None)
+    assert await deploy_versions.get(None) is None
+
+
+def test_convert_filters_matches_missing_fields():
+    filters = convert_filters(
+        {
+            "operator": "AND",
+            "conditions": [
+                {"field": "type", "operator": "==", "value": "TABLE_SCHEMA"},
+                {"field": "project_id", "operator": "==", "value": None},
+            ],
+        }
+    )
+
+    assert filters.must[1] == rest.Filter(
+        must=[rest.IsEmptyCondition(is_empty=rest.PayloadField(key="project_id"))]
+    )
@@ -0,0 +1,183 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from haystack import Document
+
+from src.providers.embedder.cache import EmbeddingCache
+from src.providers.embedder.litellm import AsyncDocumentEmbedder, EmbeddingMicroBatcher
+
+
+def _embed_mock(calls: list, reverse: bool = False):
+    async def _embed(texts: list[str]):
+        calls.append(texts)
+        await asyncio.sleep(0)
+        data = [
+            {"index": i, "embedding": [float(len(text))]}
+            for i, text in enumerate(texts)
+        ]
+        return SimpleNamespace(
+            model="mock-embedding-model",
+            usage={"prompt_tokens": len(texts), "total_tokens": len(texts)},
+            data=data[::-1] if reverse else data,
+        )
+
+    return _embed
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_batches_concurrent_requests():
+    calls = []
+    batcher = EmbeddingMicroBatcher(
+        _embed_mock(calls), batch_window_ms=5, max_batch_size=32
+    )
+
+    results = await asyncio.gather(
+        batcher.embed("a"), batcher.embed("bb"), batcher.embed("ccc")
+    )
+
+    assert calls == [["a", "bb", "ccc"]]
+    assert [embedding for embedding, _ in results] == [[1.0], [2.0], [3.0]]
+    assert results[0][1]["model"] == "mock-embedding-model"
+    # the usage of the batched call is only reported once
+    assert [meta["usage"] for _, meta in results] == [
+        {"prompt_tokens": 3, "total_tokens": 3},
+        {},
+        {},
+    ]
+    assert not batcher._tasks
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_maps_embeddings_by_index():
+    calls = []
+    batcher = EmbeddingMicroBatcher(_embed_mock(calls, reverse=True), batch_window_ms=5)
+
+    results = await asyncio.gather(
+        batcher.embed("a"), batcher.embed("bb"), batcher.embed("ccc")
+    )
+
+    assert [embedding for embedding, _ in results] == [[1.0], [2.0], [3.0]]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_respects_max_batch_size():
+    calls = []
+    batcher = EmbeddingMicroBatcher(
+        _embed_mock(calls), batch_window_ms=5, max_batch_size=2
+    )
+
+    await asyncio.gather(*[batcher.embed(str(i)) for i in range(5)])
+
+    assert calls == [["0", "1"], ["2", "3"], ["4"]]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_deduplicates_texts():
+    calls = []
+    batcher = EmbeddingMicroBatcher(_embed_mock(calls), batch_window_ms=5)
+
+    results = await asyncio.gather(batcher.embed("a"), batcher.embed("a"))
+
+    assert calls == [["a"]]
+    assert results[0][0] == results[1][0]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_propagates_errors():
+    async def _embed(texts: list[str]):
+        raise RuntimeError("provider is down")
+
+    batcher = EmbeddingMicroBatcher(_embed, batch_window_ms=5)
+
+    with pytest.raises(RuntimeError):
+        await asyncio.gather(batcher.embed("a"), batcher.embed("b"))
+
+
+def test_embedding_cache_get_and_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+    assert cache.get(["a", "b"]) == [None, None]
+
+    cache.put(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get(["a", "b", "c"]) == [[1.0, 2.0], [3.0, 4.0], None]
+
+
+def test_embedding_cache_persists_across_instances(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+    cache.put(["a"], [[1.0, 2.0]])
+    cache.close()
+
+    reloaded = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+    assert len(reloaded) == 1
+    assert reloaded.get(["a"]) == [[1.0, 2.0]]
+    assert EmbeddingCache(str(tmp_path), model="other-model").get(["a"]) == [None]
+
+
+def test_embedding_cache_is_used_by_a_single_process(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+    with pytest.raises(RuntimeError):
+        EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+    cache.close()
+    EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_async_get_and_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+
+    await asyncio.gather(
+        cache.aput(["a"], [[1.0, 2.0]]), cache.aput(["b"], [[3.0, 4.0]])
+    )
+
+    assert await cache.aget(["a", "b", "c"]) == [[1.0, 2.0], [3.0, 4.0], None]
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(
+        str(tmp_path),
+        model="text-embedding-3-large",
+        max_entries=4,
+        eviction_ratio=0.5,
+    )
+    cache.put(["a", "b", "c", "d"], [[1.0], [2.0], [3.0], [4.0]])
+    cache.get(["a"])
+
+    cache.put(["e"], [[5.0]])
+
+    assert len(cache) == 3
+    assert cache.get(["a", "b", "c", "d", "e"]) == [[1.0], None, None, [4.0], [5.0]]
+
+
+def test_embedding_cache_resets_on_dimension_change(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+    cache.put(["a"], [[1.0, 2.0]])
+
+    cache.put(["b"], [[1.0, 2.0, 3.0]])
+
+    assert cache.get(["a", "b"]) == [None, [1.0, 2.0, 3.0]]
+
+
+@pytest.mark.asyncio
+async def test_document_embedder_only_embeds_cache_misses(tmp_path, mocker):
+    cache = EmbeddingCache(str(tmp_path), model="text-embedding-3-large")
+    cache.put(["cached"], [[1.0]])
+    embed_batch = mocker.patch.object(
+        AsyncDocumentEmbedder,
+        "_embed_batch",
+        return_value=([[2.0]], {"model": "text-embedding-3-large"}),
+    )
+    embedder = AsyncDocumentEmbedder(model="text-embedding-3-large", cache=cache)
+
+    result = await embedder.run(
+        documents=[Document(content="cached"), Document(content="new")]
+    )
+
+    embed_batch.assert_called_once_with(texts_to_embed=["new"], batch_size=32)
+    assert [doc.embedding for doc in result["documents"]] == [[1.0], [2.0]]
+    assert result["meta"]["cache"] == {"hits": 1, "misses": 1}
+    assert cache.get(["new"]) == [[2.0]]
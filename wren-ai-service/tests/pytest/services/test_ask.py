@@ -1,3 +1,4 @@
+import asyncio
 import json
 import uuid
 
@@ -11,7 +12,10 @@ from src.utils import fetch_wren_ai_docs
 from src.web.v1.services.ask import (
     AskRequest,
     AskResultRequest,
+    AskResultResponse,
     AskService,
+    StopAskRequest,
+    _differs_materially,
 )
 from src.web.v1.services.semantics_preparation import (
     SemanticsPreparationRequest,
@@ -153,3 +157,236 @@ async def test_ask_with_successful_query(
     # assert ask_result_response.response[0].sql != ""
     # assert ask_result_response.response[0].summary != ""
     # assert ask_result_response.response[0].type == "llm" or "view"
+
+
+def _mocked_pipelines(mocker, intent: str, rephrased_question: str | None = None):
+    pipelines = {
+        name: mocker.AsyncMock()
+        for name in [
+            "historical_question",
+            "sql_pairs_retrieval",
+            "instructions_retrieval",
+            "intent_classification",
+            "data_assistance",
+            "db_schema_retrieval",
+            "sql_functions_retrieval",
+            "sql_generation",
+        ]
+    }
+    for name in [
+        "historical_question",
+        "sql_pairs_retrieval",
+        "instructions_retrieval",
+    ]:
+        pipelines[name].run.return_value = {"formatted_output": {"documents": []}}
+    pipelines["intent_classification"].run.return_value = {
+        "post_process": {"intent": intent, "rephrased_question": rephrased_question}
+    }
+    pipelines["db_schema_retrieval"].run.return_value = {
+        "construct_retrieval_results": {
+            "retrieval_results": [
+                {"table_name": "book", "table_ddl": "CREATE TABLE book (id INTEGER)"}
+            ]
+        }
+    }
+    pipelines["sql_functions_retrieval"].run.return_value = []
+    pipelines["sql_generation"].run.return_value = {
+        "post_process": {
+            "valid_generation_result": {"sql": "SELECT COUNT(*) FROM book"}
+        }
+    }
+    return pipelines
+
+
+async def _ask(ask_service: AskService, query: str) -> AskResultResponse:
+    ask_request = AskRequest(query=query, mdl_hash="mdl-hash")
+    ask_request.query_id = str(uuid.uuid4())
+    await ask_service.ask(ask_request)
+    return ask_service.get_ask_result(AskResultRequest(query_id=ask_request.query_id))
+
+
+def test_differs_materially():
+    assert not _differs_materially(
+        "How many books are there?", "how many books are there"
+    )
+    assert _differs_materially(
+        "And by author?", "How many books are there by each author?"
+    )
+
+
+@pytest.mark.asyncio
+async def test_ask_with_speculative_retrieval(mocker):
+    pipelines = _mocked_pipelines(
+        mocker, intent="TEXT_TO_SQL", rephrased_question="How many books are there"
+    )
+    ask_service = AskService(
+        pipelines,
+        allow_sql_generation_reasoning=False,
+        enable_speculative_retrieval=True,
+    )
+
+    result = await _ask(ask_service, "How many books are there?")
+    assert result.status == "finished"
+    assert result.retrieved_tables == ["book"]
+    # the schema retrieved along with the intent classification is used
+    pipelines["db_schema_retrieval"].run.assert_awaited_once()
+    assert (
+        pipelines["db_schema_retrieval"].run.await_args.kwargs["query"]
+        == "How many books are there?"
+    )
+    pipelines["sql_functions_retrieval"].run.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_ask_with_speculative_retrieval_and_rephrased_question(mocker):
+    pipelines = _mocked_pipelines(
+        mocker,
+        intent="TEXT_TO_SQL",
+        rephrased_question="How many books are there by each author?",
+    )
+    ask_service = AskService(
+        pipelines,
+        allow_sql_generation_reasoning=False,
+        enable_speculative_retrieval=True,
+    )
+
+    result = await _ask(ask_service, "And by author?")
+    assert result.status == "finished"
+    # the schema is retrieved again with the rephrased question
+    assert [
+        call.kwargs["query"]
+        for call in pipelines["db_schema_retrieval"].run.call_args_list
+    ] == ["And by author?", "How many books are there by each author?"]
+
+
+@pytest.mark.asyncio
+async def test_ask_with_speculative_retrieval_and_general_intent(mocker):
+    pipelines = _mocked_pipelines(mocker, intent="GENERAL")
+    retrieval_started = asyncio.Event()
+    retrieval_cancelled = asyncio.Event()
+
+    async def _retrieval(**kwargs):
+        retrieval_started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            retrieval_cancelled.set()
+            raise
+
+    pipelines["db_schema_retrieval"].run.side_effect = _retrieval
+    ask_service = AskService(pipelines, enable_speculative_retrieval=True)
+
+    result = await _ask(ask_service, "What can I ask?")
+    assert result.status == "finished"
+    assert result.type == "GENERAL"
+    # the speculative retrieval is cancelled as soon as the ask is done
+    await asyncio.wait_for(retrieval_cancelled.wait(), timeout=1)
+    assert retrieval_started.is_set()
+    pipelines["sql_generation"].run.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_ask_with_historical_question_cancels_other_lookups(mocker):
+    pipelines = _mocked_pipelines(mocker, intent="TEXT_TO_SQL")
+    cancelled = []
+
+    async def _historical_question(**kwargs):
+        # the other lookups are running by the time a historical question is found
+        await asyncio.sleep(0.01)
+        return {
+            "formatted_output": {
+                "documents": [{"statement": "SELECT COUNT(*) FROM book", "viewId": ""}]
+            }
+        }
+
+    def _slow_lookup(name: str):
+        async def _run(**kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        return _run
+
+    pipelines["historical_question"].run.side_effect = _historical_question
+    for name in ["sql_pairs_retrieval", "instructions_retrieval"]:
+        pipelines[name].run.side_effect = _slow_lookup(name)
+    ask_service = AskService(pipelines, allow_sql_generation_reasoning=False)
+
+    result = await asyncio.wait_for(
+        _ask(ask_service, "How many books are there?"), timeout=1
+    )
+    assert result.status == "finished"
+    assert result.response[0].sql == "SELECT COUNT(*) FROM book"
+    # the lookups were launched along with the historical question, and cancelled
+    await asyncio.sleep(0)
+    assert sorted(cancelled) == ["instructions_retrieval", "sql_pairs_retrieval"]
+    pipelines["intent_classification"].run.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stop_ask_cancels_the_running_ask(mocker):
+    pipelines = _mocked_pipelines(mocker, intent="TEXT_TO_SQL")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def _sql_generation(**kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    pipelines["sql_generation"].run.side_effect = _sql_generation
+    ask_service = AskService(pipelines, allow_sql_generation_reasoning=False)
+
+    ask_request = AskRequest(query="How many books are there?", mdl_hash="mdl-hash")
+    ask_request.query_id = str(uuid.uuid4())
+    task = ask_service.start_ask(ask_request)
+    await asyncio.wait_for(started.wait(), timeout=1)
+
+    stop_ask_request = StopAskRequest(status="stopped")
+    stop_ask_request.query_id = ask_request.query_id
+    ask_service.stop_ask(stop_ask_request)
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert cancelled.is_set()
+    result = ask_service.get_ask_result(AskResultRequest(query_id=ask_request.query_id))
+    assert result.status == "stopped"
+
+
+@pytest.mark.asyncio
+async def test_ask_skips_sql_correction_after_deadline(mocker):
+    pipelines = _mocked_pipelines(mocker, intent="TEXT_TO_SQL")
+    pipelines["sql_correction"] = mocker.AsyncMock()
+
+    async def _sql_generation(**kwargs):
+        await asyncio.sleep(0.05)
+        return {
+            "post_process": {
+                "valid_generation_result": {},
+                "invalid_generation_result": {
+                    "sql": "SELECT COUNT(*) FROM books",
+                    "error": "Table books not found",
+                    "type": "DRY_RUN",
+                },
+            }
+        }
+
+    pipelines["sql_generation"].run.side_effect = _sql_generation
+    ask_service = AskService(pipelines, allow_sql_generation_reasoning=False)
+
+    ask_request = AskRequest(
+        query="How many books are there?", mdl_hash="mdl-hash", deadline=0.01
+    )
+    ask_request.query_id = str(uuid.uuid4())
+    await ask_service.ask(ask_request)
+
+    result = ask_service.get_ask_result(AskResultRequest(query_id=ask_request.query_id))
+    assert result.status == "failed"
+    assert result.error.code == "NO_RELEVANT_SQL"
+    assert result.invalid_sql == "SELECT COUNT(*) FROM books"
+    pipelines["sql_correction"].run.assert_not_awaited()
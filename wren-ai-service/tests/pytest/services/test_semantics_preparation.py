@@ -0,0 +1,189 @@
+import orjson
+import pytest
+
+from src.providers.document_store.deploy_versions import DeployVersions
+from src.web.v1.services.semantics_preparation import (
+    SemanticsPreparationRequest,
+    SemanticsPreparationService,
+)
+
+PIPELINES = [
+    "db_schema",
+    "historical_question",
+    "table_description",
+    "sql_pairs",
+    "project_meta",
+]
+
+
+def _mdl(**changes) -> str:
+    return orjson.dumps(
+        {
+            "dataSource": "postgres",
+            "models": [
+                {
+                    "name": "user",
+                    "columns": [{"name": "id", "type": "INTEGER"}],
+                    "primaryKey": "id",
+                },
+                {
+                    "name": "product",
+                    "columns": [{"name": "id", "type": "INTEGER"}],
+                    "primaryKey": "id",
+                },
+            ],
+            "views": [{"name": "view_1", "statement": "SELECT * FROM user"}],
+            "relationships": [],
+            "metrics": [],
+            **changes,
+        }
+    ).decode("utf-8")
+
+
+@pytest.fixture
+def pipelines(mocker):
+    pipelines = {name: mocker.AsyncMock() for name in PIPELINES + ["instructions"]}
+    pipelines["db_schema"].activate_ddl_cache = mocker.MagicMock()
+    pipelines["db_schema"].discard_ddl_cache = mocker.MagicMock()
+    return pipelines
+
+
+@pytest.fixture
+def service(pipelines):
+    return SemanticsPreparationService(
+        pipelines=pipelines, enable_incremental_indexing=True
+    )
+
+
+async def _prepare(service: SemanticsPreparationService, mdl: str, mdl_hash: str):
+    await service.prepare_semantics(
+        SemanticsPreparationRequest(mdl=mdl, mdl_hash=mdl_hash, project_id="1")
+    )
+    return service._prepare_semantics_statuses[mdl_hash].status
+
+
+def _reset(pipelines: dict):
+    for pipeline in pipelines.values():
+        pipeline.run.reset_mock()
+
+
+@pytest.mark.asyncio
+async def test_first_deployment_is_full_reindex(service, pipelines):
+    assert await _prepare(service, _mdl(), "hash-1") == "finished"
+
+    for name in PIPELINES:
+        pipelines[name].run.assert_awaited_once_with(mdl_str=_mdl(), project_id="1")
+
+
+@pytest.mark.asyncio
+async def test_same_mdl_hash_returns_immediately(service, pipelines):
+    await _prepare(service, _mdl(), "hash-1")
+    _reset(pipelines)
+
+    assert await _prepare(service, _mdl(), "hash-1") == "finished"
+
+    for name in PIPELINES:
+        pipelines[name].run.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_mdl_without_semantic_change_is_not_reindexed(service, pipelines):
+    await _prepare(service, _mdl(), "hash-1")
+    _reset(pipelines)
+
+    assert await _prepare(service, _mdl(), "hash-2") == "finished"
+
+    for name in PIPELINES:
+        pipelines[name].run.assert_not_awaited()
+    pipelines["db_schema"].activate_ddl_cache.assert_not_called()
+    assert service._manifests["1"].mdl_hash == "hash-2"
+
+
+@pytest.mark.asyncio
+async def test_only_changed_models_are_reindexed(service, pipelines):
+    await _prepare(service, _mdl(), "hash-1")
+    _reset(pipelines)
+
+    mdl = _mdl(
+        models=[
+            {
+                "name": "user",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            },
+            {
+                "name": "customer",
+                "columns": [{"name": "id", "type": "INTEGER"}],
+                "primaryKey": "id",
+            },
+        ]
+    )
+    assert await _prepare(service, mdl, "hash-2") == "finished"
+
+    for name in ["db_schema", "table_description"]:
+        pipelines[name].run.assert_awaited_once_with(
+            mdl_str=mdl, project_id="1", names=["customer", "product"]
+        )
+    for name in ["historical_question", "sql_pairs", "project_meta"]:
+        pipelines[name].run.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failure_falls_back_to_full_reindex(service, pipelines):
+    await _prepare(service, _mdl(), "hash-1")
+    pipelines["project_meta"].run.side_effect = Exception("qdrant is down")
+
+    assert await _prepare(service, _mdl(dataSource="bigquery"), "hash-2") == "failed"
+
+    pipelines["project_meta"].run.side_effect = None
+    _reset(pipelines)
+
+    assert await _prepare(service, _mdl(dataSource="bigquery"), "hash-2") == "finished"
+    for name in PIPELINES:
+        pipelines[name].run.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_incremental_indexing_disabled(pipelines):
+    service = SemanticsPreparationService(pipelines=pipelines)
+
+    await _prepare(service, _mdl(), "hash-1")
+    _reset(pipelines)
+    await _prepare(service, _mdl(), "hash-1")
+
+    for name in PIPELINES:
+        pipelines[name].run.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_blue_green_indexing_activates_version_once_indexed(pipelines, mocker):
+    deploy_versions = mocker.MagicMock(spec=DeployVersions)
+    deploy_versions.begin.return_value = "v1"
+    service = SemanticsPreparationService(
+        pipelines=pipelines, deploy_versions=deploy_versions
+    )
+
+    assert await _prepare(service, _mdl(), "hash-1") == "finished"
+
+    for name in [
+        "db_schema",
+        "historical_question",
+        "table_description",
+        "project_meta",
+    ]:
+        pipelines[name].run.assert_awaited_once_with(
+            mdl_str=_mdl(), project_id="1", deploy_version="v1"
+        )
+    pipelines["sql_pairs"].run.assert_awaited_once_with(mdl_str=_mdl(), project_id="1")
+    deploy_versions.activate.assert_awaited_once_with("1", "v1")
+    pipelines["db_schema"].activate_ddl_cache.assert_called_once_with("1", "v1")
+
+    # a failed deployment leaves the previous version active
+    pipelines["table_description"].run.side_effect = Exception("qdrant is down")
+    deploy_versions.begin.return_value = "v2"
+
+    assert await _prepare(service, _mdl(), "hash-2") == "failed"
+    deploy_versions.activate.assert_awaited_once()
+    deploy_versions.abort.assert_called_once_with("1", "v2")
+    pipelines["db_schema"].activate_ddl_cache.assert_called_once()
+    pipelines["db_schema"].discard_ddl_cache.assert_called_once_with("1", "v2")
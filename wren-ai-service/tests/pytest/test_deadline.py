@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from src.core.deadline import (
+    DeadlineExceeded,
+    deadline_context,
+    deadline_exceeded,
+    remaining_time,
+    with_deadline,
+    within_deadline,
+)
+
+
+@pytest.mark.asyncio
+async def test_remaining_time_without_deadline():
+    assert remaining_time() is None
+    assert remaining_time(30.0) == 30.0
+    assert not deadline_exceeded()
+
+    with deadline_context(0):
+        assert remaining_time(30.0) == 30.0
+
+
+@pytest.mark.asyncio
+async def test_remaining_time_is_capped_by_the_deadline():
+    with deadline_context(1.0):
+        assert 0 < remaining_time(30.0) <= 1.0
+        assert remaining_time(0.5) == 0.5
+
+        # a nested deadline can't extend the current one
+        with deadline_context(10.0):
+            assert remaining_time(30.0) <= 1.0
+
+    assert remaining_time(30.0) == 30.0
+
+
+@pytest.mark.asyncio
+async def test_remaining_time_raises_once_the_deadline_has_passed():
+    with deadline_context(0.01):
+        await asyncio.sleep(0.02)
+
+        assert deadline_exceeded()
+        with pytest.raises(DeadlineExceeded):
+            remaining_time(30.0)
+
+
+@pytest.mark.asyncio
+async def test_within_deadline():
+    with deadline_context(0.01):
+        with pytest.raises(DeadlineExceeded):
+            async with within_deadline():
+                await asyncio.sleep(1)
+
+    async with within_deadline():
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_with_deadline():
+    class Request:
+        def __init__(self, deadline=None):
+            self.deadline = deadline
+
+    class Service:
+        _deadline = 100.0
+
+        @with_deadline
+        async def run(self, request):
+            return remaining_time()
+
+    assert 10.0 < await Service().run(Request()) <= 100.0
+    assert await Service().run(Request(deadline=1.0)) <= 1.0
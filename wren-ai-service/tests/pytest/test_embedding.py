@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from src.core.embedding import embed_query, embedding_context, with_embedding_context
+
+
+class EmbedderMock:
+    def __init__(self, model: str = "mock-embedding-model"):
+        self._model = model
+        self.calls = []
+
+    async def run(self, text: str):
+        self.calls.append(text)
+        await asyncio.sleep(0)
+        return {"embedding": [float(len(text))], "meta": {}}
+
+
+@pytest.mark.asyncio
+async def test_embed_query_without_context():
+    embedder = EmbedderMock()
+
+    await embed_query(embedder, "How many books?")
+    await embed_query(embedder, "How many books?")
+
+    assert embedder.calls == ["How many books?", "How many books?"]
+
+
+@pytest.mark.asyncio
+async def test_embed_query_once_per_context():
+    embedder = EmbedderMock()
+
+    with embedding_context() as context:
+        results = await asyncio.gather(
+            embed_query(embedder, "How many books?", stage="sql_pairs_retrieval"),
+            embed_query(embedder, "How many books?", stage="instructions_retrieval"),
+        )
+        await embed_query(embedder, "\nHow many books?", stage="db_schema_retrieval")
+
+    assert embedder.calls == ["How many books?"]
+    assert results[0] == results[1]
+    assert context.stats == {
+        "sql_pairs_retrieval": {"hit": 0, "miss": 1},
+        "instructions_retrieval": {"hit": 1, "miss": 0},
+        "db_schema_retrieval": {"hit": 1, "miss": 0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_embed_query_keyed_by_model():
+    embedder_a = EmbedderMock(model="model-a")
+    embedder_b = EmbedderMock(model="model-b")
+
+    with embedding_context():
+        await embed_query(embedder_a, "How many books?")
+        await embed_query(embedder_b, "How many books?")
+
+    assert embedder_a.calls == ["How many books?"]
+    assert embedder_b.calls == ["How many books?"]
+
+
+@pytest.mark.asyncio
+async def test_embed_query_retries_after_failure():
+    class FailingOnceEmbedder(EmbedderMock):
+        async def run(self, text: str):
+            self.calls.append(text)
+            if len(self.calls) == 1:
+                raise RuntimeError("embedding failed")
+            return {"embedding": [1.0], "meta": {}}
+
+    embedder = FailingOnceEmbedder()
+
+    with embedding_context():
+        with pytest.raises(RuntimeError):
+            await embed_query(embedder, "How many books?")
+        result = await embed_query(embedder, "How many books?")
+
+    assert result == {"embedding": [1.0], "meta": {}}
+    assert len(embedder.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_with_embedding_context_adds_metadata():
+    embedder = EmbedderMock()
+
+    @with_embedding_context
+    async def ask():
+        await embed_query(embedder, "How many books?", stage="historical_question")
+        await embed_query(embedder, "How many books?", stage="sql_pairs_retrieval")
+        return {"metadata": {"type": "TEXT_TO_SQL"}}
+
+    results = await ask()
+
+    assert results["metadata"]["embedding_cache"] == {
+        "historical_question": {"hit": 0, "miss": 1},
+        "sql_pairs_retrieval": {"hit": 1, "miss": 0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_request_cancels_the_embedding():
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    class SlowEmbedder(EmbedderMock):
+        async def run(self, text: str):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+    embedder = SlowEmbedder()
+
+    @with_embedding_context
+    async def ask():
+        return await embed_query(embedder, "How many books?")
+
+    task = asyncio.create_task(ask())
+    await started.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
@@ -0,0 +1,64 @@
+import orjson
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+
+from src.migrate_schema_payloads import migrate
+from src.pipelines.common import parse_schema_content
+
+LEGACY_CONTENT = str(
+    {
+        "type": "TABLE",
+        "comment": "\n/* {'alias': 'user', 'description': \"the user's table\"} */\n",
+        "name": "user",
+    }
+)
+
+
+def _client(points: list[dict]) -> QdrantClient:
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        collection_name="Document",
+        vectors_config=rest.VectorParams(size=2, distance=rest.Distance.COSINE),
+    )
+    client.upsert(
+        collection_name="Document",
+        points=[
+            rest.PointStruct(id=i, vector=[1.0, 0.0], payload=payload)
+            for i, payload in enumerate(points)
+        ],
+    )
+    return client
+
+
+def test_migrate():
+    json_content = orjson.dumps({"type": "VIEW", "name": "view_1"}).decode("utf-8")
+    client = _client(
+        [
+            {"type": "TABLE_SCHEMA", "name": "user", "content": LEGACY_CONTENT},
+            {"type": "TABLE_SCHEMA", "name": "view_1", "content": json_content},
+            {"type": "TABLE_DESCRIPTION", "name": "user", "content": "{'name': 1}"},
+        ]
+    )
+
+    assert migrate(client, batch_size=2) == {"scanned": 2, "migrated": 1}
+
+    points, _ = client.scroll(collection_name="Document", with_vectors=True)
+    payloads = {point.id: point.payload for point in points}
+    assert orjson.loads(payloads[0]["content"]) == parse_schema_content(LEGACY_CONTENT)
+    assert payloads[0]["name"] == "user"
+    assert payloads[1]["content"] == json_content
+    assert payloads[2]["content"] == "{'name': 1}"
+    assert all(point.vector == [1.0, 0.0] for point in points)
+
+    assert migrate(client) == {"scanned": 2, "migrated": 0}
+
+
+def test_migrate_dry_run():
+    client = _client(
+        [{"type": "TABLE_SCHEMA", "name": "user", "content": LEGACY_CONTENT}]
+    )
+
+    assert migrate(client, dry_run=True) == {"scanned": 1, "migrated": 1}
+
+    points, _ = client.scroll(collection_name="Document")
+    assert points[0].payload["content"] == LEGACY_CONTENT